@@ -0,0 +1,138 @@
+"""Per-organization cache for dashboard and report responses.
+
+Every organization has a version counter that is bumped whenever its
+orders, payments, installments, products or customers change. Responses are
+cached under ``(organization, endpoint, normalized params, version)`` so a
+bump makes every cached report of that organization unreachable at once.
+
+The cache is an optimization only: when the backend is unavailable,
+reports are computed uncached and bumps are skipped (with a warning).
+"""
+import functools
+import logging
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.utils import timezone
+from rest_framework.response import Response
+
+REPORT_CACHE_TIMEOUT = getattr(settings, 'REPORT_CACHE_TIMEOUT', 300)
+
+logger = logging.getLogger(__name__)
+
+
+def _version_key(organization_id):
+    return f'reports:version:{organization_id}'
+
+
+def _initial_version():
+    # Time-based so a version key lost to eviction never reuses an old version
+    return time.time_ns()
+
+
+def get_report_version(organization_id):
+    """Current version of an organization's reports, or ``None`` if the cache is unavailable"""
+    key = _version_key(organization_id)
+    try:
+        version = cache.get(key)
+        if version is None:
+            cache.add(key, _initial_version(), timeout=None)
+            version = cache.get(key)
+    except Exception as exc:
+        logger.warning("Report cache unavailable, reading version of organization %s: %s", organization_id, exc)
+        return None
+    return version
+
+
+def bump_report_version(organization_id):
+    """Invalidate every cached report of an organization"""
+    if organization_id is None:
+        return
+    try:
+        try:
+            cache.incr(_version_key(organization_id))
+        except ValueError:
+            cache.add(_version_key(organization_id), _initial_version(), timeout=None)
+    except Exception as exc:
+        logger.warning("Report cache unavailable, could not bump organization %s: %s", organization_id, exc)
+
+
+def bump_report_version_on_commit(organization_id):
+    transaction.on_commit(lambda: bump_report_version(organization_id))
+
+
+def _count(endpoint, outcome):
+    key = f'reports:stats:{endpoint}:{outcome}'
+    try:
+        cache.add(key, 0, timeout=None)
+        cache.incr(key)
+    except Exception:
+        # Statistics only; a lost count is not worth a warning
+        pass
+
+
+def report_cache_stats(endpoints):
+    """Return ``{endpoint: {'hits': n, 'misses': n}}`` for the given endpoints"""
+    keys = [f'reports:stats:{endpoint}:{outcome}' for endpoint in endpoints for outcome in ('hits', 'misses')]
+    values = cache.get_many(keys)
+    return {
+        endpoint: {
+            outcome: values.get(f'reports:stats:{endpoint}:{outcome}', 0)
+            for outcome in ('hits', 'misses')
+        }
+        for endpoint in endpoints
+    }
+
+
+def normalized_params(params):
+    """Canonical string of report params with the date range resolved to concrete dates"""
+    from orders.dates import parse_date_range
+
+    params = dict(params)
+    sd, ed = parse_date_range(params.pop('range', None), params.pop('start_date', None), params.pop('end_date', None))
+    params['range'] = f'{sd}:{ed}'
+    # Due-today and overdue figures move with the calendar
+    params['today'] = timezone.now().date().isoformat()
+    return '&'.join(f'{key}={value}' for key, value in sorted(params.items()))
+
+
+def cached_report(endpoint):
+    """Cache successful responses of a report view per organization and data version.
+
+    Apply directly to the view function, below ``api_view``.
+    """
+    def decorator(view):
+        @functools.wraps(view)
+        def wrapper(request, *args, **kwargs):
+            organization = getattr(request.user, 'organization', None)
+            if organization is None:
+                return view(request, *args, **kwargs)
+
+            version = get_report_version(organization.pk)
+            if version is None:
+                return view(request, *args, **kwargs)
+
+            key = 'reports:{}:{}:{}:{}'.format(
+                organization.pk, endpoint, version, normalized_params(request.GET.dict()),
+            )
+            try:
+                data = cache.get(key)
+            except Exception as exc:
+                logger.warning("Report cache unavailable, computing %s uncached: %s", endpoint, exc)
+                return view(request, *args, **kwargs)
+            if data is not None:
+                _count(endpoint, 'hits')
+                return Response(data)
+
+            _count(endpoint, 'misses')
+            response = view(request, *args, **kwargs)
+            if response.status_code == 200:
+                try:
+                    cache.set(key, response.data, REPORT_CACHE_TIMEOUT)
+                except Exception as exc:
+                    logger.warning("Report cache unavailable, could not store %s: %s", endpoint, exc)
+            return response
+        return wrapper
+    return decorator
@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from core.cache import report_cache_stats
+
+ENDPOINTS = ['dashboard_stats', 'reports_summary', 'product_stats', 'customer_stats', 'aging_report', 'cash_flow_forecast', 'cohort_report']
+
+
+class Command(BaseCommand):
+    help = 'Show hit/miss counters of the dashboard and report response cache'
+
+    def handle(self, *args, **options):
+        for endpoint, counts in report_cache_stats(ENDPOINTS).items():
+            total = counts['hits'] + counts['misses']
+            ratio = counts['hits'] / total if total else 0
+            self.stdout.write(f"{endpoint}: {counts['hits']} hits, {counts['misses']} misses ({ratio:.0%} hit rate)")
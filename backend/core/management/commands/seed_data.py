@@ -9,6 +9,8 @@ from core.models import Seller
 from products.models import Product, Category
 from customers.models import Customer
 from orders.models import Order, Installment, Payment
+from orders.schedule import monthly_payment
+from orders.tasks import build_installments
 
 
 class Command(BaseCommand):
@@ -263,8 +265,11 @@ class Command(BaseCommand):
         
         for order_info in order_data:
             # Calculate monthly payment before creating the order
-            monthly_payment = (order_info['total_amount'] - order_info['down_payment']) / order_info['installment_count']
-            order_info['monthly_payment'] = monthly_payment
+            order_info['monthly_payment'] = monthly_payment(
+                order_info['total_amount'],
+                order_info['down_payment'],
+                order_info['installment_count'],
+            )
             
             order = Order.objects.create(**order_info)
             order.approved_date = timezone.now() if order.status == 'approved' else None
@@ -279,15 +284,7 @@ class Command(BaseCommand):
         for order in orders:
             if order.status == 'approved':
                 # Generate installments
-                for i in range(1, order.installment_count + 1):
-                    due_date = order.start_date + timedelta(days=30 * i)
-                    installment = Installment.objects.create(
-                        order=order,
-                        installment_number=i,
-                        amount=order.monthly_payment,
-                        due_date=due_date,
-                        status='pending'
-                    )
+                Installment.objects.bulk_create(build_installments([order]))
                 
                 self.stdout.write(f'Created {order.installment_count} installments for order {order.id}')
 
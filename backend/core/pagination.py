@@ -0,0 +1,237 @@
+"""List pagination.
+
+``PageNumberPagination`` runs a ``COUNT(*)`` and an ``OFFSET`` scan per page.
+``?count=false`` skips the count, and ``?cursor=`` switches a list to keyset
+pagination, which seeks past the last row of the previous page on the
+list ordering (plus ``id`` as tie-breaker) so deep pages cost the same as
+the first one.
+"""
+import base64
+import json
+from datetime import date, datetime
+from decimal import Decimal
+
+from django.db.models import Q
+from rest_framework import pagination
+from rest_framework.exceptions import NotFound
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+def _encode_value(value):
+    # Full precision; DjangoJSONEncoder drops microseconds from datetimes
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return str(value)
+    return value
+
+
+def _stable_ordering(queryset):
+    """The ordering of the queryset with ``id`` appended as a tie-breaker"""
+    ordering = [
+        field for field in (queryset.query.order_by or queryset.model._meta.ordering)
+        if isinstance(field, str)
+    ]
+    names = {field.lstrip('-') for field in ordering}
+    if not names & {'id', 'pk'}:
+        descending = bool(ordering) and ordering[0].startswith('-')
+        ordering.append('-id' if descending else 'id')
+    return ordering
+
+
+class CountOptionalPageNumberPagination(pagination.PageNumberPagination):
+    """Page number pagination where ``?count=false`` skips the ``COUNT(*)``.
+
+    Without the count one extra row is fetched to tell whether a next page
+    exists, and the response has no ``count``.
+    """
+    count_query_param = 'count'
+
+    def skip_count(self, request):
+        return request.query_params.get(self.count_query_param, '').lower() in ('false', '0', 'no')
+
+    def paginate_queryset(self, queryset, request, view=None):
+        # Rows sharing the ordering values must not move between pages
+        if all(isinstance(field, str) for field in queryset.query.order_by):
+            queryset = queryset.order_by(*_stable_ordering(queryset))
+        self.without_count = self.skip_count(request)
+        if not self.without_count:
+            return super().paginate_queryset(queryset, request, view)
+
+        page_size = self.get_page_size(request)
+        if not page_size:
+            return None
+        try:
+            page_number = pagination._positive_int(request.query_params.get(self.page_query_param, 1), strict=True)
+        except ValueError:
+            raise NotFound(self.invalid_page_message)
+
+        offset = (page_number - 1) * page_size
+        rows = list(queryset[offset:offset + page_size + 1])
+        self.request = request
+        self.page_number = page_number
+        self.has_next = len(rows) > page_size
+        self.display_page_controls = False
+        return rows[:page_size]
+
+    def get_paginated_response(self, data):
+        if not self.without_count:
+            return super().get_paginated_response(data)
+        return Response({
+            'next': self.get_next_link(),
+            'previous': self.get_previous_link(),
+            'results': data,
+        })
+
+    def get_next_link(self):
+        if not self.without_count:
+            return super().get_next_link()
+        if not self.has_next:
+            return None
+        return replace_query_param(self.request.build_absolute_uri(), self.page_query_param, self.page_number + 1)
+
+    def get_previous_link(self):
+        if not self.without_count:
+            return super().get_previous_link()
+        if self.page_number <= 1:
+            return None
+        url = self.request.build_absolute_uri()
+        if self.page_number == 2:
+            return remove_query_param(url, self.page_query_param)
+        return replace_query_param(url, self.page_query_param, self.page_number - 1)
+
+    def get_schema_operation_parameters(self, view):
+        parameters = super().get_schema_operation_parameters(view)
+        parameters.append({
+            'name': self.count_query_param,
+            'required': False,
+            'in': 'query',
+            'description': 'Set to false to skip counting the total number of results.',
+            'schema': {'type': 'boolean'},
+        })
+        return parameters
+
+
+class KeysetPagination(pagination.BasePagination):
+    """Cursor pagination seeking on the full ordering of the queryset.
+
+    The cursor holds the ordering values of the boundary row, so the next
+    page is ``WHERE (order_date, id) < (:order_date, :id)`` in effect and can
+    be read from an index on the ordering columns. Ordering fields must be
+    non-null model fields; ``id`` is appended as a tie-breaker.
+    """
+    cursor_query_param = 'cursor'
+    page_size = pagination.api_settings.PAGE_SIZE
+    invalid_cursor_message = 'Invalid cursor'
+
+    def get_ordering(self, queryset):
+        return _stable_ordering(queryset)
+
+    def encode_cursor(self, position, reverse):
+        payload = json.dumps({'p': [_encode_value(value) for value in position], 'r': int(reverse)})
+        cursor = base64.urlsafe_b64encode(payload.encode()).decode()
+        return replace_query_param(self.base_url, self.cursor_query_param, cursor)
+
+    def decode_cursor(self, request):
+        cursor = request.query_params.get(self.cursor_query_param)
+        if not cursor:
+            return None, False
+        try:
+            payload = json.loads(base64.urlsafe_b64decode(cursor.encode()).decode())
+            position, reverse = payload['p'], bool(payload['r'])
+        except (TypeError, ValueError, KeyError, UnicodeDecodeError):
+            raise NotFound(self.invalid_cursor_message)
+        if not isinstance(position, list) or len(position) != len(self.ordering):
+            raise NotFound(self.invalid_cursor_message)
+        return position, reverse
+
+    def seek_filter(self, ordering, position):
+        """``Q`` selecting rows strictly after ``position`` in ``ordering``"""
+        condition = Q()
+        equal = Q()
+        for field, value in zip(ordering, position):
+            name = field.lstrip('-')
+            lookup = 'lt' if field.startswith('-') else 'gt'
+            condition |= equal & Q(**{f'{name}__{lookup}': value})
+            equal &= Q(**{name: value})
+        # Range on the leading column so the database can seek on the index
+        first = ordering[0]
+        bound = Q(**{f"{first.lstrip('-')}__{'lte' if first.startswith('-') else 'gte'}": position[0]})
+        return bound & condition
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.base_url = request.build_absolute_uri()
+        self.ordering = self.get_ordering(queryset)
+        position, reverse = self.decode_cursor(request)
+
+        ordering = self.ordering
+        if reverse:
+            ordering = [field[1:] if field.startswith('-') else f'-{field}' for field in ordering]
+        if position is not None:
+            queryset = queryset.filter(self.seek_filter(ordering, position))
+
+        rows = list(queryset.order_by(*ordering)[:self.page_size + 1])
+        has_more = len(rows) > self.page_size
+        rows = rows[:self.page_size]
+        if reverse:
+            rows.reverse()
+
+        self.has_next = has_more if not reverse else position is not None
+        self.has_previous = position is not None if not reverse else has_more
+        self.page = rows
+        return rows
+
+    def _position(self, row):
+        return [getattr(row, 'pk' if field.lstrip('-') in ('id', 'pk') else field.lstrip('-')) for field in self.ordering]
+
+    def get_next_link(self):
+        if not self.has_next or not self.page:
+            return None
+        return self.encode_cursor(self._position(self.page[-1]), reverse=False)
+
+    def get_previous_link(self):
+        if not self.has_previous or not self.page:
+            return None
+        return self.encode_cursor(self._position(self.page[0]), reverse=True)
+
+    def get_paginated_response(self, data):
+        return Response({
+            'next': self.get_next_link(),
+            'previous': self.get_previous_link(),
+            'results': data,
+        })
+
+
+class ListPagination(CountOptionalPageNumberPagination):
+    """Page numbers by default; keyset pagination when ``?cursor=`` is passed.
+
+    An empty ``?cursor=`` requests the first keyset page; the ``next`` and
+    ``previous`` links carry the cursor from there on.
+    """
+    keyset_class = KeysetPagination
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.keyset = None
+        if self.keyset_class.cursor_query_param in request.query_params:
+            self.keyset = self.keyset_class()
+            self.display_page_controls = False
+            return self.keyset.paginate_queryset(queryset, request, view)
+        return super().paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        if self.keyset is not None:
+            return self.keyset.get_paginated_response(data)
+        return super().get_paginated_response(data)
+
+    def get_schema_operation_parameters(self, view):
+        parameters = super().get_schema_operation_parameters(view)
+        parameters.append({
+            'name': self.keyset_class.cursor_query_param,
+            'required': False,
+            'in': 'query',
+            'description': 'Keyset pagination cursor; pass it empty for the first page.',
+            'schema': {'type': 'string'},
+        })
+        return parameters
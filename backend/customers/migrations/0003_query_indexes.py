@@ -0,0 +1,17 @@
+# Generated by Django 4.2.7 on 2026-10-17 02:14
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('customers', '0002_initial'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='customer',
+            index=models.Index(fields=['organization', '-created_at'], name='customer_org_created_idx'),
+        ),
+    ]
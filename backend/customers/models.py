@@ -22,5 +22,8 @@ class Customer(BaseModel):
 
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['organization', '-created_at'], name='customer_org_created_idx'),
+        ]
         verbose_name = "Customer"
         verbose_name_plural = "Customers"
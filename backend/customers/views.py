@@ -3,6 +3,8 @@ from rest_framework.decorators import api_view, permission_classes
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 from django_filters.rest_framework import DjangoFilterBackend
+from django.db.models import Q, Sum
+from core.cache import cached_report
 from .models import Customer
 from .serializers import CustomerSerializer
 
@@ -73,8 +75,10 @@ def customer_orders(request, customer_id):
 
     try:
         customer = Customer.objects.get(id=customer_id, organization=user.organization)
-        orders = Order.objects.filter(customer=customer, organization=user.organization)
-        serializer = OrderSerializer(orders, many=True)
+        orders = Order.objects.filter(customer=customer, organization=user.organization).for_serialization(
+            OrderSerializer.requested_expansions(request)
+        )
+        serializer = OrderSerializer(orders, many=True, context={'request': request})
         return Response(serializer.data)
     except Customer.DoesNotExist:
         return Response({
@@ -84,10 +88,12 @@ def customer_orders(request, customer_id):
 
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
+@cached_report('customer_stats')
 def customer_stats(request):
     """Get customer statistics"""
     from core.models import Seller
-    from orders.models import Order
+    from orders.dates import parse_date_range, date_range_bounds, filter_date_range
+    from orders.models import DailyOrgMetrics
     
     try:
         user = getattr(request, 'user', None)
@@ -106,16 +112,19 @@ def customer_stats(request):
         if org is None:
             return Response({'error': 'Organization not found for user'}, status=status.HTTP_404_NOT_FOUND)
 
-        # All customers belonging to the organization
-        customers = Customer.objects.filter(organization=org)
+        sd, ed = parse_date_range(request.GET.get('range'), request.GET.get('start_date'), request.GET.get('end_date'))
 
-        total_customers = customers.count()
+        # Customers created in the range (all time by default), summed from the daily rollup
+        metrics = filter_date_range(DailyOrgMetrics.objects.filter(organization=org), 'date', sd, ed)
+        total_customers = metrics.aggregate(total=Sum('new_customers'))['total'] or 0
 
-        # Active customers are those with orders in this organization with approved/active status
-        active_customers = customers.filter(
-            orders__organization=org,
-            orders__status__in=['approved', 'active']
-        ).distinct().count()
+        # Active customers are those with orders in this organization with approved/active status.
+        # Distinct counts cannot be summed from daily rows, so this stays a live query.
+        active_orders = Q(orders__organization=org, orders__status__in=['approved', 'active'])
+        if sd and ed:
+            start, end = date_range_bounds(sd, ed)
+            active_orders &= Q(orders__order_date__gte=start, orders__order_date__lt=end)
+        active_customers = Customer.objects.filter(organization=org).filter(active_orders).distinct().count()
         
         return Response({
             'total_customers': total_customers,
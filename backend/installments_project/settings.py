@@ -11,8 +11,9 @@ https://docs.djangoproject.com/en/4.2/ref/settings/
 """
 
 from pathlib import Path
-from decouple import config
+from decouple import Csv, config
 from datetime import timedelta
+from celery.schedules import crontab
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -93,7 +94,9 @@ WSGI_APPLICATION = 'installments_project.wsgi.application'
 
 # Database
 # https://docs.djangoproject.com/en/4.2/ref/settings/#databases
-if DEBUG:
+# SQLite in development unless DATABASE_URL is set (e.g. the PostgreSQL of
+# docker-compose and CI); production always reads DATABASE_URL
+if DEBUG and not config('DATABASE_URL', default=''):
     DATABASES = {
         'default': {
             'ENGINE': 'django.db.backends.sqlite3',
@@ -159,7 +162,7 @@ REST_FRAMEWORK = {
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.IsAuthenticated',
     ],
-    'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
+    'DEFAULT_PAGINATION_CLASS': 'core.pagination.CountOptionalPageNumberPagination',
     'PAGE_SIZE': 20,
 }
 
@@ -195,6 +198,36 @@ STATICFILES_STORAGE = 'whitenoise.storage.CompressedManifestStaticFilesStorage'
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
 
+# Cache (Redis in production, local memory for development and tests)
+if DEBUG:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': config('REDIS_URL', default='redis://localhost:6379/0'),
+        }
+    }
+
+# Seconds a cached dashboard/report response is kept (invalidated earlier on writes)
+REPORT_CACHE_TIMEOUT = config('REPORT_CACHE_TIMEOUT', default=300, cast=int)
+
+# Payment reminders go out on these days past the due date, then every
+# PAYMENT_REMINDER_REPEAT_DAYS after the last one (0 disables repeats)
+PAYMENT_REMINDER_CADENCE = config('PAYMENT_REMINDER_CADENCE', default='0,3,7,14', cast=Csv(int))
+PAYMENT_REMINDER_REPEAT_DAYS = config('PAYMENT_REMINDER_REPEAT_DAYS', default=7, cast=int)
+# Scheduled reminders are spread over this many hours from the send hour
+PAYMENT_REMINDER_SEND_HOUR = config('PAYMENT_REMINDER_SEND_HOUR', default=9, cast=int)
+PAYMENT_REMINDER_SEND_WINDOW_HOURS = config('PAYMENT_REMINDER_SEND_WINDOW_HOURS', default=8, cast=int)
+# Reminders claimed by a dispatcher that died are sent again after this long
+PAYMENT_REMINDER_CLAIM_TIMEOUT_MINUTES = config('PAYMENT_REMINDER_CLAIM_TIMEOUT_MINUTES', default=30, cast=int)
+# Locale of the organization reminder templates used
+PAYMENT_REMINDER_LOCALE = config('PAYMENT_REMINDER_LOCALE', default='en')
+
 # Celery Configuration
 CELERY_BROKER_URL = config('REDIS_URL', default='redis://localhost:6379/0')
 CELERY_RESULT_BACKEND = config('REDIS_URL', default='redis://localhost:6379/0')
@@ -202,6 +235,16 @@ CELERY_ACCEPT_CONTENT = ['json']
 CELERY_TASK_SERIALIZER = 'json'
 CELERY_RESULT_SERIALIZER = 'json'
 CELERY_TIMEZONE = TIME_ZONE
+CELERY_BEAT_SCHEDULE = {
+    'sweep-overdue-installments': {
+        'task': 'orders.tasks.sweep_overdue_installments',
+        'schedule': crontab(hour=0, minute=5),
+    },
+    'dispatch-payment-reminders': {
+        'task': 'orders.tasks.dispatch_payment_reminders',
+        'schedule': crontab(minute='*/5'),
+    },
+}
 
 # Email Configuration
 EMAIL_BACKEND = 'django.core.mail.backends.smtp.EmailBackend'
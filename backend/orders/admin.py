@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Order, Installment, Payment, PaymentReminder
+from .models import Order, Installment, Payment, PaymentReminder, DailyOrgMetrics, ReminderRun, ReminderShard, ReminderTemplate, ReportJob
 
 
 class InstallmentInline(admin.TabularInline):
@@ -19,7 +19,10 @@ class OrderAdmin(admin.ModelAdmin):
     list_display = ['id', 'customer', 'product', 'total_amount', 'status', 'order_date']
     list_filter = ['status', 'order_date', 'product__seller']
     search_fields = ['customer__first_name', 'customer__last_name', 'product__name']
-    readonly_fields = ['order_date', 'approved_date', 'monthly_payment']
+    readonly_fields = [
+        'order_date', 'approved_date', 'monthly_payment',
+        'amount_paid', 'remaining_balance', 'next_due_date', 'overdue_count'
+    ]
     inlines = [InstallmentInline, PaymentInline]
     fieldsets = (
         ('Order Information', {
@@ -28,6 +31,9 @@ class OrderAdmin(admin.ModelAdmin):
         ('Payment Details', {
             'fields': ('total_amount', 'down_payment', 'installment_count', 'monthly_payment')
         }),
+        ('Balance', {
+            'fields': ('amount_paid', 'remaining_balance', 'next_due_date', 'overdue_count')
+        }),
         ('Dates', {
             'fields': ('order_date', 'approved_date', 'start_date')
         }),
@@ -58,4 +64,41 @@ class PaymentReminderAdmin(admin.ModelAdmin):
     list_display = ['installment', 'reminder_type', 'status', 'scheduled_date', 'sent_date']
     list_filter = ['reminder_type', 'status', 'scheduled_date']
     search_fields = ['installment__order__customer__first_name', 'installment__order__customer__last_name']
-    readonly_fields = ['created_at']
\ No newline at end of file
+    readonly_fields = ['created_at']
+
+
+@admin.register(ReminderTemplate)
+class ReminderTemplateAdmin(admin.ModelAdmin):
+    list_display = ['organization', 'kind', 'locale', 'version', 'is_active', 'updated_at']
+    list_filter = ['kind', 'locale', 'organization']
+    readonly_fields = ['version', 'created_at', 'updated_at']
+
+
+@admin.register(DailyOrgMetrics)
+class DailyOrgMetricsAdmin(admin.ModelAdmin):
+    list_display = ['organization', 'date', 'orders_total', 'revenue_total', 'installments_unpaid', 'outstanding_amount']
+    list_filter = ['organization']
+    date_hierarchy = 'date'
+    readonly_fields = ['created_at', 'updated_at']
+
+
+@admin.register(ReportJob)
+class ReportJobAdmin(admin.ModelAdmin):
+    list_display = ['id', 'seller', 'report_type', 'export_format', 'status', 'row_count', 'created_at', 'finished_at']
+    list_filter = ['status', 'report_type', 'export_format', 'organization']
+    readonly_fields = ['params_key', 'data_version', 'started_at', 'finished_at', 'created_at', 'updated_at']
+
+
+class ReminderShardInline(admin.TabularInline):
+    model = ReminderShard
+    extra = 0
+    fields = ['organization', 'reminder_type', 'first_pk', 'last_pk', 'checkpoint', 'status', 'sent', 'failed', 'error']
+    readonly_fields = fields
+
+
+@admin.register(ReminderRun)
+class ReminderRunAdmin(admin.ModelAdmin):
+    list_display = ['run_date', 'status', 'shard_count', 'sent', 'failed', 'started_at', 'finished_at']
+    list_filter = ['status']
+    readonly_fields = ['started_at', 'finished_at']
+    inlines = [ReminderShardInline]
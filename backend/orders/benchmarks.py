@@ -0,0 +1,153 @@
+"""Helpers of the ``benchmark_*`` management commands.
+
+The commands seed a synthetic seller with ``seed_benchmark_seller`` inside
+``rolled_back()``, so nothing they write is left in the database, and time
+the code under test with ``measure()``.
+"""
+import random
+import resource
+import time
+from contextlib import contextmanager
+from datetime import datetime, time as dt_time, timedelta
+from decimal import Decimal
+
+from django.db import connection, transaction
+from django.db.models import DateTimeField
+from django.db.models.functions import Cast
+from django.utils import timezone
+
+from core.models import Seller
+from customers.models import Customer
+from products.models import Product
+from user.models import CustomUser, Organization
+
+from .models import Installment, Order, Payment
+from .schedule import monthly_payment
+from .tasks import build_installments
+
+SEED_BATCH_SIZE = 1000
+
+
+def rss_bytes():
+    """Current resident set size of the process (peak RSS where /proc is unavailable)"""
+    try:
+        with open('/proc/self/statm') as statm:
+            return int(statm.read().split()[1]) * resource.getpagesize()
+    except OSError:
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def format_bytes(count):
+    return f'{count / 2 ** 20:.1f} MiB'
+
+
+class Measurement:
+    queries = 0
+    seconds = 0.0
+
+    def __str__(self):
+        return f'{self.queries} queries, {self.seconds:.3f}s'
+
+
+@contextmanager
+def measure():
+    """Count the queries and the wall time of the block"""
+    measurement = Measurement()
+
+    def count(execute, sql, params, many, context):
+        measurement.queries += 1
+        return execute(sql, params, many, context)
+
+    start = time.perf_counter()
+    with connection.execute_wrapper(count):
+        yield measurement
+    measurement.seconds = time.perf_counter() - start
+
+
+@contextmanager
+def rolled_back():
+    """Run the block in a transaction that is rolled back at the end"""
+    with transaction.atomic():
+        yield
+        transaction.set_rollback(True)
+
+
+def seed_benchmark_seller(order_count, installment_count=12, customer_count=None, paid_ratio=0.5, late_ratio=0.2,
+                          min_age_days=0, schedules=True, username='benchmark-seller', seed=0, stdout=None):
+    """Create a seller with ``order_count`` approved orders and their installments.
+
+    Orders start between ``min_age_days`` and two years back, so their
+    installments are a mix of past and future due dates. ``paid_ratio`` of the installments due by
+    today are paid with a payment row, ``late_ratio`` of those after their
+    due date; ``schedules=False`` leaves the orders without installments.
+    Rows are bulk-created in batches and no signals are sent. Returns the
+    seller.
+    """
+    rng = random.Random(seed)
+    today = timezone.now().date()
+    customer_count = customer_count or max(1, order_count // 4)
+
+    user = CustomUser.objects.create_user(username=username, email=f'{username}@example.com')
+    organization = Organization.objects.create(name=username, owner=user)
+    seller = Seller.objects.create(user=user, organization=organization, business_name=username, phone_number='1')
+    products = Product.objects.bulk_create([
+        Product(
+            organization=organization, seller=seller, name=f'Product {i}', description='',
+            price=Decimal('1000'), sku=f'{username}-{i}',
+        )
+        for i in range(10)
+    ])
+    customers = Customer.objects.bulk_create([
+        Customer(
+            organization=organization, first_name='Customer', last_name=str(i),
+            email=f'{username}-{i}@example.com', phone_number='1', address='',
+        )
+        for i in range(customer_count)
+    ], batch_size=SEED_BATCH_SIZE)
+
+    payment = monthly_payment(Decimal('1200.00'), Decimal('120.00'), installment_count)
+    for offset in range(0, order_count, SEED_BATCH_SIZE):
+        orders = Order.objects.bulk_create([
+            Order(
+                organization=organization, customer=rng.choice(customers), product=rng.choice(products),
+                total_amount=Decimal('1200.00'), down_payment=Decimal('120.00'),
+                remaining_balance=Decimal('1080.00'), installment_count=installment_count,
+                monthly_payment=payment, status='approved',
+                start_date=today - timedelta(days=rng.randint(min_age_days, max(min_age_days, 730))),
+            )
+            for _ in range(min(SEED_BATCH_SIZE, order_count - offset))
+        ])
+        # order_date is set on insert; backdate it to the schedule start
+        Order.objects.filter(pk__in=[order.pk for order in orders]).update(
+            order_date=Cast('start_date', DateTimeField()),
+        )
+        if schedules:
+            _seed_schedules(orders, rng, paid_ratio, late_ratio, today)
+
+        if stdout is not None:
+            stdout.write(f'Seeded {offset + len(orders)}/{order_count} orders')
+
+    # Give the planner statistics of the seeded rows
+    if connection.vendor == 'postgresql':
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+    return seller
+
+
+def _seed_schedules(orders, rng, paid_ratio, late_ratio, today):
+    installments = build_installments(orders, today=today)
+    payments = []
+    for installment in installments:
+        if installment.due_date > today or rng.random() >= paid_ratio:
+            continue
+        delay = rng.randrange(1, 30) if rng.random() < late_ratio else -rng.randrange(5)
+        installment.status = 'paid'
+        installment.paid_date = min(installment.due_date + timedelta(days=delay), today)
+        payments.append(Payment(
+            organization_id=installment.organization_id, order=installment.order, installment=installment,
+            amount=installment.amount, payment_method='cash',
+            payment_date=timezone.make_aware(datetime.combine(installment.paid_date, dt_time(12))),
+        ))
+    Installment.objects.bulk_create(installments, batch_size=SEED_BATCH_SIZE)
+    Payment.objects.bulk_create(payments, batch_size=SEED_BATCH_SIZE)
+    Order.objects.filter(pk__in=[order.pk for order in orders]).refresh_balances(today)
@@ -0,0 +1,110 @@
+"""Date range helpers shared by the report, dashboard and metrics code"""
+from datetime import date, datetime, time, timedelta
+
+from django.db import models
+from django.db.models.functions import Trunc
+from django.utils import timezone
+
+
+def parse_date_range(range_key: str = None, start_date: str = None, end_date: str = None):
+    """Return (start_date, end_date) date objects for given range_key or explicit dates.
+
+    Supported range_key values: today, yesterday, last_7, last_30, last_90, last_year, this_month, last_month
+    If start_date/end_date provided (ISO YYYY-MM-DD) they take precedence.
+    """
+    today = timezone.now().date()
+    if start_date and end_date:
+        try:
+            sd = datetime.fromisoformat(start_date).date()
+            ed = datetime.fromisoformat(end_date).date()
+            return sd, ed
+        except Exception:
+            return None, None
+
+    if not range_key:
+        return None, None
+
+    key = (range_key or '').lower()
+    if key in ('today',):
+        return today, today
+    if key in ('yesterday', 'yesterdan'):
+        y = today - timedelta(days=1)
+        return y, y
+    if key in ('last_7', 'last7', '7days'):
+        sd = today - timedelta(days=6)
+        return sd, today
+    if key in ('last_30', 'last30', '30days'):
+        sd = today - timedelta(days=29)
+        return sd, today
+    if key in ('last_90', 'last90', '90days'):
+        sd = today - timedelta(days=89)
+        return sd, today
+    if key in ('last_year', 'lastyear', '365days'):
+        sd = today - timedelta(days=365)
+        return sd, today
+    if key in ('this_month', 'month'):
+        sd = today.replace(day=1)
+        return sd, today
+    if key in ('last_month',):
+        first_of_this = today.replace(day=1)
+        last_month_end = first_of_this - timedelta(days=1)
+        last_month_start = last_month_end.replace(day=1)
+        return last_month_start, last_month_end
+
+    return None, None
+
+
+def date_range_bounds(start_date, end_date):
+    """Return timezone-aware ``[start 00:00, end + 1 day 00:00)`` datetime bounds"""
+    start = timezone.make_aware(datetime.combine(start_date, time.min))
+    end = timezone.make_aware(datetime.combine(end_date + timedelta(days=1), time.min))
+    return start, end
+
+
+def filter_date_range(queryset, field, start_date, end_date):
+    """Filter ``queryset`` to the inclusive ``[start_date, end_date]`` range.
+
+    The range is applied as half-open bounds on the raw column (no ``__date``
+    cast), so an index on ``field`` can be used for a range scan. Date
+    fields are compared with dates, datetime fields with aware datetimes.
+    """
+    if not (start_date and end_date):
+        return queryset
+
+    if isinstance(queryset.model._meta.get_field(field), models.DateTimeField):
+        start, end = date_range_bounds(start_date, end_date)
+    else:
+        start, end = start_date, end_date + timedelta(days=1)
+
+    return queryset.filter(**{f'{field}__gte': start, f'{field}__lt': end})
+
+
+def trend_periods(today, months, granularity):
+    """Return the start dates of every ``granularity`` period in the last ``months`` calendar months"""
+    month_index = today.year * 12 + today.month - 1 - (months - 1)
+    current = date(month_index // 12, month_index % 12 + 1, 1)
+    if granularity == 'week':
+        current -= timedelta(days=current.weekday())
+
+    periods = []
+    while current <= today:
+        periods.append(current)
+        if granularity == 'month':
+            current = (current.replace(day=28) + timedelta(days=4)).replace(day=1)
+        elif granularity == 'week':
+            current += timedelta(days=7)
+        else:
+            current += timedelta(days=1)
+    return periods
+
+
+def period_totals(queryset, field, granularity, since, until, **aggregates):
+    """Return ``{period_start: {name: value}}`` for ``aggregates`` grouped by truncated ``field``"""
+    rows = (
+        filter_date_range(queryset, field, since, until)
+        .annotate(period=Trunc(field, granularity, output_field=models.DateField()))
+        .order_by()
+        .values('period')
+        .annotate(**aggregates)
+    )
+    return {row.pop('period'): row for row in rows}
@@ -0,0 +1,170 @@
+"""Streaming CSV/NDJSON exports of report rows.
+
+Rows are read with ``values()`` projections through ``.iterator()`` and
+written out in chunks, so memory stays flat however many rows are exported.
+"""
+import csv
+import io
+import json
+from datetime import date, datetime
+from decimal import Decimal
+
+from django.http import StreamingHttpResponse
+from rest_framework.renderers import BaseRenderer
+
+EXPORT_CHUNK_SIZE = 2000
+
+# report type -> exported columns (``values()`` lookups)
+EXPORT_COLUMNS = {
+    'orders': [
+        'id', 'order_date', 'status', 'customer_id', 'customer__first_name', 'customer__last_name',
+        'product_id', 'product__name', 'quantity', 'total_amount', 'down_payment', 'installment_count',
+        'monthly_payment', 'amount_paid', 'remaining_balance', 'next_due_date', 'overdue_count', 'start_date',
+    ],
+    'payments': [
+        'id', 'payment_date', 'order_id', 'order__customer_id', 'order__product_id', 'installment_id',
+        'amount', 'payment_method', 'reference_number',
+    ],
+    'installments': [
+        'id', 'order_id', 'order__customer_id', 'order__product_id', 'installment_number',
+        'due_date', 'amount', 'status', 'paid_date',
+    ],
+}
+
+EXPORT_FORMATS = {
+    'csv': 'text/csv',
+    'ndjson': 'application/x-ndjson',
+}
+
+
+def _format_value(value):
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return str(value)
+    return value
+
+
+def _iter_rows(querysets):
+    """Yield ``(report_type, row)`` for every row of ``{report_type: queryset}``"""
+    for report_type, queryset in querysets.items():
+        columns = EXPORT_COLUMNS[report_type]
+        rows = queryset.order_by('pk').values_list(*columns).iterator(chunk_size=EXPORT_CHUNK_SIZE)
+        for row in rows:
+            yield report_type, dict(zip(columns, map(_format_value, row)))
+
+
+def _chunked(lines):
+    buffer = []
+    for line in lines:
+        buffer.append(line)
+        if len(buffer) >= EXPORT_CHUNK_SIZE:
+            yield ''.join(buffer)
+            buffer = []
+    if buffer:
+        yield ''.join(buffer)
+
+
+def _csv_lines(querysets):
+    # A single CSV holds every requested type: a leading ``type`` column plus
+    # the union of their columns, left empty where a type has no such column
+    columns = []
+    for report_type in querysets:
+        columns.extend(c for c in EXPORT_COLUMNS[report_type] if c not in columns)
+    header = ['type'] + columns if len(querysets) > 1 else columns
+
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+
+    def line(values):
+        writer.writerow(values)
+        value = buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+        return value
+
+    yield line(header)
+    for report_type, row in _iter_rows(querysets):
+        values = [row.get(column) for column in columns]
+        yield line([report_type] + values if len(querysets) > 1 else values)
+
+
+def _ndjson_lines(querysets):
+    for report_type, row in _iter_rows(querysets):
+        yield json.dumps({'type': report_type, **row}) + '\n'
+
+
+def export_lines(querysets, export_format):
+    """Yield the CSV or NDJSON lines exporting ``{report_type: queryset}``"""
+    return _csv_lines(querysets) if export_format == 'csv' else _ndjson_lines(querysets)
+
+
+def _flatten(data, prefix=''):
+    if isinstance(data, dict):
+        items = data.items()
+    elif isinstance(data, list):
+        items = enumerate(data)
+    else:
+        yield prefix, _format_value(data)
+        return
+    for key, value in items:
+        yield from _flatten(value, f'{prefix}.{key}' if prefix else str(key))
+
+
+def document_lines(data, export_format):
+    """Yield the lines exporting a nested report document.
+
+    CSV gets one ``field,value`` row per leaf with dotted field paths
+    (e.g. ``summary.orders.total``), NDJSON the whole document on one line.
+    """
+    if export_format != 'csv':
+        yield json.dumps(data, default=str) + '\n'
+        return
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(['field', 'value'])
+    for field, value in _flatten(data):
+        writer.writerow([field, value])
+    yield buffer.getvalue()
+
+
+def stream_export(querysets, export_format, filename):
+    """Return a streaming response exporting ``{report_type: queryset}`` as CSV or NDJSON"""
+    lines = export_lines(querysets, export_format)
+    response = StreamingHttpResponse(_chunked(lines), content_type=EXPORT_FORMATS[export_format])
+    response['Content-Disposition'] = f'attachment; filename="{filename}.{export_format}"'
+    return response
+
+
+class CSVRenderer(BaseRenderer):
+    """Lets ``?format=csv`` through content negotiation; exports stream their own body.
+
+    Anything else (e.g. an error dict) is rendered as a one-row CSV.
+    """
+    media_type = 'text/csv'
+    format = 'csv'
+    charset = 'utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return ''
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        if isinstance(data, dict):
+            writer.writerow(data.keys())
+            writer.writerow(data.values())
+        else:
+            writer.writerow([data])
+        return buffer.getvalue()
+
+
+class NDJSONRenderer(BaseRenderer):
+    """Lets ``?format=ndjson`` through content negotiation; other data is one JSON line"""
+    media_type = 'application/x-ndjson'
+    format = 'ndjson'
+    charset = 'utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return ''
+        return json.dumps(data, default=str) + '\n'
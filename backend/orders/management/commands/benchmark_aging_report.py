@@ -0,0 +1,29 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from orders.benchmarks import measure, rolled_back, seed_benchmark_seller
+from orders.reports import build_aging_report
+
+
+class Command(BaseCommand):
+    help = 'Benchmark the receivables aging report today and as of a past date; seeded data is rolled back'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--installments', type=int, default=1_000_000)
+        parser.add_argument('--installments-per-order', type=int, default=12)
+
+    def handle(self, *args, **options):
+        per_order = options['installments_per_order']
+        as_of = timezone.now().date() - timedelta(days=365)
+        with rolled_back():
+            seller = seed_benchmark_seller(-(-options['installments'] // per_order), per_order, stdout=self.stdout)
+
+            for label, params in (('today', {}), (f'as of {as_of}', {'as_of': as_of.isoformat()})):
+                with measure() as measurement:
+                    report = build_aging_report(seller, params)
+                self.stdout.write(
+                    f"{label}: {len(report['customers'])} customers, {len(report['products'])} products, "
+                    f"{report['totals']['total']} outstanding, {measurement}"
+                )
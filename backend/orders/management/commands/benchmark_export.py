@@ -0,0 +1,39 @@
+from django.core.management.base import BaseCommand
+
+from orders.benchmarks import format_bytes, measure, rolled_back, rss_bytes, seed_benchmark_seller
+from orders.exports import EXPORT_COLUMNS, EXPORT_FORMATS, stream_export
+from orders.reports import detailed_report_querysets
+
+
+class Command(BaseCommand):
+    help = 'Benchmark the streamed detailed report export (rows, time and peak RSS); seeded data is rolled back'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--installments', type=int, default=1_000_000, help='Installments to seed and export')
+        parser.add_argument('--installments-per-order', type=int, default=12)
+        parser.add_argument('--format', choices=list(EXPORT_FORMATS), default='csv')
+        parser.add_argument('--type', choices=['all', *EXPORT_COLUMNS], default='installments')
+
+    def handle(self, *args, **options):
+        per_order = options['installments_per_order']
+        with rolled_back():
+            seller = seed_benchmark_seller(-(-options['installments'] // per_order), per_order, stdout=self.stdout)
+
+            querysets = detailed_report_querysets(seller, {})
+            if options['type'] != 'all':
+                querysets = {options['type']: querysets[options['type']]}
+
+            baseline = peak = rss_bytes()
+            size = lines = 0
+            with measure() as measurement:
+                response = stream_export(querysets, options['format'], 'benchmark')
+                for chunk in response.streaming_content:
+                    size += len(chunk)
+                    lines += chunk.count(b'\n')
+                    peak = max(peak, rss_bytes())
+
+        self.stdout.write(f"Exported {lines} lines ({format_bytes(size)}) as {options['format']}: {measurement}")
+        self.stdout.write(
+            f'RSS before export {format_bytes(baseline)}, peak during export {format_bytes(peak)} '
+            f'(+{format_bytes(peak - baseline)})'
+        )
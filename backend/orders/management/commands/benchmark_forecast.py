@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand
+
+from orders.benchmarks import format_bytes, measure, rolled_back, rss_bytes, seed_benchmark_seller
+from orders.forecast import build_cash_flow_forecast
+
+
+class Command(BaseCommand):
+    help = 'Benchmark the cash-flow forecast (time, queries and RSS growth); seeded data is rolled back'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--installments', type=int, default=5_000_000)
+        parser.add_argument('--installments-per-order', type=int, default=12)
+
+    def handle(self, *args, **options):
+        per_order = options['installments_per_order']
+        with rolled_back():
+            seller = seed_benchmark_seller(-(-options['installments'] // per_order), per_order, stdout=self.stdout)
+
+            for granularity in ('month', 'week'):
+                baseline = rss_bytes()
+                with measure() as measurement:
+                    forecast = build_cash_flow_forecast(seller, {'granularity': granularity})
+                self.stdout.write(
+                    f"{granularity}: {len(forecast['periods'])} periods, {forecast['totals']['scheduled']} scheduled, "
+                    f'{measurement}, RSS +{format_bytes(rss_bytes() - baseline)}'
+                )
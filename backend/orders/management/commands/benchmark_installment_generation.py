@@ -0,0 +1,38 @@
+from django.core.management.base import BaseCommand
+
+from orders.benchmarks import measure, rolled_back, seed_benchmark_seller
+from orders.models import Installment, Order
+from orders.tasks import generate_installments_for_order, generate_installments_for_orders
+
+
+class Command(BaseCommand):
+    help = (
+        'Benchmark installment generation per approval and in one batch (rows, queries, time); '
+        'seeded data is rolled back and the on-commit rollup refresh is not included'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--orders', type=int, default=200, help='Orders approved one by one, and again in one batch')
+        parser.add_argument('--installments-per-order', type=int, default=36)
+
+    def handle(self, *args, **options):
+        order_count = options['orders']
+        with rolled_back():
+            seller = seed_benchmark_seller(2 * order_count, options['installments_per_order'], schedules=False)
+            order_ids = list(Order.objects.filter(organization=seller.organization).order_by('pk').values_list('pk', flat=True))
+            single, batch = order_ids[:order_count], order_ids[order_count:]
+
+            with measure() as per_order:
+                for order_id in single:
+                    generate_installments_for_order(order_id)
+            single_rows = Installment.objects.filter(order_id__in=single).count()
+
+            with measure() as batched:
+                generate_installments_for_orders(batch)
+            batch_rows = Installment.objects.filter(order_id__in=batch).count()
+
+        self.stdout.write(
+            f'generate_installments_for_order: {single_rows} rows for {order_count} orders, {per_order}; '
+            f'{per_order.queries / order_count:.1f} queries and {single_rows / order_count:.0f} rows per approval'
+        )
+        self.stdout.write(f'generate_installments_for_orders: {batch_rows} rows for {order_count} orders, {batched}')
@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand
+
+from orders.benchmarks import measure, rolled_back, seed_benchmark_seller
+from orders.models import Order
+from orders.serializers import OrderSerializer
+
+
+class Command(BaseCommand):
+    help = (
+        'Benchmark serializing every order of a seller with all relations expanded, '
+        'without and with Order.objects.for_serialization(); seeded data is rolled back'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--orders', type=int, default=10_000)
+        parser.add_argument('--installments-per-order', type=int, default=12)
+
+    def handle(self, *args, **options):
+        with rolled_back():
+            seller = seed_benchmark_seller(options['orders'], options['installments_per_order'], stdout=self.stdout)
+            orders = Order.objects.filter(product__seller=seller)
+
+            for label, queryset in (('plain queryset', orders), ('for_serialization()', orders.for_serialization())):
+                with measure() as measurement:
+                    data = OrderSerializer(queryset, many=True, expand=OrderSerializer.EXPANDABLE_FIELDS).data
+                self.stdout.write(f'{label}: {len(data)} orders, {measurement}')
@@ -0,0 +1,54 @@
+from django.core.mail.backends.locmem import EmailBackend
+from django.core.management.base import BaseCommand
+from django.test.utils import override_settings
+from django.utils import timezone
+
+from orders.benchmarks import measure, rolled_back, seed_benchmark_seller
+from orders.models import Installment, PaymentReminder, ReminderRun, ReminderShard
+from orders.reminders import plan_reminder_shards
+from orders.tasks import send_reminder_shard
+
+
+class CountingEmailBackend(EmailBackend):
+    """locmem backend counting the connections opened"""
+    opened = 0
+
+    def open(self):
+        CountingEmailBackend.opened += 1
+        return super().open()
+
+
+class Command(BaseCommand):
+    help = (
+        'Benchmark sending the daily reminder shards through the locmem email backend '
+        '(queries, time and mail connections); seeded data is rolled back'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--overdue', type=int, default=100_000, help='Overdue installments to seed')
+        parser.add_argument('--installments-per-order', type=int, default=12)
+
+    def handle(self, *args, **options):
+        per_order = options['installments_per_order']
+        today = timezone.now().date()
+        backend = f'{__name__}.CountingEmailBackend'
+        with rolled_back(), override_settings(EMAIL_BACKEND=backend):
+            # Every installment of orders started over a year ago is overdue
+            seller = seed_benchmark_seller(
+                -(-options['overdue'] // per_order), per_order, paid_ratio=0, min_age_days=400, stdout=self.stdout,
+            )
+            overdue = Installment.objects.filter(organization=seller.organization, status='overdue').count()
+
+            ReminderRun.objects.filter(run_date=today).delete()
+            with measure() as measurement:
+                run = ReminderRun.objects.create(run_date=today)
+                shards = ReminderShard.objects.bulk_create(plan_reminder_shards(run))
+                for shard in shards:
+                    send_reminder_shard.apply(args=[shard.pk])
+            reminders = PaymentReminder.objects.filter(organization=seller.organization).count()
+            sent = sum(ReminderShard.objects.filter(run=run).values_list('sent', flat=True))
+
+        self.stdout.write(
+            f'{overdue} overdue installments in {len(shards)} shards: {sent} emails sent, '
+            f'{reminders} reminder rows, {CountingEmailBackend.opened} mail connections, {measurement}'
+        )
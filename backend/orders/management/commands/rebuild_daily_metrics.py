@@ -0,0 +1,34 @@
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+
+from orders.metrics import rebuild_daily_metrics
+from user.models import Organization
+
+
+class Command(BaseCommand):
+    help = 'Backfill or rebuild the daily organization metrics rollup from orders, payments and installments'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--organization', type=int, help='Only rebuild this organization id')
+        parser.add_argument('--start-date', help='First day to rebuild (YYYY-MM-DD)')
+        parser.add_argument('--end-date', help='Last day to rebuild (YYYY-MM-DD)')
+
+    def handle(self, *args, **options):
+        try:
+            start_date = date.fromisoformat(options['start_date']) if options['start_date'] else None
+            end_date = date.fromisoformat(options['end_date']) if options['end_date'] else None
+        except ValueError as exc:
+            raise CommandError(f'Invalid date: {exc}')
+        if bool(start_date) != bool(end_date):
+            raise CommandError('--start-date and --end-date must be given together')
+
+        organizations = Organization.objects.all()
+        if options['organization']:
+            organizations = organizations.filter(pk=options['organization'])
+
+        for organization_id in organizations.values_list('pk', flat=True):
+            days = rebuild_daily_metrics(organization_id, start_date, end_date)
+            self.stdout.write(f'Organization #{organization_id}: rebuilt {days} days')
+
+        self.stdout.write(self.style.SUCCESS('Daily metrics rebuilt'))
@@ -0,0 +1,44 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from orders.models import Order
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the denormalized order balance columns and verify them against payments and installments'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--organization', type=int, help='Only process orders of this organization id')
+        parser.add_argument('--verify', action='store_true', help='Only report mismatches, do not rebuild')
+
+    def handle(self, *args, **options):
+        orders = Order.objects.all()
+        if options['organization']:
+            orders = orders.filter(organization_id=options['organization'])
+
+        if not options['verify']:
+            with transaction.atomic():
+                updated = orders.refresh_balances()
+            self.stdout.write(f'Rebuilt balances for {updated} orders')
+
+        mismatches = self.find_mismatches(orders)
+        for order_id, field, stored, computed in mismatches:
+            self.stdout.write(f'Order #{order_id}: {field} is {stored}, expected {computed}')
+
+        if mismatches:
+            raise CommandError(f'{len(mismatches)} balance mismatches found')
+
+        self.stdout.write(self.style.SUCCESS('Order balances are consistent'))
+
+    def find_mismatches(self, orders):
+        fields = Order.LEDGER_FIELDS
+        rows = orders.with_computed_balances().values(
+            'id', *fields, *(f'computed_{field}' for field in fields)
+        )
+
+        mismatches = []
+        for row in rows.iterator(chunk_size=2000):
+            for field in fields:
+                if row[field] != row[f'computed_{field}']:
+                    mismatches.append((row['id'], field, row[field], row[f'computed_{field}']))
+        return mismatches
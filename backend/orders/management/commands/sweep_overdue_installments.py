@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from orders.tasks import sweep_overdue_installments
+
+
+class Command(BaseCommand):
+    help = 'Mark pending installments past their due date as overdue'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--organization', type=int, action='append', help='Only sweep this organization id (repeatable)')
+
+    def handle(self, *args, **options):
+        result = sweep_overdue_installments(organization_ids=options['organization'])
+        self.stdout.write(self.style.SUCCESS(result))
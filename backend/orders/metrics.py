@@ -0,0 +1,185 @@
+"""Daily per-organization metrics rollup.
+
+``DailyOrgMetrics`` rows are recomputed from the source tables for the days
+a write touches, once the write has committed, so dashboards and reports
+can sum a handful of small rows instead of re-aggregating raw history.
+``rebuild_daily_metrics`` recomputes every row of an organization.
+"""
+from decimal import Decimal
+
+from django.db import models, transaction
+from django.db.models import Count, Q, Sum
+from django.db.models.functions import Coalesce, Trunc
+
+from core.cache import bump_report_version
+from customers.models import Customer
+from .dates import filter_date_range
+from .models import DailyOrgMetrics, Installment, Order, Payment
+
+
+def _money_sum(field, **kwargs):
+    return Coalesce(
+        Sum(field, **kwargs),
+        models.Value(Decimal('0')),
+        output_field=models.DecimalField(max_digits=14, decimal_places=2),
+    )
+
+
+def _order_columns():
+    columns = {'orders_total': Count('id')}
+    for value, _ in Order.STATUS_CHOICES:
+        columns[f'orders_{value}'] = Count('id', filter=Q(status=value))
+    return columns
+
+
+def _payment_columns():
+    columns = {'payments_count': Count('id'), 'revenue_total': _money_sum('amount')}
+    for value, _ in Payment.PAYMENT_METHOD_CHOICES:
+        columns[f'{value}_count'] = Count('id', filter=Q(payment_method=value))
+        columns[f'{value}_revenue'] = _money_sum('amount', filter=Q(payment_method=value))
+    return columns
+
+
+def _installment_columns():
+    unpaid = ~Q(status='paid')
+    return {
+        'installments_due': Count('id'),
+        'installments_due_amount': _money_sum('amount'),
+        'installments_paid': Count('id', filter=Q(status='paid')),
+        'installments_unpaid': Count('id', filter=unpaid),
+        'outstanding_amount': _money_sum('amount', filter=unpaid),
+    }
+
+
+# source name -> (model, date field, column aggregates)
+SOURCES = {
+    'customers': (Customer, 'created_at', lambda: {'new_customers': Count('id')}),
+    'orders': (Order, 'order_date', _order_columns),
+    'payments': (Payment, 'payment_date', _payment_columns),
+    'installments': (Installment, 'due_date', _installment_columns),
+}
+
+
+def compute_daily_metrics(organization_id, start_date=None, end_date=None, sources=None, days=None):
+    """Aggregate the source tables of an organization per day.
+
+    Returns ``({day: {column: value}}, columns)`` for the given sources
+    (all by default), optionally limited to an inclusive date range and,
+    for date columns, to the listed ``days``.
+    """
+    metrics = {}
+    columns = []
+    for source in sources or SOURCES:
+        model, field, aggregates = SOURCES[source]
+        aggregates = aggregates()
+        columns.extend(aggregates)
+
+        queryset = filter_date_range(model.objects.filter(organization_id=organization_id), field, start_date, end_date)
+        if days is not None and not isinstance(model._meta.get_field(field), models.DateTimeField):
+            queryset = queryset.filter(**{f'{field}__in': days})
+        rows = (
+            queryset
+            .annotate(day=Trunc(field, 'day', output_field=models.DateField()))
+            .order_by()
+            .values('day')
+            .annotate(**aggregates)
+        )
+        for row in rows:
+            metrics.setdefault(row.pop('day'), {}).update(row)
+
+    return metrics, columns
+
+
+def _upsert(organization_id, metrics, columns, days):
+    rows = [
+        DailyOrgMetrics(
+            organization_id=organization_id,
+            date=day,
+            **{column: metrics.get(day, {}).get(column, 0) for column in columns},
+        )
+        for day in days
+    ]
+    DailyOrgMetrics.objects.bulk_create(
+        rows,
+        batch_size=500,
+        update_conflicts=True,
+        unique_fields=['organization', 'date'],
+        update_fields=columns + ['updated_at'],
+    )
+
+
+def refresh_daily_metrics(organization_id, days, sources=None):
+    """Recompute the rollup rows of ``days`` for the given sources"""
+    days = sorted({day for day in days if day})
+    if organization_id is None or not days:
+        return
+
+    with transaction.atomic():
+        # Serialize concurrent refreshes of the same rows
+        list(DailyOrgMetrics.objects.select_for_update().filter(organization_id=organization_id, date__in=days).values_list('pk'))
+        metrics, columns = compute_daily_metrics(organization_id, days[0], days[-1], sources, days=days)
+        _upsert(organization_id, metrics, columns, days)
+    bump_report_version(organization_id)
+
+
+class _PendingRefreshes(dict):
+    """``{organization_id: (days, sources)}`` queued in one transaction; called once it commits"""
+    done = False
+
+    def __call__(self):
+        self.done = True
+        for organization_id, (days, sources) in self.items():
+            if days:
+                refresh_daily_metrics(organization_id, days, [source for source in SOURCES if source in sources])
+            else:
+                bump_report_version(organization_id)
+
+
+def _queue(organization_id, days, sources):
+    connection = transaction.get_connection()
+    if not connection.in_atomic_block:
+        _PendingRefreshes({organization_id: (set(days), set(sources))})()
+        return
+
+    # A commit runs the pending refreshes, a rollback (of the savepoint
+    # they were queued in) drops them from the commit hooks
+    pending = getattr(connection, 'pending_metric_refreshes', None)
+    if pending is None or pending.done or not any(hook[1] is pending for hook in connection.run_on_commit):
+        pending = connection.pending_metric_refreshes = _PendingRefreshes()
+        transaction.on_commit(pending)
+    queued_days, queued_sources = pending.setdefault(organization_id, (set(), set()))
+    queued_days.update(days)
+    queued_sources.update(sources)
+
+
+def refresh_daily_metrics_on_commit(organization_id, days, sources=None):
+    """Refresh the rollup once the current transaction commits.
+
+    Refreshes queued in one transaction are merged into a single refresh
+    per organization, so a cascade delete or a schedule rewrite touching
+    many rows refreshes each organization once. A refresh also bumps the
+    organization's report version.
+    """
+    if organization_id is not None:
+        _queue(organization_id, days, sources or SOURCES)
+
+
+def invalidate_reports_on_commit(organization_id):
+    """Bump the report version once the current transaction commits.
+
+    Merged with the refreshes queued in the transaction, which bump it
+    anyway, so the version goes up once per organization.
+    """
+    if organization_id is not None:
+        _queue(organization_id, [], [])
+
+
+def rebuild_daily_metrics(organization_id, start_date=None, end_date=None):
+    """Replace every rollup row of an organization (optionally within a date range)"""
+    with transaction.atomic():
+        existing = filter_date_range(DailyOrgMetrics.objects.filter(organization_id=organization_id), 'date', start_date, end_date)
+        existing.delete()
+        metrics, columns = compute_daily_metrics(organization_id, start_date, end_date)
+        _upsert(organization_id, metrics, columns, sorted(metrics))
+    bump_report_version(organization_id)
+    return len(metrics)
@@ -0,0 +1,65 @@
+# Generated by Django 4.2.7 on 2026-10-17 02:08
+
+from decimal import Decimal
+
+from django.db import migrations, models
+from django.db.models import Count, F, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+
+def populate_balances(apps, schema_editor):
+    Order = apps.get_model('orders', 'Order')
+    Payment = apps.get_model('orders', 'Payment')
+    Installment = apps.get_model('orders', 'Installment')
+    money = models.DecimalField(max_digits=10, decimal_places=2)
+    today = timezone.now().date()
+
+    payments = Payment.objects.filter(order=OuterRef('pk')).order_by().values('order')
+    amount_paid = Coalesce(
+        Subquery(payments.annotate(total=Sum('amount')).values('total')),
+        Value(Decimal('0')),
+        output_field=money,
+    )
+    unpaid = Installment.objects.filter(order=OuterRef('pk')).exclude(status='paid').order_by()
+
+    Order.objects.update(
+        amount_paid=amount_paid,
+        remaining_balance=F('total_amount') - F('down_payment') - amount_paid,
+        next_due_date=Subquery(unpaid.order_by('due_date').values('due_date')[:1]),
+        overdue_count=Coalesce(
+            Subquery(unpaid.filter(due_date__lt=today).values('order').annotate(count=Count('pk')).values('count')),
+            Value(0),
+        ),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0002_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='order',
+            name='amount_paid',
+            field=models.DecimalField(decimal_places=2, default=0, max_digits=10),
+        ),
+        migrations.AddField(
+            model_name='order',
+            name='next_due_date',
+            field=models.DateField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='order',
+            name='overdue_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='order',
+            name='remaining_balance',
+            field=models.DecimalField(decimal_places=2, default=0, max_digits=10),
+        ),
+        migrations.RunPython(populate_balances, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,45 @@
+# Generated by Django 4.2.7 on 2026-10-17 02:14
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0003_order_balance_ledger'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='installment',
+            index=models.Index(fields=['organization', 'status', 'due_date'], name='inst_org_status_due_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='installment',
+            index=models.Index(condition=models.Q(('status', 'pending')), fields=['organization', 'due_date'], name='inst_pending_due_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['organization', '-order_date'], name='order_org_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['organization', 'status', '-order_date'], name='order_org_status_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='payment',
+            index=models.Index(fields=['order', 'payment_date'], name='payment_order_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='payment',
+            index=models.Index(fields=['organization', 'payment_date'], name='payment_org_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='paymentreminder',
+            index=models.Index(fields=['scheduled_date', 'status'], name='reminder_sched_status_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='paymentreminder',
+            index=models.Index(fields=['organization', '-created_at'], name='reminder_org_created_idx'),
+        ),
+    ]
@@ -0,0 +1,125 @@
+# Generated by Django 4.2.7 on 2026-10-17 02:17
+
+from decimal import Decimal
+
+from django.db import migrations, models
+from django.db.models import Count, Q, Sum, Value
+from django.db.models.functions import Coalesce, Trunc
+import django.db.models.deletion
+
+# Choices as of this migration
+ORDER_STATUSES = ['pending', 'approved', 'active', 'completed', 'cancelled']
+PAYMENT_METHODS = ['cash', 'card', 'bank_transfer', 'check', 'other']
+
+
+def backfill_daily_metrics(apps, schema_editor):
+    # Same rollup as orders.metrics, over the models of this migration
+    Customer = apps.get_model('customers', 'Customer')
+    Order = apps.get_model('orders', 'Order')
+    Payment = apps.get_model('orders', 'Payment')
+    Installment = apps.get_model('orders', 'Installment')
+    DailyOrgMetrics = apps.get_model('orders', 'DailyOrgMetrics')
+
+    def money(field, **kwargs):
+        return Coalesce(
+            Sum(field, **kwargs), Value(Decimal('0')),
+            output_field=models.DecimalField(max_digits=14, decimal_places=2),
+        )
+
+    unpaid = ~Q(status='paid')
+    sources = [
+        (Customer, 'created_at', {'new_customers': Count('id')}),
+        (Order, 'order_date', {
+            'orders_total': Count('id'),
+            **{f'orders_{value}': Count('id', filter=Q(status=value)) for value in ORDER_STATUSES},
+        }),
+        (Payment, 'payment_date', {
+            'payments_count': Count('id'),
+            'revenue_total': money('amount'),
+            **{f'{value}_count': Count('id', filter=Q(payment_method=value)) for value in PAYMENT_METHODS},
+            **{f'{value}_revenue': money('amount', filter=Q(payment_method=value)) for value in PAYMENT_METHODS},
+        }),
+        (Installment, 'due_date', {
+            'installments_due': Count('id'),
+            'installments_due_amount': money('amount'),
+            'installments_paid': Count('id', filter=Q(status='paid')),
+            'installments_unpaid': Count('id', filter=unpaid),
+            'outstanding_amount': money('amount', filter=unpaid),
+        }),
+    ]
+
+    metrics = {}
+    for model, field, aggregates in sources:
+        rows = (
+            model.objects
+            .annotate(day=Trunc(field, 'day', output_field=models.DateField()))
+            .order_by()
+            .values('organization_id', 'day')
+            .annotate(**aggregates)
+        )
+        for row in rows.iterator():
+            metrics.setdefault((row.pop('organization_id'), row.pop('day')), {}).update(row)
+
+    DailyOrgMetrics.objects.bulk_create(
+        [
+            DailyOrgMetrics(organization_id=organization_id, date=day, **columns)
+            for (organization_id, day), columns in metrics.items()
+        ],
+        batch_size=500,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('user', '0001_initial'),
+        ('customers', '0002_initial'),
+        ('orders', '0004_query_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyOrgMetrics',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('is_active', models.BooleanField(default=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('date', models.DateField()),
+                ('new_customers', models.PositiveIntegerField(default=0)),
+                ('orders_total', models.PositiveIntegerField(default=0)),
+                ('orders_pending', models.PositiveIntegerField(default=0)),
+                ('orders_approved', models.PositiveIntegerField(default=0)),
+                ('orders_active', models.PositiveIntegerField(default=0)),
+                ('orders_completed', models.PositiveIntegerField(default=0)),
+                ('orders_cancelled', models.PositiveIntegerField(default=0)),
+                ('payments_count', models.PositiveIntegerField(default=0)),
+                ('revenue_total', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('cash_count', models.PositiveIntegerField(default=0)),
+                ('cash_revenue', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('card_count', models.PositiveIntegerField(default=0)),
+                ('card_revenue', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('bank_transfer_count', models.PositiveIntegerField(default=0)),
+                ('bank_transfer_revenue', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('check_count', models.PositiveIntegerField(default=0)),
+                ('check_revenue', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('other_count', models.PositiveIntegerField(default=0)),
+                ('other_revenue', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('installments_due', models.PositiveIntegerField(default=0)),
+                ('installments_due_amount', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('installments_paid', models.PositiveIntegerField(default=0)),
+                ('installments_unpaid', models.PositiveIntegerField(default=0)),
+                ('outstanding_amount', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('organization', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='%(class)s_organization', to='user.organization')),
+            ],
+            options={
+                'verbose_name_plural': 'Daily organization metrics',
+                'ordering': ['date'],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='dailyorgmetrics',
+            constraint=models.UniqueConstraint(fields=('organization', 'date'), name='daily_metrics_org_date_uniq'),
+        ),
+        migrations.RunPython(backfill_daily_metrics, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,49 @@
+# Generated by Django 4.2.7 on 2026-10-17 02:26
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('core', '0002_initial'),
+        ('user', '0001_initial'),
+        ('orders', '0005_daily_org_metrics'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ReportJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('is_active', models.BooleanField(default=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('report_type', models.CharField(choices=[('detailed', 'Detailed report'), ('summary', 'Reports summary')], max_length=20)),
+                ('export_format', models.CharField(choices=[('csv', 'CSV (gzip)'), ('ndjson', 'NDJSON (gzip)')], default='csv', max_length=10)),
+                ('params', models.JSONField(blank=True, default=dict)),
+                ('params_key', models.CharField(max_length=255)),
+                ('data_version', models.BigIntegerField(blank=True, null=True)),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('running', 'Running'), ('completed', 'Completed'), ('failed', 'Failed')], default='pending', max_length=20)),
+                ('artifact', models.FileField(blank=True, upload_to='reports/%Y/%m/')),
+                ('row_count', models.PositiveIntegerField(default=0)),
+                ('error', models.TextField(blank=True)),
+                ('started_at', models.DateTimeField(blank=True, null=True)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+                ('organization', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='%(class)s_organization', to='user.organization')),
+                ('requested_by', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to=settings.AUTH_USER_MODEL)),
+                ('seller', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='report_jobs', to='core.seller')),
+            ],
+            options={
+                'ordering': ['-created_at'],
+                'indexes': [models.Index(fields=['seller', 'report_type', 'export_format', 'params_key', 'status'], name='report_job_lookup_idx')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='reportjob',
+            constraint=models.UniqueConstraint(condition=models.Q(('status__in', ['pending', 'running'])), fields=('seller', 'report_type', 'export_format', 'params_key'), name='report_job_outstanding_uniq'),
+        ),
+    ]
@@ -0,0 +1,41 @@
+# Generated by Django 4.2.7 on 2026-10-17 02:28
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0006_report_jobs'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='order',
+            name='order_org_date_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='payment',
+            name='payment_org_date_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='paymentreminder',
+            name='reminder_org_created_idx',
+        ),
+        migrations.AddIndex(
+            model_name='installment',
+            index=models.Index(fields=['organization', 'due_date', 'id'], name='inst_org_due_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['organization', '-order_date', '-id'], name='order_org_date_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='payment',
+            index=models.Index(fields=['organization', '-payment_date', '-id'], name='payment_org_date_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='paymentreminder',
+            index=models.Index(fields=['organization', '-created_at', '-id'], name='reminder_org_created_id_idx'),
+        ),
+    ]
@@ -0,0 +1,22 @@
+# Generated by Django 4.2.7 on 2026-10-17 03:24
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0008_reminder_runs'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='paymentreminder',
+            name='reminder_day',
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+        migrations.AddConstraint(
+            model_name='paymentreminder',
+            constraint=models.UniqueConstraint(fields=('installment', 'reminder_type', 'reminder_day'), name='reminder_installment_day_uniq'),
+        ),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 4.2.7 on 2026-10-17 03:25
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0009_reminder_dedup'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='paymentreminder',
+            name='reminder_sched_status_idx',
+        ),
+        migrations.AlterField(
+            model_name='paymentreminder',
+            name='status',
+            field=models.CharField(choices=[('pending', 'Pending'), ('sent', 'Sent'), ('failed', 'Failed'), ('cancelled', 'Cancelled')], default='pending', max_length=20),
+        ),
+        migrations.AddIndex(
+            model_name='paymentreminder',
+            index=models.Index(fields=['status', 'scheduled_date'], name='reminder_status_sched_idx'),
+        ),
+    ]
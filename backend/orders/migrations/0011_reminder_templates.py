@@ -0,0 +1,57 @@
+# Generated by Django 4.2.7 on 2026-10-17 03:27
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('user', '0001_initial'),
+        ('orders', '0010_reminder_dispatch_queue'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='paymentreminder',
+            name='params',
+            field=models.JSONField(blank=True, default=dict),
+        ),
+        migrations.AddField(
+            model_name='paymentreminder',
+            name='template_kind',
+            field=models.CharField(blank=True, max_length=30),
+        ),
+        migrations.AlterField(
+            model_name='paymentreminder',
+            name='message',
+            field=models.TextField(blank=True),
+        ),
+        migrations.CreateModel(
+            name='ReminderTemplate',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('is_active', models.BooleanField(default=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('kind', models.CharField(choices=[('email_due_today', 'Email - due today'), ('email_overdue', 'Email - overdue'), ('in_app_due_today', 'In-app - due today'), ('in_app_overdue', 'In-app - overdue')], max_length=30)),
+                ('locale', models.CharField(default='en', max_length=10)),
+                ('subject', models.CharField(blank=True, max_length=200)),
+                ('body', models.TextField()),
+                ('version', models.PositiveIntegerField(default=1)),
+                ('organization', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='%(class)s_organization', to='user.organization')),
+            ],
+            options={
+                'ordering': ['kind', 'locale'],
+            },
+        ),
+        migrations.AddField(
+            model_name='paymentreminder',
+            name='template',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='reminders', to='orders.remindertemplate'),
+        ),
+        migrations.AddConstraint(
+            model_name='remindertemplate',
+            constraint=models.UniqueConstraint(fields=('organization', 'kind', 'locale'), name='reminder_template_kind_uniq'),
+        ),
+    ]
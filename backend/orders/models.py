@@ -1,13 +1,97 @@
-from django.db import models
+from django.db import models, transaction
+from django.db.models import Count, DecimalField, F, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
 from django.core.validators import MinValueValidator
 from django.utils import timezone
 from decimal import Decimal
 from products.models import Product
 from customers.models import Customer
-from core.models import BaseModel
+from core.models import BaseModel, Seller
 from user.models import CustomUser
 
 
+class OrderQuerySet(models.QuerySet):
+    """Queryset maintaining the denormalized balance columns of ``Order``.
+
+    The updates set ``updated_at`` like a save would, since it versions
+    the customer portal data.
+    """
+
+    def _computed_balances(self, today=None):
+        """Expressions deriving the ledger columns from payments and installments"""
+        today = today or timezone.now().date()
+        money = DecimalField(max_digits=10, decimal_places=2)
+
+        payments = Payment.objects.filter(order=OuterRef('pk')).order_by().values('order')
+        amount_paid = Coalesce(
+            Subquery(payments.annotate(total=Sum('amount')).values('total')),
+            Value(Decimal('0')),
+            output_field=money,
+        )
+
+        unpaid = Installment.objects.filter(order=OuterRef('pk')).exclude(status='paid').order_by()
+        overdue_count = Coalesce(
+            Subquery(unpaid.filter(due_date__lt=today).values('order').annotate(count=Count('pk')).values('count')),
+            Value(0),
+        )
+
+        return {
+            'amount_paid': amount_paid,
+            'remaining_balance': F('total_amount') - F('down_payment') - amount_paid,
+            'next_due_date': Subquery(unpaid.order_by('due_date').values('due_date')[:1]),
+            'overdue_count': overdue_count,
+        }
+
+    def add_payment(self, amount):
+        """Atomically move ``amount`` from the remaining balance to the paid total"""
+        return self.update(
+            amount_paid=F('amount_paid') + amount,
+            remaining_balance=F('remaining_balance') - amount,
+            updated_at=timezone.now(),
+        )
+
+    def refresh_schedule_summary(self, today=None):
+        """Recompute ``next_due_date`` and ``overdue_count`` from the installments"""
+        balances = self._computed_balances(today)
+        return self.update(
+            next_due_date=balances['next_due_date'],
+            overdue_count=balances['overdue_count'],
+            updated_at=timezone.now(),
+        )
+
+    def refresh_balances(self, today=None):
+        """Rebuild every ledger column from payments and installments"""
+        return self.update(**self._computed_balances(today), updated_at=timezone.now())
+
+    def for_serialization(self, expand=None):
+        """Load what ``OrderSerializer`` renders in a fixed number of queries.
+
+        ``expand`` limits the loaded relations to the expanded ones
+        (default: all of them).
+        """
+        expand = {'customer', 'product', 'installments', 'payments'} if expand is None else set(expand)
+        related = []
+        if 'customer' in expand:
+            related.append('customer__user')
+        if 'product' in expand:
+            related.extend(['product__category', 'product__seller'])
+        prefetches = []
+        if 'installments' in expand:
+            prefetches.append(models.Prefetch('installments', queryset=Installment.objects.order_by('installment_number')))
+        if 'payments' in expand:
+            prefetches.append(models.Prefetch('payments', queryset=Payment.objects.order_by('-payment_date')))
+
+        queryset = self.select_related(*related) if related else self
+        return queryset.prefetch_related(*prefetches)
+
+    def with_computed_balances(self, today=None):
+        """Annotate the ledger values derived from source rows as ``computed_<field>``"""
+        return self.annotate(**{
+            f'computed_{name}': expression
+            for name, expression in self._computed_balances(today).items()
+        })
+
+
 class Order(BaseModel):
     """Model representing an order"""
     STATUS_CHOICES = [
@@ -31,24 +115,50 @@ class Order(BaseModel):
     start_date = models.DateField(null=True, blank=True)
     notes = models.TextField(blank=True)
 
+    # Balance ledger, maintained by Payment and Installment writes
+    amount_paid = models.DecimalField(max_digits=10, decimal_places=2, default=0)
+    remaining_balance = models.DecimalField(max_digits=10, decimal_places=2, default=0)
+    next_due_date = models.DateField(null=True, blank=True)
+    overdue_count = models.PositiveIntegerField(default=0)
+
+    LEDGER_FIELDS = ('amount_paid', 'remaining_balance', 'next_due_date', 'overdue_count')
+
+    objects = OrderQuerySet.as_manager()
+
     def __str__(self):
         return f"Order #{self.id} - {self.customer.full_name} - {self.product.name}"
 
-    @property
-    def remaining_balance(self):
-        total_paid = sum(payment.amount for payment in self.payments.all())
-        return self.total_amount - self.down_payment - total_paid
-
     @property
     def is_overdue(self):
-        overdue_installments = self.installments.filter(
-            due_date__lt=timezone.now().date(),
-            status='pending'
-        ).exists()
-        return overdue_installments
+        return self.next_due_date is not None and self.next_due_date < timezone.now().date()
+
+    def save(self, *args, **kwargs):
+        if self._state.adding:
+            self.remaining_balance = self.total_amount - self.down_payment - self.amount_paid
+            super().save(*args, **kwargs)
+            return
+
+        # Ledger columns are only changed through F() updates, so a full save
+        # from a possibly stale instance must not overwrite them
+        if kwargs.get('update_fields') is None:
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and field.name not in self.LEDGER_FIELDS
+            ]
+        super().save(*args, **kwargs)
+
+        if {'total_amount', 'down_payment'} & set(kwargs['update_fields']):
+            Order.objects.filter(pk=self.pk).update(
+                remaining_balance=F('total_amount') - F('down_payment') - F('amount_paid')
+            )
+            self.refresh_from_db(fields=['remaining_balance'])
 
     class Meta:
         ordering = ['-order_date']
+        indexes = [
+            models.Index(fields=['organization', '-order_date', '-id'], name='order_org_date_id_idx'),
+            models.Index(fields=['organization', 'status', '-order_date'], name='order_org_status_date_idx'),
+        ]
 
 
 class Installment(BaseModel):
@@ -73,11 +183,28 @@ class Installment(BaseModel):
         # Auto-update status based on due date
         if self.status == 'pending' and self.due_date < timezone.now().date():
             self.status = 'overdue'
-        super().save(*args, **kwargs)
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            Order.objects.filter(pk=self.order_id).refresh_schedule_summary()
+
+    def delete(self, *args, **kwargs):
+        with transaction.atomic():
+            result = super().delete(*args, **kwargs)
+            Order.objects.filter(pk=self.order_id).refresh_schedule_summary()
+        return result
 
     class Meta:
         ordering = ['installment_number']
         unique_together = ['order', 'installment_number']
+        indexes = [
+            models.Index(fields=['organization', 'status', 'due_date'], name='inst_org_status_due_idx'),
+            models.Index(fields=['organization', 'due_date', 'id'], name='inst_org_due_id_idx'),
+            models.Index(
+                fields=['organization', 'due_date'],
+                condition=models.Q(status='pending'),
+                name='inst_pending_due_idx',
+            ),
+        ]
 
 
 class Payment(BaseModel):
@@ -103,23 +230,84 @@ class Payment(BaseModel):
         return f"Payment - Order #{self.order.id} - ${self.amount}"
 
     def save(self, *args, **kwargs):
-        super().save(*args, **kwargs)
-        # Update installment status if payment is made
-        if self.installment and self.amount >= self.installment.amount:
-            self.installment.status = 'paid'
-            self.installment.paid_date = self.payment_date.date()
-            self.installment.save()
+        with transaction.atomic():
+            previous = None
+            if self.pk is not None:
+                previous = Payment.objects.select_for_update().filter(pk=self.pk).values('order_id', 'amount').first()
+
+            super().save(*args, **kwargs)
+
+            # Keep the order balance ledger in step with the payment
+            if previous is not None:
+                Order.objects.filter(pk=previous['order_id']).add_payment(-previous['amount'])
+            Order.objects.filter(pk=self.order_id).add_payment(self.amount)
+
+            # Update installment status if payment is made
+            if self.installment and self.amount >= self.installment.amount:
+                self.installment.status = 'paid'
+                self.installment.paid_date = self.payment_date.date()
+                self.installment.save()
+
+    def delete(self, *args, **kwargs):
+        with transaction.atomic():
+            result = super().delete(*args, **kwargs)
+            Order.objects.filter(pk=self.order_id).add_payment(-self.amount)
+        return result
 
     class Meta:
         ordering = ['-payment_date']
+        indexes = [
+            models.Index(fields=['order', 'payment_date'], name='payment_order_date_idx'),
+            models.Index(fields=['organization', '-payment_date', '-id'], name='payment_org_date_id_idx'),
+        ]
+
+
+class ReminderTemplate(BaseModel):
+    """Organization-specific wording of a reminder message in one locale.
+
+    The subject and body are Django templates rendered with the params
+    stored on each ``PaymentReminder``. ``version`` goes up on every save
+    so compiled copies cached by ``orders.reminder_templates`` are
+    replaced.
+    """
+    KIND_CHOICES = [
+        ('email_due_today', 'Email - due today'),
+        ('email_overdue', 'Email - overdue'),
+        ('in_app_due_today', 'In-app - due today'),
+        ('in_app_overdue', 'In-app - overdue'),
+    ]
+
+    kind = models.CharField(max_length=30, choices=KIND_CHOICES)
+    locale = models.CharField(max_length=10, default='en')
+    subject = models.CharField(max_length=200, blank=True)
+    body = models.TextField()
+    version = models.PositiveIntegerField(default=1)
+
+    def save(self, *args, **kwargs):
+        if self.pk is not None:
+            self.version += 1
+            if kwargs.get('update_fields') is not None:
+                kwargs['update_fields'] = {*kwargs['update_fields'], 'version'}
+        super().save(*args, **kwargs)
+
+    def __str__(self):
+        return f"{self.get_kind_display()} ({self.locale})"
+
+    class Meta:
+        ordering = ['kind', 'locale']
+        constraints = [
+            models.UniqueConstraint(fields=['organization', 'kind', 'locale'], name='reminder_template_kind_uniq'),
+        ]
 
 
 class PaymentReminder(BaseModel):
     """Model representing payment reminders"""
     STATUS_CHOICES = [
         ('pending', 'Pending'),
+        ('sending', 'Sending'),
         ('sent', 'Sent'),
         ('failed', 'Failed'),
+        ('cancelled', 'Cancelled'),
     ]
 
     REMINDER_TYPE_CHOICES = [
@@ -133,10 +321,190 @@ class PaymentReminder(BaseModel):
     scheduled_date = models.DateTimeField()
     sent_date = models.DateTimeField(null=True, blank=True)
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
-    message = models.TextField()
+    # Stored text (failures, manual reminders); rendered from the template otherwise
+    message = models.TextField(blank=True)
+    template = models.ForeignKey(ReminderTemplate, on_delete=models.SET_NULL, null=True, blank=True, related_name='reminders')
+    template_kind = models.CharField(max_length=30, blank=True)
+    params = models.JSONField(default=dict, blank=True)
+    # Cadence step (days past due) the reminder was sent for
+    reminder_day = models.PositiveIntegerField(null=True, blank=True)
+    # When a dispatcher claimed the reminder for sending
+    claimed_at = models.DateTimeField(null=True, blank=True)
 
     def __str__(self):
         return f"Reminder - {self.installment} - {self.reminder_type}"
 
     class Meta:
-        ordering = ['-scheduled_date']
\ No newline at end of file
+        ordering = ['-scheduled_date']
+        constraints = [
+            models.UniqueConstraint(
+                fields=['installment', 'reminder_type', 'reminder_day'],
+                name='reminder_installment_day_uniq',
+            ),
+        ]
+        indexes = [
+            models.Index(fields=['status', 'scheduled_date'], name='reminder_status_sched_idx'),
+            models.Index(fields=['organization', '-created_at', '-id'], name='reminder_org_created_id_idx'),
+        ]
+
+
+class DailyOrgMetrics(BaseModel):
+    """Per-organization daily rollup of orders, payments and installments.
+
+    Orders are bucketed by order date, payments by payment date, installments
+    by due date and customers by creation date. Rows are refreshed by
+    ``orders.metrics`` whenever those records are written.
+    """
+    date = models.DateField()
+
+    new_customers = models.PositiveIntegerField(default=0)
+
+    orders_total = models.PositiveIntegerField(default=0)
+    orders_pending = models.PositiveIntegerField(default=0)
+    orders_approved = models.PositiveIntegerField(default=0)
+    orders_active = models.PositiveIntegerField(default=0)
+    orders_completed = models.PositiveIntegerField(default=0)
+    orders_cancelled = models.PositiveIntegerField(default=0)
+
+    payments_count = models.PositiveIntegerField(default=0)
+    revenue_total = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    cash_count = models.PositiveIntegerField(default=0)
+    cash_revenue = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    card_count = models.PositiveIntegerField(default=0)
+    card_revenue = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    bank_transfer_count = models.PositiveIntegerField(default=0)
+    bank_transfer_revenue = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    check_count = models.PositiveIntegerField(default=0)
+    check_revenue = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    other_count = models.PositiveIntegerField(default=0)
+    other_revenue = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+
+    installments_due = models.PositiveIntegerField(default=0)
+    installments_due_amount = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    installments_paid = models.PositiveIntegerField(default=0)
+    installments_unpaid = models.PositiveIntegerField(default=0)
+    outstanding_amount = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+
+    def __str__(self):
+        return f"Metrics - {self.organization_id} - {self.date}"
+
+    class Meta:
+        ordering = ['date']
+        verbose_name_plural = "Daily organization metrics"
+        constraints = [
+            models.UniqueConstraint(fields=['organization', 'date'], name='daily_metrics_org_date_uniq'),
+        ]
+
+
+class ReportJob(BaseModel):
+    """A report built in the background and stored as a compressed file"""
+    REPORT_TYPE_CHOICES = [
+        ('detailed', 'Detailed report'),
+        ('summary', 'Reports summary'),
+    ]
+    FORMAT_CHOICES = [
+        ('csv', 'CSV (gzip)'),
+        ('ndjson', 'NDJSON (gzip)'),
+    ]
+    STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('running', 'Running'),
+        ('completed', 'Completed'),
+        ('failed', 'Failed'),
+    ]
+    OUTSTANDING_STATUSES = ['pending', 'running']
+
+    seller = models.ForeignKey(Seller, on_delete=models.CASCADE, related_name='report_jobs')
+    requested_by = models.ForeignKey(CustomUser, on_delete=models.SET_NULL, null=True, blank=True)
+    report_type = models.CharField(max_length=20, choices=REPORT_TYPE_CHOICES)
+    export_format = models.CharField(max_length=10, choices=FORMAT_CHOICES, default='csv')
+    params = models.JSONField(default=dict, blank=True)
+    # Canonical form of the params (date range resolved), identifies identical jobs
+    params_key = models.CharField(max_length=255)
+    # Report data version of the organization when the job was requested
+    data_version = models.BigIntegerField(null=True, blank=True)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
+    artifact = models.FileField(upload_to='reports/%Y/%m/', blank=True)
+    row_count = models.PositiveIntegerField(default=0)
+    error = models.TextField(blank=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"Report job {self.pk} - {self.report_type} ({self.status})"
+
+    class Meta:
+        ordering = ['-created_at']
+        constraints = [
+            models.UniqueConstraint(
+                fields=['seller', 'report_type', 'export_format', 'params_key'],
+                condition=models.Q(status__in=['pending', 'running']),
+                name='report_job_outstanding_uniq',
+            ),
+        ]
+        indexes = [
+            models.Index(fields=['seller', 'report_type', 'export_format', 'params_key', 'status'], name='report_job_lookup_idx'),
+        ]
+
+
+class ReminderRun(models.Model):
+    """One day's payment reminder run across all organizations.
+
+    The run is split into ``ReminderShard`` rows when it starts; ``sent``
+    and ``failed`` are summed from them once every shard has finished.
+    """
+    STATUS_CHOICES = [
+        ('running', 'Running'),
+        ('completed', 'Completed'),
+        ('failed', 'Completed with failed shards'),
+    ]
+
+    run_date = models.DateField(unique=True)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='running')
+    shard_count = models.PositiveIntegerField(default=0)
+    sent = models.PositiveIntegerField(default=0)
+    failed = models.PositiveIntegerField(default=0)
+    started_at = models.DateTimeField(auto_now_add=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"Reminder run {self.run_date} ({self.status})"
+
+    class Meta:
+        ordering = ['-run_date']
+
+
+class ReminderShard(BaseModel):
+    """The installments of one organization, reminder type and ``pk`` range in a run.
+
+    ``checkpoint`` is the last installment ``pk`` whose reminders were
+    recorded; a retried shard resumes after it instead of resending.
+    """
+    STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('running', 'Running'),
+        ('completed', 'Completed'),
+        ('failed', 'Failed'),
+    ]
+
+    run = models.ForeignKey(ReminderRun, on_delete=models.CASCADE, related_name='shards')
+    reminder_type = models.CharField(max_length=20)
+    first_pk = models.BigIntegerField()
+    last_pk = models.BigIntegerField()
+    checkpoint = models.BigIntegerField(default=0)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
+    sent = models.PositiveIntegerField(default=0)
+    failed = models.PositiveIntegerField(default=0)
+    error = models.TextField(blank=True)
+
+    def __str__(self):
+        return f"Reminder shard {self.pk} - {self.reminder_type} ({self.status})"
+
+    class Meta:
+        ordering = ['run', 'organization', 'reminder_type', 'first_pk']
+        constraints = [
+            models.UniqueConstraint(
+                fields=['run', 'organization', 'reminder_type', 'first_pk'],
+                name='reminder_shard_range_uniq',
+            ),
+        ]
@@ -0,0 +1,56 @@
+"""Customer portal data.
+
+The portal loads a customer's orders with their installments and payments
+in one pass and lists each installment and payment once, next to the
+orders rather than inside them. ``portal_etag`` identifies a version of
+that data from a few aggregates so an unchanged portal can be answered
+with a 304 before anything is loaded or serialized.
+"""
+import hashlib
+
+from django.db.models import Count, Max
+from django.utils.cache import quote_etag
+
+from .models import Installment, Payment
+from .serializers import InstallmentSerializer, OrderSerializer, PaymentSerializer
+
+# Embedded by the portal next to the orders, never inside them
+PORTAL_RELATIONS = {'installments', 'payments'}
+
+
+def portal_etag(orders, params):
+    """``ETag`` of the portal data of ``orders`` rendered with the query ``params``.
+
+    Built from the row counts (so deletions change it) and the latest
+    ``updated_at`` of the orders, their customer and product, installments
+    and payments.
+    """
+    order_ids = orders.order_by().values('pk')
+    versions = [
+        orders.order_by().aggregate(
+            count=Count('pk'),
+            updated=Max('updated_at'),
+            customer=Max('customer__updated_at'),
+            product=Max('product__updated_at'),
+        ),
+        Installment.objects.filter(order__in=order_ids).aggregate(count=Count('pk'), updated=Max('updated_at')),
+        Payment.objects.filter(order__in=order_ids).aggregate(count=Count('pk'), updated=Max('updated_at')),
+    ]
+    key = repr((versions, sorted(params.lists())))
+    return quote_etag(hashlib.sha1(key.encode()).hexdigest())
+
+
+def build_customer_portal(orders, request):
+    """Return ``{'orders': [...], 'installments': [...], 'payments': [...]}`` for the portal"""
+    expand = OrderSerializer.requested_expansions(request) - PORTAL_RELATIONS
+    orders = list(orders.for_serialization(expand | PORTAL_RELATIONS))
+
+    return {
+        'orders': OrderSerializer(orders, many=True, expand=expand, context={'request': request}).data,
+        'installments': InstallmentSerializer(
+            [installment for order in orders for installment in order.installments.all()], many=True
+        ).data,
+        'payments': PaymentSerializer(
+            [payment for order in orders for payment in order.payments.all()], many=True
+        ).data,
+    }
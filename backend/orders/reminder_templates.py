@@ -0,0 +1,177 @@
+"""Reminder message templates.
+
+Reminder rows store the kind of message, the organization's template (if
+it has its own wording) and a small JSON dict of the params that template
+uses instead of the rendered text, and are rendered when sent or viewed. Templates are
+compiled once per process and kept by id; a saved template has a new
+``version`` and is recompiled on next use.
+"""
+import re
+
+from django.conf import settings
+from django.template import Context, Engine, Library, TemplateSyntaxError, defaultfilters, defaulttags
+
+from .models import ReminderTemplate
+
+# Built-in wording, used when an organization has no template of a kind
+DEFAULT_TEMPLATES = {
+    'email_due_today': {
+        'subject': 'Payment Due Today - Order #{{ order_id }}',
+        'body': """Dear {{ customer_name }},
+
+This is a friendly reminder that your payment of ${{ amount }} is due today for Order #{{ order_id }}.
+
+Installment Details:
+- Installment #{{ installment_number }}
+- Amount: ${{ amount }}
+- Due Date: {{ due_date }}
+- Product: {{ product_name }}
+
+Please make your payment as soon as possible to avoid any late fees.
+
+Thank you for your business!
+
+Best regards,
+{{ business_name }}
+""",
+    },
+    'email_overdue': {
+        'subject': 'Overdue Payment - Order #{{ order_id }}',
+        'body': """Dear {{ customer_name }},
+
+Your payment of ${{ amount }} for Order #{{ order_id }} is now overdue.
+
+Installment Details:
+- Installment #{{ installment_number }}
+- Amount: ${{ amount }}
+- Due Date: {{ due_date }}
+- Days Overdue: {{ days_overdue }}
+- Product: {{ product_name }}
+
+Please make your payment immediately to avoid additional late fees and to maintain your account in good standing.
+
+Thank you for your immediate attention to this matter.
+
+Best regards,
+{{ business_name }}
+""",
+    },
+    'in_app_due_today': {
+        'subject': '',
+        'body': 'Payment of ${{ amount }} is due today for Order #{{ order_id }}',
+    },
+    'in_app_overdue': {
+        'subject': '',
+        'body': 'Payment of ${{ amount }} is {{ days_overdue }} days overdue for Order #{{ order_id }}',
+    },
+}
+
+# Sellers write these templates and customers receive them, so only
+# formatting tags and filters are available (no debug, load, include, ...)
+ALLOWED_TAGS = ['if', 'comment']
+ALLOWED_FILTERS = [
+    'capfirst', 'cut', 'default', 'floatformat', 'lower', 'pluralize',
+    'title', 'truncatechars', 'truncatewords', 'upper', 'yesno',
+]
+_library = Library()
+for _name in ALLOWED_TAGS:
+    _library.tag(_name, defaulttags.register.tags[_name])
+for _name in ALLOWED_FILTERS:
+    _library.filter(_name, defaultfilters.register.filters[_name])
+
+# Plain text messages, nothing to escape
+_engine = Engine(autoescape=False)
+_engine.template_builtins = [_library]
+# template id (or default kind) -> (version, compiled subject, compiled body, param names used)
+_compiled = {}
+
+PARAM_NAMES = [
+    'customer_name', 'order_id', 'installment_number', 'amount', 'due_date',
+    'days_overdue', 'product_name', 'business_name',
+]
+
+
+def reminder_locale():
+    return getattr(settings, 'PAYMENT_REMINDER_LOCALE', settings.LANGUAGE_CODE.split('-')[0])
+
+
+def template_kind(channel, reminder_type):
+    """Template kind of a reminder, e.g. ``('email', 'overdue')`` -> ``'email_overdue'``"""
+    return f'{channel}_{reminder_type}'
+
+
+def organization_templates(organization_ids, locale=None):
+    """Return ``{(organization_id, kind): ReminderTemplate}`` of the active templates in ``locale``"""
+    templates = ReminderTemplate.objects.filter(
+        organization_id__in=set(organization_ids),
+        locale=locale or reminder_locale(),
+        is_active=True,
+    )
+    return {(template.organization_id, template.kind): template for template in templates}
+
+
+def _compiled_entry(template, kind):
+    if template is None:
+        key, version, source = kind, 0, DEFAULT_TEMPLATES[kind]
+    else:
+        key, version, source = template.pk, template.version, {'subject': template.subject, 'body': template.body}
+
+    cached = _compiled.get(key)
+    if cached is None or cached[0] != version:
+        try:
+            compiled = _engine.from_string(source['subject']), _engine.from_string(source['body'])
+        except TemplateSyntaxError:
+            # Saved before the tag set was restricted; fall back to the built-in wording
+            return _compiled_entry(None, kind)
+        text = source['subject'] + source['body']
+        names = [name for name in PARAM_NAMES if re.search(rf'\b{name}\b', text)]
+        cached = (version, *compiled, names)
+        _compiled[key] = cached
+    return cached
+
+
+def compiled_template(template, kind):
+    """Compiled ``(subject, body)`` of a ``ReminderTemplate``, or of the default for ``kind`` if ``None``"""
+    return _compiled_entry(template, kind)[1:3]
+
+
+def template_params(template, kind, params):
+    """The subset of ``params`` the template mentions; what a reminder row stores"""
+    return {name: params[name] for name in _compiled_entry(template, kind)[3]}
+
+
+def check_template_source(source):
+    """Raise ``ValueError`` if ``source`` does not compile"""
+    try:
+        _engine.from_string(source)
+    except TemplateSyntaxError as e:
+        raise ValueError(str(e))
+
+
+def reminder_params(installment, today):
+    """The values reminder templates are rendered with, as stored on the reminder row"""
+    order = installment.order
+    return {
+        'customer_name': order.customer.full_name,
+        'order_id': order.id,
+        'installment_number': installment.installment_number,
+        'amount': str(installment.amount),
+        'due_date': installment.due_date.isoformat(),
+        'days_overdue': (today - installment.due_date).days,
+        'product_name': order.product.name,
+        'business_name': order.product.seller.business_name,
+    }
+
+
+def render_template(template, kind, params):
+    """Return the rendered ``(subject, body)``"""
+    subject, body = compiled_template(template, kind)
+    context = Context(params, autoescape=False)
+    return subject.render(context).strip(), body.render(context)
+
+
+def render_reminder(reminder):
+    """Message text of a ``PaymentReminder``: its stored message, or its template rendered with its params"""
+    if reminder.message or not reminder.template_kind:
+        return reminder.message
+    return render_template(reminder.template, reminder.template_kind, reminder.params)[1]
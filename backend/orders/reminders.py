@@ -0,0 +1,416 @@
+"""Payment reminder dispatch.
+
+Installments are read in chunks with their order, customer, product and
+seller joined in. Each chunk's emails go out over one mail connection, and
+its ``PaymentReminder`` rows (one email and one in-app row per
+installment) are written with a single ``bulk_create``. Messages come
+from ``orders.reminder_templates``; rows keep the template and params,
+not the text.
+
+Installments are reminded on the days past due listed in
+``PAYMENT_REMINDER_CADENCE`` and every ``PAYMENT_REMINDER_REPEAT_DAYS``
+after the last of them. Each reminder row records its cadence step in
+``reminder_day``; an installment whose latest reached step already has
+an email reminder is left out by an anti-join, so reruns and daily runs
+never send the same step twice. A missed run is caught up on the next
+one.
+
+Reminder rows are also scheduled ahead of time: ``schedule_reminders``
+creates pending email rows for the cadence steps when installments are
+generated, and ``send_due_reminders`` claims due rows in batches and
+sends them outside the claiming transaction. The daily run then only
+picks up installments without scheduled rows.
+
+A daily run is split into shards per organization, reminder type and
+installment ``pk`` range (see ``plan_reminder_shards``) so organizations
+are processed in parallel and one slow mail server only delays its own
+shards.
+"""
+from datetime import datetime, time, timedelta
+from itertools import islice
+
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.db import transaction
+from django.db.models import Case, Count, Exists, IntegerField, Max, Min, OuterRef, Value, When
+from django.utils import timezone
+
+from .models import Installment, PaymentReminder, ReminderShard
+from .reminder_templates import (
+    organization_templates, reminder_params, render_template, template_kind, template_params,
+)
+
+REMINDER_CHUNK_SIZE = 1000
+# Installments per shard; larger organizations get several shards
+REMINDER_SHARD_SIZE = 10000
+REMINDER_TYPES = ['due_today', 'overdue']
+
+
+def _cadence():
+    cadence = sorted(getattr(settings, 'PAYMENT_REMINDER_CADENCE', [0, 3, 7, 14]))
+    return cadence, getattr(settings, 'PAYMENT_REMINDER_REPEAT_DAYS', 7)
+
+
+def reminder_days(max_days):
+    """Cadence steps (days past due) up to ``max_days``, ascending"""
+    cadence, repeat = _cadence()
+    days = [day for day in cadence if day <= max_days]
+    if cadence and repeat > 0:
+        days.extend(range(cadence[-1] + repeat, max_days + 1, repeat))
+    return days
+
+
+def next_reminder_day(days_late):
+    """First cadence step after ``days_late`` days past due (``None`` if there is none)"""
+    cadence, repeat = _cadence()
+    for day in cadence:
+        if day > days_late:
+            return day
+    if not cadence or repeat <= 0:
+        return None
+    return cadence[-1] + ((days_late - cadence[-1]) // repeat + 1) * repeat
+
+
+def reminder_day(today, max_days):
+    """Expression of the latest cadence step an installment has reached on ``today`` (``NULL`` if none)"""
+    return Case(
+        *[When(due_date__lte=today - timedelta(days=day), then=Value(day)) for day in reversed(reminder_days(max_days))],
+        default=Value(None),
+        output_field=IntegerField(),
+    )
+
+
+def reminder_queryset(reminder_type, today):
+    """Installments owed a ``reminder_type`` reminder on ``today``, annotated with ``reminder_day``"""
+    if reminder_type == 'due_today':
+        installments = Installment.objects.filter(due_date=today, status='pending')
+    else:
+        installments = Installment.objects.filter(due_date__lt=today, status__in=['pending', 'overdue'])
+
+    oldest = installments.aggregate(oldest=Min('due_date'))['oldest']
+    max_days = (today - oldest).days if oldest else 0
+    already_sent = PaymentReminder.objects.filter(
+        installment=OuterRef('pk'),
+        reminder_type='email',
+        reminder_day=OuterRef('reminder_day'),
+    )
+    return (
+        installments
+        .annotate(reminder_day=reminder_day(today, max_days))
+        .filter(reminder_day__isnull=False)
+        .exclude(Exists(already_sent))
+    )
+
+
+def reminder_querysets(today):
+    """Return ``{reminder_type: installments}`` to remind on ``today``"""
+    return {reminder_type: reminder_queryset(reminder_type, today) for reminder_type in REMINDER_TYPES}
+
+
+def reminder_row(installment, channel, reminder_type, today, templates, **fields):
+    """Unsaved ``PaymentReminder`` of ``installment`` pointing at its template and params.
+
+    ``templates`` is the ``organization_templates`` mapping; an
+    organization without a template of the kind gets the built-in wording.
+    """
+    kind = template_kind(channel, reminder_type)
+    template = templates.get((installment.organization_id, kind))
+    return PaymentReminder(
+        installment=installment,
+        reminder_type=channel,
+        template=template,
+        template_kind=kind,
+        params=template_params(template, kind, reminder_params(installment, today)),
+        organization_id=installment.organization_id,
+        **fields,
+    )
+
+
+def send_reminder(reminder, connection, now):
+    """Render and email an email reminder row over ``connection``, recording the outcome on it.
+
+    Returns whether it was sent.
+    """
+    subject, body = render_template(reminder.template, reminder.template_kind, reminder.params)
+    email = EmailMessage(subject, body, settings.DEFAULT_FROM_EMAIL, [reminder.installment.order.customer.email])
+    try:
+        connection.send_messages([email])
+    except Exception as e:
+        reminder.status = 'failed'
+        reminder.sent_date = None
+        reminder.message = f"Failed to send email: {str(e)}"
+        return False
+    reminder.status = 'sent'
+    reminder.sent_date = now
+    return True
+
+
+def send_reminder_batch(installments, reminder_type, connection, today=None):
+    """Email a list of installments; returns ``(reminders, sent, failed)``.
+
+    ``reminders`` are the unsaved ``PaymentReminder`` rows recording the
+    outcome. Emails go out one by one over the open ``connection`` so a
+    rejected address only fails its own reminder.
+    """
+    today = today or timezone.now().date()
+    now = timezone.now()
+    templates = organization_templates(installment.organization_id for installment in installments)
+    reminders = []
+    sent = failed = 0
+
+    for installment in installments:
+        email = reminder_row(
+            installment, 'email', reminder_type, today, templates,
+            scheduled_date=now, reminder_day=installment.reminder_day,
+        )
+        if send_reminder(email, connection, now):
+            sent += 1
+        else:
+            failed += 1
+        reminders.append(email)
+        reminders.append(reminder_row(
+            installment, 'in_app', reminder_type, today, templates,
+            scheduled_date=now, sent_date=now, status='sent', reminder_day=installment.reminder_day,
+        ))
+
+    return reminders, sent, failed
+
+
+def iter_reminder_batches(installments, reminder_type, today=None, chunk_size=REMINDER_CHUNK_SIZE):
+    """Email an installment queryset in ``pk`` order, one mail connection per chunk.
+
+    Yields ``(chunk, reminders, sent, failed)`` per chunk; saving the
+    reminder rows is left to the caller.
+    """
+    today = today or timezone.now().date()
+    rows = (
+        installments
+        .select_related('order__customer', 'order__product__seller')
+        .order_by('pk')
+        .iterator(chunk_size=chunk_size)
+    )
+
+    while True:
+        chunk = list(islice(rows, chunk_size))
+        if not chunk:
+            return
+        with get_connection() as connection:
+            reminders, sent, failed = send_reminder_batch(chunk, reminder_type, connection, today)
+        yield chunk, reminders, sent, failed
+
+
+def plan_reminder_shards(run, shard_size=REMINDER_SHARD_SIZE):
+    """Return the unsaved shards of a reminder run.
+
+    One ``GROUP BY`` per reminder type gives each organization's count and
+    ``pk`` bounds; an organization with more than ``shard_size``
+    installments has its ``pk`` range split evenly into several shards.
+    """
+    shards = []
+    for reminder_type, installments in reminder_querysets(run.run_date).items():
+        organizations = (
+            installments
+            .order_by()
+            .values('organization_id')
+            .annotate(count=Count('pk'), first_pk=Min('pk'), last_pk=Max('pk'))
+            .order_by('organization_id')
+        )
+        for row in organizations:
+            parts = -(-row['count'] // shard_size)
+            span = row['last_pk'] - row['first_pk'] + 1
+            bounds = [row['first_pk'] + span * part // parts for part in range(parts + 1)]
+            shards.extend(
+                ReminderShard(
+                    run=run,
+                    organization_id=row['organization_id'],
+                    reminder_type=reminder_type,
+                    first_pk=first,
+                    last_pk=last - 1,
+                )
+                for first, last in zip(bounds, bounds[1:])
+                if last > first
+            )
+    return shards
+
+
+def shard_installments(shard):
+    """The installments of ``shard`` not reminded yet (after its checkpoint)"""
+    return reminder_queryset(shard.reminder_type, shard.run.run_date).filter(
+        organization_id=shard.organization_id,
+        pk__gte=max(shard.first_pk, shard.checkpoint + 1),
+        pk__lte=shard.last_pk,
+    )
+
+
+def reminder_send_time(installment, day):
+    """When the ``day`` step of ``installment`` goes out.
+
+    Reminders are spread over ``PAYMENT_REMINDER_SEND_WINDOW_HOURS`` from
+    ``PAYMENT_REMINDER_SEND_HOUR`` by order and installment number, so the
+    dispatcher sees a steady trickle instead of one daily spike.
+    """
+    hour = getattr(settings, 'PAYMENT_REMINDER_SEND_HOUR', 9)
+    window = getattr(settings, 'PAYMENT_REMINDER_SEND_WINDOW_HOURS', 8) * 60
+    offset = (installment.order_id * 31 + installment.installment_number) % window if window > 0 else 0
+    send = datetime.combine(installment.due_date + timedelta(days=day), time(hour)) + timedelta(minutes=offset)
+    return timezone.make_aware(send)
+
+
+def scheduled_reminder(installment, day, now):
+    return PaymentReminder(
+        installment=installment,
+        reminder_type='email',
+        scheduled_date=max(reminder_send_time(installment, day), now),
+        status='pending',
+        message='',
+        reminder_day=day,
+        organization_id=installment.organization_id,
+    )
+
+
+def schedule_reminders(installments, today=None):
+    """Return the unsaved pending email reminders of saved installments.
+
+    Every cadence step still ahead is scheduled; of the steps already
+    reached only the latest, to go out right away. Repeats past the last
+    cadence step are scheduled by the dispatcher as each one is sent.
+    """
+    now = timezone.now()
+    today = today or now.date()
+    cadence, _ = _cadence()
+
+    reminders = []
+    for installment in installments:
+        if installment.status == 'paid':
+            continue
+        days_late = (today - installment.due_date).days
+        days = reminder_days(days_late)[-1:] + [day for day in cadence if day > days_late]
+        reminders.extend(scheduled_reminder(installment, day, now) for day in days)
+    return reminders
+
+
+def due_reminders(now):
+    """Pending reminders due by ``now``, read through the ``(status, scheduled_date)`` index"""
+    return PaymentReminder.objects.filter(status='pending', scheduled_date__lte=now).order_by('status', 'scheduled_date')
+
+
+def _claim_timeout():
+    return timedelta(minutes=getattr(settings, 'PAYMENT_REMINDER_CLAIM_TIMEOUT_MINUTES', 30))
+
+
+def claim_due_reminders(batch_size, now):
+    """Mark up to ``batch_size`` due reminders as ``sending`` and return them.
+
+    The claim is its own short transaction: rows are locked with
+    ``SELECT ... FOR UPDATE SKIP LOCKED`` only while their status changes,
+    so dispatchers running side by side claim different rows and no lock
+    is held while mail goes out.
+    """
+    with transaction.atomic():
+        pks = list(due_reminders(now).select_for_update(skip_locked=True).values_list('pk', flat=True)[:batch_size])
+        PaymentReminder.objects.filter(pk__in=pks).update(status='sending', claimed_at=now, updated_at=now)
+    return list(
+        PaymentReminder.objects.filter(pk__in=pks)
+        .select_related('installment__order__customer', 'installment__order__product__seller')
+        .order_by('scheduled_date')
+    )
+
+
+def release_stale_claims(now=None):
+    """Return reminders claimed longer than the claim timeout ago to pending.
+
+    Their dispatcher died before recording them. Every reminder is recorded
+    right after its email goes out, so at most the one in flight is sent
+    again.
+    """
+    now = now or timezone.now()
+    return PaymentReminder.objects.filter(status='sending', claimed_at__lt=now - _claim_timeout()).update(
+        status='pending', claimed_at=None, updated_at=now,
+    )
+
+
+def _record_reminder(reminder, follow_ups):
+    with transaction.atomic():
+        reminder.save(update_fields=['status', 'message', 'sent_date', 'template', 'template_kind', 'params', 'updated_at'])
+        PaymentReminder.objects.bulk_create(follow_ups, ignore_conflicts=True)
+
+
+def send_due_reminders(batch_size=REMINDER_CHUNK_SIZE):
+    """Claim and send one batch of due reminders; returns ``(sent, failed, cancelled)`` or ``None`` if none are due.
+
+    Rows are claimed first (see ``claim_due_reminders``), then sent one by
+    one, each recorded as sent or failed together with its follow-ups as
+    soon as its email has gone out. An error that stops the batch puts the
+    unsent rows back to pending. Reminders of paid installments and
+    cancelled orders, and steps superseded by a later step of the same
+    installment that is due too (after a missed run), are cancelled
+    instead of sent.
+    """
+    now = timezone.now()
+    today = now.date()
+    last_step = max(_cadence()[0], default=0)
+    claimed = claim_due_reminders(batch_size, now)
+    if not claimed:
+        return None
+
+    # Latest cadence step due per installment; after a missed run only that
+    # one goes out and the earlier steps due alongside it are cancelled
+    latest_due = dict(
+        PaymentReminder.objects
+        .filter(
+            installment_id__in={reminder.installment_id for reminder in claimed},
+            reminder_type='email',
+            status__in=['pending', 'sending'],
+            scheduled_date__lte=now,
+        )
+        .order_by()
+        .values('installment_id')
+        .annotate(latest=Max('reminder_day'))
+        .values_list('installment_id', 'latest')
+    )
+
+    to_send, cancelled = [], []
+    for reminder in claimed:
+        installment = reminder.installment
+        stale = installment.status == 'paid' or installment.order.status == 'cancelled'
+        superseded = reminder.reminder_day is not None and reminder.reminder_day < (latest_due.get(installment.pk) or 0)
+        (cancelled if stale or superseded else to_send).append(reminder)
+    if cancelled:
+        PaymentReminder.objects.filter(pk__in=[reminder.pk for reminder in cancelled]).update(
+            status='cancelled', updated_at=now,
+        )
+
+    sent = failed = 0
+    templates = organization_templates(reminder.organization_id for reminder in to_send)
+    try:
+        with get_connection() as connection:
+            for reminder in to_send:
+                installment = reminder.installment
+                reminder.updated_at = now
+
+                # Params are taken at send time, e.g. the days overdue
+                reminder_type = 'overdue' if installment.due_date < today else 'due_today'
+                filled = reminder_row(installment, 'email', reminder_type, today, templates)
+                reminder.template, reminder.template_kind, reminder.params = filled.template, filled.template_kind, filled.params
+                if send_reminder(reminder, connection, now):
+                    sent += 1
+                else:
+                    failed += 1
+                follow_ups = [reminder_row(
+                    installment, 'in_app', reminder_type, today, templates,
+                    scheduled_date=now, sent_date=now, status='sent', reminder_day=reminder.reminder_day,
+                )]
+
+                # Steps past the precomputed cadence are scheduled one at a time
+                if reminder.reminder_day is not None and reminder.reminder_day >= last_step:
+                    day = next_reminder_day(max(reminder.reminder_day, (today - installment.due_date).days))
+                    if day is not None:
+                        follow_ups.append(scheduled_reminder(installment, day, now))
+
+                _record_reminder(reminder, follow_ups)
+    except Exception:
+        PaymentReminder.objects.filter(pk__in=[reminder.pk for reminder in to_send], status='sending').update(
+            status='pending', claimed_at=None, updated_at=now,
+        )
+        raise
+    return sent, failed, len(cancelled)
@@ -0,0 +1,255 @@
+"""Report builders shared by the report views and background report jobs.
+
+Both take the seller and a mapping of query parameters (``request.GET`` or
+the stored parameters of a ``ReportJob``).
+"""
+from datetime import date, timedelta
+
+from django.db.models import Count, F, Q, Sum
+from django.utils import timezone
+
+from .dates import date_range_bounds, filter_date_range, parse_date_range, period_totals, trend_periods
+from .models import DailyOrgMetrics, Installment, Order, Payment
+
+DETAILED_REPORT_PARAMS = ['range', 'start_date', 'end_date', 'customer_id', 'product_id', 'status', 'type']
+SUMMARY_REPORT_PARAMS = ['range', 'start_date', 'end_date', 'months', 'granularity']
+AGING_REPORT_PARAMS = ['range', 'start_date', 'end_date', 'as_of', 'limit']
+
+# bucket -> (min, max) whole days past due, inclusive; None is unbounded
+AGING_BUCKETS = {
+    'current': (None, 0),
+    '1_30': (1, 30),
+    '31_60': (31, 60),
+    '61_90': (61, 90),
+    '90_plus': (91, None),
+}
+
+
+def detailed_report_querysets(seller, params):
+    """Return ``{'orders': qs, 'payments': qs, 'installments': qs}`` filtered by the report params"""
+    sd, ed = parse_date_range(params.get('range'), params.get('start_date'), params.get('end_date'))
+    customer_id = params.get('customer_id')
+    product_id = params.get('product_id')
+    status_q = params.get('status')
+
+    # Base filters; the organization filter lets the planner use the tenant indexes
+    organization_id = seller.organization_id
+    base_orders = Order.objects.filter(organization_id=organization_id, product__seller=seller)
+    base_payments = Payment.objects.filter(organization_id=organization_id, order__product__seller=seller)
+    base_installments = Installment.objects.filter(organization_id=organization_id, order__product__seller=seller)
+
+    base_orders = filter_date_range(base_orders, 'order_date', sd, ed)
+    base_payments = filter_date_range(base_payments, 'payment_date', sd, ed)
+    base_installments = filter_date_range(base_installments, 'due_date', sd, ed)
+
+    if customer_id:
+        base_orders = base_orders.filter(customer_id=customer_id)
+        base_payments = base_payments.filter(order__customer_id=customer_id)
+        base_installments = base_installments.filter(order__customer_id=customer_id)
+
+    if product_id:
+        base_orders = base_orders.filter(product_id=product_id)
+        base_payments = base_payments.filter(order__product_id=product_id)
+        base_installments = base_installments.filter(order__product_id=product_id)
+
+    if status_q:
+        base_orders = base_orders.filter(status=status_q)
+
+    return {'orders': base_orders, 'payments': base_payments, 'installments': base_installments}
+
+
+def build_reports_summary(seller, params, today=None):
+    """Return the reports summary of a seller; raises ``ValueError`` on invalid params"""
+    today = today or timezone.now().date()
+
+    # Parse date range
+    sd, ed = parse_date_range(params.get('range'), params.get('start_date'), params.get('end_date'))
+
+    # Trend horizon and bucket size
+    granularity = params.get('granularity', 'month')
+    if granularity not in ('day', 'week', 'month'):
+        raise ValueError('granularity must be one of: day, week, month')
+    try:
+        months = int(params.get('months', 12))
+    except ValueError:
+        raise ValueError('months must be an integer')
+    months = min(max(months, 1), 120)
+
+    # Order, revenue and installment totals are summed from the daily
+    # rollup; the range applies to order, payment and due dates
+    metrics = DailyOrgMetrics.objects.filter(organization_id=seller.organization_id)
+    in_range = Q(date__gte=sd, date__lte=ed) if sd and ed else None
+    last_30 = Q(date__gt=today - timedelta(days=30))
+    method_columns = {}
+    for method, _ in Payment.PAYMENT_METHOD_CHOICES:
+        method_columns[f'{method}_count'] = Sum(f'{method}_count', filter=in_range)
+        method_columns[f'{method}_revenue'] = Sum(f'{method}_revenue', filter=in_range)
+    totals = metrics.aggregate(
+        orders_total=Sum('orders_total', filter=in_range),
+        orders_pending=Sum('orders_pending', filter=in_range),
+        orders_active=Sum(F('orders_approved') + F('orders_active'), filter=in_range),
+        orders_completed=Sum('orders_completed', filter=in_range),
+        revenue=Sum('revenue_total', filter=in_range),
+        last_30_revenue=Sum('revenue_total', filter=last_30 & in_range if in_range else last_30),
+        outstanding=Sum('outstanding_amount', filter=in_range),
+        # Payment status breakdown is not limited to the range
+        due_today=Sum('installments_unpaid', filter=Q(date=today)),
+        overdue=Sum('installments_unpaid', filter=Q(date__lt=today)),
+        paid=Sum('installments_paid'),
+        **method_columns,
+    )
+
+    # Customer analytics
+    total_customers = Order.objects.filter(product__seller=seller).values('customer').distinct().count()
+    active_customers = Order.objects.filter(product__seller=seller, status__in=['approved', 'active']).values('customer').distinct().count()
+
+    # Product performance
+    product_stats = Order.objects.filter(product__seller=seller).values('product__name').annotate(order_count=Count('id'), total_revenue=Sum('total_amount')).order_by('-total_revenue')[:5]
+
+    # Trends over the last `months` calendar months, grouped from the rollup
+    periods = trend_periods(today, months, granularity)
+    by_period = period_totals(
+        filter_date_range(metrics, 'date', sd, ed), 'date', granularity, periods[0], today,
+        revenue=Sum('revenue_total'), orders=Sum('orders_total'),
+    )
+    monthly_data = [
+        {
+            'month': period.strftime('%Y-%m'),
+            'period': period.isoformat(),
+            'revenue': float(by_period.get(period, {}).get('revenue') or 0),
+            'orders': by_period.get(period, {}).get('orders') or 0,
+        }
+        for period in periods
+    ]
+
+    # Payment method breakdown
+    payment_methods = [
+        {
+            'payment_method': method,
+            'count': totals[f'{method}_count'],
+            'total': totals[f'{method}_revenue'],
+        }
+        for method, _ in Payment.PAYMENT_METHOD_CHOICES
+        if totals[f'{method}_count']
+    ]
+
+    return {
+        'summary': {
+            'orders': {
+                'total': totals['orders_total'] or 0,
+                'pending': totals['orders_pending'] or 0,
+                'active': totals['orders_active'] or 0,
+                'completed': totals['orders_completed'] or 0,
+            },
+            'revenue': {
+                'total': float(totals['revenue'] or 0),
+                'last_30_days': float(totals['last_30_revenue'] or 0),
+                'outstanding': float(totals['outstanding'] or 0),
+            },
+            'customers': {'total': total_customers, 'active': active_customers},
+            'installments': {
+                'due_today': totals['due_today'] or 0,
+                'overdue': totals['overdue'] or 0,
+                'paid': totals['paid'] or 0,
+            }
+        },
+        'product_performance': list(product_stats),
+        'monthly_trends': monthly_data,
+        'payment_methods': payment_methods
+    }
+
+
+def _aging_columns(as_of):
+    """Conditional sums of the outstanding amount per aging bucket.
+
+    Buckets compare ``due_date`` with dates derived from ``as_of`` so no
+    date arithmetic runs in SQL.
+    """
+    columns = {}
+    for bucket, (min_days, max_days) in AGING_BUCKETS.items():
+        condition = Q()
+        if min_days is not None:
+            condition &= Q(due_date__lte=as_of - timedelta(days=min_days))
+        if max_days is not None:
+            condition &= Q(due_date__gte=as_of - timedelta(days=max_days))
+        columns[bucket] = Sum('amount', filter=condition)
+    columns['total'] = Sum('amount')
+    columns['installments'] = Count('id')
+    return columns
+
+
+def _aging_row(row):
+    for column in list(AGING_BUCKETS) + ['total']:
+        row[column] = float(row[column] or 0)
+    return row
+
+
+def build_aging_report(seller, params, today=None):
+    """Return receivables aging per customer and per product; raises ``ValueError`` on invalid params.
+
+    Installments count as outstanding at ``as_of`` (default today) when
+    their order existed by then and they were unpaid or paid later, so past
+    aging can be reproduced. The date range filters the due dates.
+    """
+    as_of = params.get('as_of')
+    try:
+        as_of = date.fromisoformat(as_of) if as_of else (today or timezone.now().date())
+    except ValueError:
+        raise ValueError('as_of must be a date (YYYY-MM-DD)')
+    try:
+        limit = int(params.get('limit', 100))
+    except ValueError:
+        raise ValueError('limit must be an integer')
+    limit = min(max(limit, 1), 1000)
+
+    sd, ed = parse_date_range(params.get('range'), params.get('start_date'), params.get('end_date'))
+    if sd is None and (params.get('range') or (params.get('start_date') and params.get('end_date'))):
+        raise ValueError('Unknown date range or invalid start_date/end_date')
+    outstanding = filter_date_range(
+        Installment.objects.filter(
+            organization_id=seller.organization_id,
+            order__product__seller=seller,
+            order__order_date__lt=date_range_bounds(as_of, as_of)[1],
+        ).exclude(order__status='cancelled'),
+        'due_date', sd, ed,
+    ).filter(~Q(status='paid') | Q(paid_date__gt=as_of))
+
+    columns = _aging_columns(as_of)
+
+    # One GROUP BY per dimension, largest balances first. A seller has few
+    # products, so every product row is read and the totals summed from them
+    by_customer = (
+        outstanding
+        .values('order__customer_id', 'order__customer__first_name', 'order__customer__last_name')
+        .annotate(**columns)
+        .order_by('-total', 'order__customer_id')[:limit]
+    )
+    by_product = list(
+        outstanding
+        .values('order__product_id', 'order__product__name')
+        .annotate(**columns)
+        .order_by('-total', 'order__product_id')
+    )
+    totals = {column: sum(row[column] or 0 for row in by_product) for column in columns}
+
+    return {
+        'as_of': as_of.isoformat(),
+        'buckets': list(AGING_BUCKETS),
+        'totals': _aging_row(totals),
+        'customers': [
+            _aging_row({
+                'customer_id': row.pop('order__customer_id'),
+                'customer_name': f"{row.pop('order__customer__first_name')} {row.pop('order__customer__last_name')}",
+                **row,
+            })
+            for row in by_customer
+        ],
+        'products': [
+            _aging_row({
+                'product_id': row.pop('order__product_id'),
+                'product_name': row.pop('order__product__name'),
+                **row,
+            })
+            for row in by_product[:limit]
+        ],
+    }
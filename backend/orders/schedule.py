@@ -0,0 +1,92 @@
+"""Installment schedule computation.
+
+Schedules for any number of orders are computed in one pass with NumPy:
+amounts are handled as integer cents and due dates with ``datetime64``
+month arithmetic, then converted back to exact ``Decimal``/``date`` values
+for persistence.
+"""
+from decimal import Decimal, ROUND_HALF_UP
+
+import numpy as np
+
+
+def to_cents(amount):
+    """Convert a money amount to integer cents (half-up rounding)"""
+    return int((Decimal(amount) * 100).quantize(Decimal('1'), rounding=ROUND_HALF_UP))
+
+
+def from_cents(cents):
+    """Convert integer cents back to a two-place Decimal"""
+    return Decimal(int(cents)).scaleb(-2)
+
+
+def add_months(start_dates, months):
+    """Add calendar months to dates, clamping to the end of shorter months.
+
+    Each result is computed from its start date, so Jan 31 + 1 month is
+    Feb 28/29 and Jan 31 + 2 months is Mar 31.
+    """
+    start = np.asarray(start_dates, dtype='datetime64[D]')
+    months = np.asarray(months, dtype=np.int64)
+    start_month = start.astype('datetime64[M]')
+    day = (start - start_month.astype('datetime64[D]')).astype(np.int64)
+    target = start_month + months
+    first_day = target.astype('datetime64[D]')
+    month_length = ((target + 1).astype('datetime64[D]') - first_day).astype(np.int64)
+    return first_day + np.minimum(day, month_length - 1)
+
+
+def compute_schedules(principals, counts, start_dates):
+    """Compute the installment schedules of many orders at once.
+
+    ``principals`` are the financed amounts (total minus down payment),
+    ``counts`` the number of installments and ``start_dates`` the schedule
+    start of each order. Installment ``n`` falls due ``n`` calendar months
+    after the start date. Every installment is the principal divided by the
+    count rounded down to the cent; the remainder goes on the last one.
+
+    Returns flat arrays ``(order_index, installment_number, due_date,
+    amount_cents)`` with one element per installment. Raises ``ValueError``
+    if a count is below 1.
+    """
+    cents = np.array([to_cents(p) for p in principals], dtype=np.int64)
+    counts = np.asarray(counts, dtype=np.int64)
+    starts = np.asarray(start_dates, dtype='datetime64[D]')
+    if (counts < 1).any():
+        raise ValueError('installment count must be at least 1')
+
+    base = cents // counts
+    order_index = np.repeat(np.arange(counts.size), counts)
+    offsets = np.cumsum(counts) - counts
+    installment_number = np.arange(order_index.size) - offsets[order_index] + 1
+
+    amount_cents = base[order_index]
+    amount_cents[offsets + counts - 1] += cents - base * counts
+
+    due_date = add_months(starts[order_index], installment_number)
+    return order_index, installment_number, due_date, amount_cents
+
+
+def iter_schedule(order_index, installment_number, due_date, amount_cents):
+    """Yield ``(order_index, installment_number, due_date, amount)`` tuples
+    with Python ``int``/``date``/``Decimal`` values from ``compute_schedules``.
+    """
+    due_dates = due_date.astype(object)
+    for i, n, d, a in zip(order_index.tolist(), installment_number.tolist(), due_dates, amount_cents.tolist()):
+        yield i, n, d, from_cents(a)
+
+
+def monthly_payment(total_amount, down_payment, installment_count):
+    """Regular installment amount of an order (the last one absorbs the remainder)"""
+    if installment_count < 1:
+        raise ValueError('installment count must be at least 1')
+    return from_cents(to_cents(total_amount - down_payment) // installment_count)
+
+
+def schedule_for_order(total_amount, down_payment, installment_count, start_date):
+    """Return the schedule of a single order as a list of dicts"""
+    arrays = compute_schedules([total_amount - down_payment], [installment_count], [start_date])
+    return [
+        {'installment_number': n, 'due_date': d, 'amount': amount}
+        for _, n, d, amount in iter_schedule(*arrays)
+    ]
@@ -1,6 +1,13 @@
-from rest_framework import serializers
+from rest_framework import permissions, serializers
+from django.urls import reverse
+from datetime import date
 from decimal import Decimal
-from .models import Order, Installment, Payment, PaymentReminder
+from .dates import parse_date_range
+from .exports import EXPORT_COLUMNS
+from .models import Order, Installment, Payment, PaymentReminder, ReminderTemplate, ReportJob
+from .reminder_templates import check_template_source, render_reminder
+from .reports import DETAILED_REPORT_PARAMS, SUMMARY_REPORT_PARAMS
+from .schedule import monthly_payment
 from products.serializers import ProductSerializer
 from customers.serializers import CustomerSerializer
 
@@ -9,10 +16,10 @@ class InstallmentSerializer(serializers.ModelSerializer):
     class Meta:
         model = Installment
         fields = [
-            'id', 'installment_number', 'amount', 'due_date',
+            'id', 'order', 'installment_number', 'amount', 'due_date',
             'status', 'paid_date'
         ]
-        read_only_fields = ['status', 'paid_date']
+        read_only_fields = ['order', 'status', 'paid_date']
 
 
 class PaymentSerializer(serializers.ModelSerializer):
@@ -32,6 +39,7 @@ class PaymentSerializer(serializers.ModelSerializer):
 
 
 class PaymentReminderSerializer(serializers.ModelSerializer):
+    """Reminder; ``message`` is rendered from the template when the row has no stored text"""
     class Meta:
         model = PaymentReminder
         fields = [
@@ -40,12 +48,57 @@ class PaymentReminderSerializer(serializers.ModelSerializer):
         ]
         read_only_fields = ['created_at']
 
+    def to_representation(self, instance):
+        data = super().to_representation(instance)
+        data['message'] = render_reminder(instance)
+        return data
+
+
+class ReminderTemplateSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = ReminderTemplate
+        fields = ['id', 'kind', 'locale', 'subject', 'body', 'version', 'is_active', 'updated_at']
+        read_only_fields = ['version', 'updated_at']
+
+    def validate(self, attrs):
+        for field in ('subject', 'body'):
+            try:
+                check_template_source(attrs.get(field, ''))
+            except ValueError as exc:
+                raise serializers.ValidationError({field: str(exc)})
+
+        # One template per organization, kind and locale
+        request = self.context.get('request')
+        organization = getattr(getattr(request, 'user', None), 'organization', None)
+        kind = attrs.get('kind', getattr(self.instance, 'kind', None))
+        locale = attrs.get('locale', getattr(self.instance, 'locale', 'en'))
+        existing = ReminderTemplate.objects.filter(organization=organization, kind=kind, locale=locale)
+        if self.instance is not None:
+            existing = existing.exclude(pk=self.instance.pk)
+        if organization is not None and existing.exists():
+            raise serializers.ValidationError({'kind': f'A {kind} template for locale {locale} already exists'})
+        return attrs
+
+
+def parse_field_list(value):
+    """Split a comma-separated ``fields``/``expand`` query param into a set of names"""
+    return {name.strip() for name in (value or '').split(',') if name.strip()}
+
 
 class OrderSerializer(serializers.ModelSerializer):
+    """Order with IDs and scalar fields; related objects only on request.
+
+    ``expand`` (keyword argument, or the ``?expand=`` query param of the
+    request in the context) lists the relations in ``EXPANDABLE_FIELDS`` to
+    embed. ``?fields=`` limits the output of GET requests to the named
+    fields.
+    """
+    EXPANDABLE_FIELDS = ['customer', 'product', 'installments', 'payments']
+
     customer = CustomerSerializer(read_only=True)
     product = ProductSerializer(read_only=True)
-    customer_id = serializers.IntegerField(write_only=True)
-    product_id = serializers.IntegerField(write_only=True)
+    customer_id = serializers.IntegerField()
+    product_id = serializers.IntegerField()
     installments = InstallmentSerializer(many=True, read_only=True)
     payments = PaymentSerializer(many=True, read_only=True)
     remaining_balance = serializers.ReadOnlyField()
@@ -57,14 +110,45 @@ class OrderSerializer(serializers.ModelSerializer):
             'id', 'customer', 'customer_id', 'product', 'product_id',
             'quantity', 'total_amount', 'down_payment', 'installment_count',
             'monthly_payment', 'status', 'order_date', 'approved_date',
-            'start_date', 'notes', 'remaining_balance', 'is_overdue',
+            'start_date', 'notes', 'amount_paid', 'remaining_balance',
+            'next_due_date', 'overdue_count', 'is_overdue',
             'installments', 'payments'
         ]
         read_only_fields = [
-            'order_date', 'approved_date', 'monthly_payment',
-            'remaining_balance', 'is_overdue'
+            'order_date', 'approved_date', 'monthly_payment', 'amount_paid',
+            'remaining_balance', 'next_due_date', 'overdue_count', 'is_overdue'
         ]
 
+    def __init__(self, *args, expand=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        request = self.context.get('request')
+        if expand is None:
+            expand = self.requested_expansions(request)
+
+        for name in set(self.EXPANDABLE_FIELDS) - set(expand):
+            self.fields.pop(name)
+
+        fields = parse_field_list(request.query_params.get('fields')) if request is not None else set()
+        if fields and request.method in permissions.SAFE_METHODS:
+            for name in set(self.fields) - fields:
+                self.fields.pop(name)
+
+    @classmethod
+    def requested_expansions(cls, request):
+        """Relations a request asks to embed; also what the queryset has to prefetch"""
+        if request is None:
+            return set()
+        expand = parse_field_list(request.query_params.get('expand'))
+        unknown = expand - set(cls.EXPANDABLE_FIELDS)
+        if unknown:
+            raise serializers.ValidationError({
+                'expand': f"Unknown relations: {', '.join(sorted(unknown))}. Choose from: {', '.join(cls.EXPANDABLE_FIELDS)}"
+            })
+        fields = parse_field_list(request.query_params.get('fields'))
+        if fields and request.method in permissions.SAFE_METHODS:
+            expand &= fields
+        return expand
+
     def validate_total_amount(self, value):
         if value <= 0:
             raise serializers.ValidationError("Total amount must be greater than 0")
@@ -91,9 +175,11 @@ class OrderSerializer(serializers.ModelSerializer):
 
     def create(self, validated_data):
         # Calculate monthly payment
-        remaining_amount = validated_data['total_amount'] - validated_data['down_payment']
-        monthly_payment = remaining_amount / validated_data['installment_count']
-        validated_data['monthly_payment'] = monthly_payment
+        validated_data['monthly_payment'] = monthly_payment(
+            validated_data['total_amount'],
+            validated_data.get('down_payment', Decimal('0')),
+            validated_data['installment_count'],
+        )
         
         order = Order.objects.create(**validated_data)
         
@@ -112,6 +198,8 @@ class OrderSerializer(serializers.ModelSerializer):
 
 class OrderCreateSerializer(serializers.ModelSerializer):
     """Simplified serializer for creating orders"""
+    installment_count = serializers.IntegerField(min_value=1)
+
     class Meta:
         model = Order
         fields = [
@@ -121,9 +209,11 @@ class OrderCreateSerializer(serializers.ModelSerializer):
 
     def create(self, validated_data):
         # Calculate monthly payment
-        remaining_amount = validated_data['total_amount'] - validated_data['down_payment']
-        monthly_payment = remaining_amount / validated_data['installment_count']
-        validated_data['monthly_payment'] = monthly_payment
+        validated_data['monthly_payment'] = monthly_payment(
+            validated_data['total_amount'],
+            validated_data.get('down_payment', Decimal('0')),
+            validated_data['installment_count'],
+        )
         
         order = Order.objects.create(**validated_data)
         
@@ -135,3 +225,79 @@ class OrderCreateSerializer(serializers.ModelSerializer):
             print(f"Warning: could not queue generate_installments_for_order task: {exc}")
         
         return order
+
+
+class SchedulePreviewSerializer(serializers.Serializer):
+    """Input for previewing an installment schedule before creating an order"""
+    total_amount = serializers.DecimalField(max_digits=10, decimal_places=2, min_value=Decimal('0.01'))
+    down_payment = serializers.DecimalField(max_digits=10, decimal_places=2, min_value=Decimal('0'), default=Decimal('0'))
+    installment_count = serializers.IntegerField(min_value=1)
+    start_date = serializers.DateField(required=False)
+
+    def validate(self, data):
+        if data['down_payment'] >= data['total_amount']:
+            raise serializers.ValidationError("Down payment cannot be greater than or equal to total amount")
+        return data
+
+
+class ReportJobCreateSerializer(serializers.Serializer):
+    """Input for queuing a background report job"""
+    report_type = serializers.ChoiceField(choices=ReportJob.REPORT_TYPE_CHOICES)
+    format = serializers.ChoiceField(choices=ReportJob.FORMAT_CHOICES, default='csv')
+    params = serializers.DictField(child=serializers.CharField(), required=False, default=dict)
+
+    # param -> allowed values, for params with a fixed set of values
+    PARAM_CHOICES = {
+        'granularity': ['day', 'week', 'month'],
+        'status': [value for value, _ in Order.STATUS_CHOICES],
+        'type': ['all', *EXPORT_COLUMNS],
+    }
+    INTEGER_PARAMS = ['months', 'customer_id', 'product_id']
+    DATE_PARAMS = ['start_date', 'end_date']
+
+    def validate(self, data):
+        params = data['params']
+        allowed = SUMMARY_REPORT_PARAMS if data['report_type'] == 'summary' else DETAILED_REPORT_PARAMS
+        unknown = sorted(set(params) - set(allowed))
+        if unknown:
+            raise serializers.ValidationError({'params': f"Unsupported parameters: {', '.join(unknown)}"})
+
+        # Reject values the job would otherwise fail on, or silently ignore
+        errors = {}
+        for name, value in params.items():
+            if name in self.DATE_PARAMS:
+                try:
+                    date.fromisoformat(value)
+                except ValueError:
+                    errors[name] = 'Must be a date (YYYY-MM-DD)'
+            elif name in self.INTEGER_PARAMS:
+                try:
+                    int(value)
+                except ValueError:
+                    errors[name] = 'Must be an integer'
+            elif name in self.PARAM_CHOICES and value not in self.PARAM_CHOICES[name]:
+                errors[name] = f"Must be one of: {', '.join(self.PARAM_CHOICES[name])}"
+            elif name == 'range' and parse_date_range(value) == (None, None):
+                errors[name] = 'Unknown date range'
+        if errors:
+            raise serializers.ValidationError({'params': errors})
+        return data
+
+
+class ReportJobSerializer(serializers.ModelSerializer):
+    download_url = serializers.SerializerMethodField()
+
+    class Meta:
+        model = ReportJob
+        fields = [
+            'id', 'report_type', 'export_format', 'params', 'status', 'row_count',
+            'error', 'created_at', 'started_at', 'finished_at', 'download_url'
+        ]
+        read_only_fields = fields
+
+    def get_download_url(self, obj):
+        if obj.status != 'completed' or not obj.artifact:
+            return None
+        url = reverse('report-job-download', args=[obj.pk])
+        request = self.context.get('request')
+        return request.build_absolute_uri(url) if request else url
@@ -0,0 +1,65 @@
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from customers.models import Customer
+from products.models import Product
+from .metrics import invalidate_reports_on_commit, refresh_daily_metrics_on_commit
+from .models import Installment, Order, Payment
+
+
+def _day(value):
+    if value is None:
+        return None
+    return timezone.localdate(value) if hasattr(value, 'tzinfo') else value
+
+
+@receiver(post_save, sender=Customer)
+@receiver(post_delete, sender=Customer)
+def refresh_customer_metrics(sender, instance, **kwargs):
+    refresh_daily_metrics_on_commit(instance.organization_id, [_day(instance.created_at)], ['customers'])
+
+
+@receiver(post_save, sender=Order)
+@receiver(post_delete, sender=Order)
+def refresh_order_metrics(sender, instance, **kwargs):
+    refresh_daily_metrics_on_commit(instance.organization_id, [_day(instance.order_date)], ['orders'])
+
+
+@receiver(pre_save, sender=Payment)
+def remember_payment_day(sender, instance, **kwargs):
+    # An edited payment may move to another day; both days need refreshing
+    if instance.pk is not None:
+        instance._previous_metrics_day = _day(
+            Payment.objects.filter(pk=instance.pk).values_list('payment_date', flat=True).first()
+        )
+
+
+@receiver(post_save, sender=Payment)
+@receiver(post_delete, sender=Payment)
+def refresh_payment_metrics(sender, instance, **kwargs):
+    days = [_day(instance.payment_date), getattr(instance, '_previous_metrics_day', None)]
+    refresh_daily_metrics_on_commit(instance.organization_id, days, ['payments'])
+
+
+@receiver(pre_save, sender=Installment)
+def remember_installment_day(sender, instance, **kwargs):
+    if instance.pk is not None:
+        instance._previous_metrics_day = (
+            Installment.objects.filter(pk=instance.pk).values_list('due_date', flat=True).first()
+        )
+
+
+@receiver(post_save, sender=Installment)
+@receiver(post_delete, sender=Installment)
+def refresh_installment_metrics(sender, instance, **kwargs):
+    days = [instance.due_date, getattr(instance, '_previous_metrics_day', None)]
+    refresh_daily_metrics_on_commit(instance.organization_id, days, ['installments'])
+
+
+# Order, payment, installment and customer writes bump the report version
+# through their rollup refresh; products are not in the rollup
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Product)
+def invalidate_cached_reports(sender, instance, **kwargs):
+    invalidate_reports_on_commit(instance.organization_id)
@@ -1,157 +1,191 @@
-from celery import shared_task
-from django.core.mail import send_mail
-from django.conf import settings
+import gzip
+import tempfile
+
+from celery import chord, shared_task
+from django.core.files import File
+from django.db import transaction
+from django.db.models import Count, F, Q, Sum
 from django.utils import timezone
-from datetime import timedelta
-from .models import Installment, PaymentReminder
+from core.cache import bump_report_version_on_commit
+from .models import Installment, PaymentReminder, ReminderRun, ReminderShard, ReportJob
+from .exports import EXPORT_COLUMNS, document_lines, export_lines
+from .metrics import refresh_daily_metrics_on_commit
+from .reminders import (
+    iter_reminder_batches, plan_reminder_shards, release_stale_claims, schedule_reminders, send_due_reminders,
+    shard_installments,
+)
+from .reports import build_reports_summary, detailed_report_querysets
+from .schedule import compute_schedules, iter_schedule
 
 
 @shared_task
 def send_payment_reminders():
-    """Send payment reminders for due and overdue installments"""
+    """Start today's reminder run: plan its shards and fan them out.
+
+    The shards are planned once, when the run is created; calling this
+    again the same day only re-queues the pending and failed shards.
+    A chord collects the shards into the run summary.
+    """
     today = timezone.now().date()
-    
-    # Find installments due today
-    due_today = Installment.objects.filter(
-        due_date=today,
-        status='pending'
-    )
-    
-    # Find overdue installments (more than 1 day late)
-    overdue = Installment.objects.filter(
-        due_date__lt=today,
-        status='pending'
+
+    with transaction.atomic():
+        run, created = ReminderRun.objects.get_or_create(run_date=today)
+        if created:
+            shards = plan_reminder_shards(run)
+            ReminderShard.objects.bulk_create(shards)
+            run.shard_count = len(shards)
+            run.save(update_fields=['shard_count'])
+
+    shard_ids = list(run.shards.filter(status__in=['pending', 'failed']).values_list('pk', flat=True))
+    if shard_ids:
+        transaction.on_commit(lambda: chord(
+            send_reminder_shard.s(shard_id) for shard_id in shard_ids
+        )(finish_reminder_run.si(run.pk)))
+    elif run.status == 'running':
+        finish_reminder_run.delay(run.pk)
+
+    return f"Dispatched {len(shard_ids)} of {run.shard_count} reminder shards for {run.run_date}"
+
+
+@shared_task(bind=True, max_retries=3, default_retry_delay=60)
+def send_reminder_shard(self, shard_id):
+    """Send the reminders of one shard, checkpointing after every chunk.
+
+    The reminder rows of a chunk and the checkpoint past it are saved in
+    one transaction, so a retry picks up after the last recorded chunk.
+    After the last retry the shard is marked failed instead of raising, so
+    the run summary is still written.
+    """
+    # Claim the shard so a duplicate delivery or a second coordinator call
+    # does not send it twice; a retry of this task still holds the claim
+    claimable = ['pending', 'failed', 'running'] if self.request.retries else ['pending', 'failed']
+    claimed = ReminderShard.objects.filter(pk=shard_id, status__in=claimable).update(
+        status='running', updated_at=timezone.now(),
     )
-    
-    reminders_sent = 0
-    
-    # Send reminders for due today
-    for installment in due_today:
-        send_reminder_email(installment, 'due_today')
-        create_in_app_reminder(installment, 'due_today')
-        reminders_sent += 1
-    
-    # Send reminders for overdue
-    for installment in overdue:
-        send_reminder_email(installment, 'overdue')
-        create_in_app_reminder(installment, 'overdue')
-        reminders_sent += 1
-    
-    return f"Sent {reminders_sent} payment reminders"
+    if not claimed:
+        return f"Reminder shard {shard_id} is not pending"
 
+    shard = ReminderShard.objects.select_related('run').get(pk=shard_id)
 
-def send_reminder_email(installment, reminder_type):
-    """Send email reminder for installment"""
     try:
-        customer = installment.order.customer
-        
-        if reminder_type == 'due_today':
-            subject = f"Payment Due Today - Order #{installment.order.id}"
-            message = f"""
-Dear {customer.full_name},
+        batches = iter_reminder_batches(shard_installments(shard), shard.reminder_type, shard.run.run_date)
+        for chunk, reminders, sent, failed in batches:
+            with transaction.atomic():
+                # A concurrent run may have recorded the same step already
+                PaymentReminder.objects.bulk_create(reminders, ignore_conflicts=True)
+                ReminderShard.objects.filter(pk=shard_id).update(
+                    checkpoint=chunk[-1].pk,
+                    sent=F('sent') + sent,
+                    failed=F('failed') + failed,
+                    updated_at=timezone.now(),
+                )
+    except Exception as e:
+        if self.request.retries < self.max_retries:
+            raise self.retry(exc=e)
+        ReminderShard.objects.filter(pk=shard_id).update(status='failed', error=str(e), updated_at=timezone.now())
+        return f"Reminder shard {shard_id} failed: {str(e)}"
 
-This is a friendly reminder that your payment of ${installment.amount} is due today for Order #{installment.order.id}.
+    ReminderShard.objects.filter(pk=shard_id).update(status='completed', error='', updated_at=timezone.now())
+    return f"Reminder shard {shard_id} completed"
 
-Installment Details:
-- Installment #{installment.installment_number}
-- Amount: ${installment.amount}
-- Due Date: {installment.due_date}
-- Product: {installment.order.product.name}
 
-Please make your payment as soon as possible to avoid any late fees.
+@shared_task
+def finish_reminder_run(run_id):
+    """Sum the shard counts into the run summary"""
+    run = ReminderRun.objects.get(pk=run_id)
+    totals = run.shards.aggregate(
+        sent=Sum('sent'),
+        failed=Sum('failed'),
+        unfinished=Count('pk', filter=~Q(status='completed')),
+    )
+    run.sent = totals['sent'] or 0
+    run.failed = totals['failed'] or 0
+    run.status = 'failed' if totals['unfinished'] else 'completed'
+    run.finished_at = timezone.now()
+    run.save(update_fields=['sent', 'failed', 'status', 'finished_at'])
+    return f"Reminder run {run.run_date}: sent {run.sent}, failed {run.failed}"
 
-Thank you for your business!
 
-Best regards,
-{installment.order.product.seller.business_name}
-            """
-        else:  # overdue
-            subject = f"Overdue Payment - Order #{installment.order.id}"
-            message = f"""
-Dear {customer.full_name},
+@shared_task
+def dispatch_payment_reminders(batch_size=500, max_batches=20):
+    """Send the scheduled reminders that are due, a claimed batch at a time.
 
-Your payment of ${installment.amount} for Order #{installment.order.id} is now overdue.
+    Runs every few minutes; several can run at once since each claims
+    different rows. Claims left behind by a dispatcher that died are
+    released first.
+    """
+    release_stale_claims()
+    sent = failed = cancelled = 0
+    for _ in range(max_batches):
+        result = send_due_reminders(batch_size)
+        if result is None:
+            break
+        sent += result[0]
+        failed += result[1]
+        cancelled += result[2]
 
-Installment Details:
-- Installment #{installment.installment_number}
-- Amount: ${installment.amount}
-- Due Date: {installment.due_date}
-- Days Overdue: {(timezone.now().date() - installment.due_date).days}
-- Product: {installment.order.product.name}
+    return f"Sent {sent} scheduled reminders ({failed} failed, {cancelled} cancelled)"
 
-Please make your payment immediately to avoid additional late fees and to maintain your account in good standing.
 
-Thank you for your immediate attention to this matter.
+@shared_task
+def sweep_overdue_installments(organization_ids=None):
+    """Mark pending installments past their due date as overdue.
 
-Best regards,
-{installment.order.product.seller.business_name}
-            """
-        
-        send_mail(
-            subject,
-            message,
-            settings.DEFAULT_FROM_EMAIL,
-            [customer.email],
-            fail_silently=False,
-        )
-        
-        # Create reminder record
-        # Attach the organization's reference if available
-        org = getattr(installment, 'organization', None) or getattr(installment.order, 'organization', None)
-        PaymentReminder.objects.create(
-            installment=installment,
-            reminder_type='email',
-            scheduled_date=timezone.now(),
-            sent_date=timezone.now(),
-            status='sent',
-            message=message,
-            organization=org
-        )
-        
-    except Exception as e:
-        # Create failed reminder record
-        org = getattr(installment, 'organization', None) or getattr(installment.order, 'organization', None)
-        PaymentReminder.objects.create(
-            installment=installment,
-            reminder_type='email',
-            scheduled_date=timezone.now(),
-            status='failed',
-            message=f"Failed to send email: {str(e)}",
-            organization=org
-        )
-        raise e
-
-
-def create_in_app_reminder(installment, reminder_type):
-    """Create in-app notification reminder"""
-    try:
-        if reminder_type == 'due_today':
-            message = f"Payment of ${installment.amount} is due today for Order #{installment.order.id}"
-        else:  # overdue
-            days_overdue = (timezone.now().date() - installment.due_date).days
-            message = f"Payment of ${installment.amount} is {days_overdue} days overdue for Order #{installment.order.id}"
-        
-        org = getattr(installment, 'organization', None) or getattr(installment.order, 'organization', None)
-        PaymentReminder.objects.create(
-            installment=installment,
-            reminder_type='in_app',
-            scheduled_date=timezone.now(),
-            sent_date=timezone.now(),
-            status='sent',
-            message=message,
-            organization=org
-        )
-        
-    except Exception as e:
-        org = getattr(installment, 'organization', None) or getattr(installment.order, 'organization', None)
-        PaymentReminder.objects.create(
-            installment=installment,
-            reminder_type='in_app',
-            scheduled_date=timezone.now(),
-            status='failed',
-            message=f"Failed to create in-app reminder: {str(e)}",
-            organization=org
-        )
+    Runs one set-based UPDATE per organization and refreshes the overdue
+    counters of that organization's orders in the same transaction.
+    """
+    from .models import Order
+
+    today = timezone.now().date()
+    past_due = Installment.objects.filter(status='pending', due_date__lt=today)
+    if organization_ids is None:
+        organization_ids = past_due.order_by().values_list('organization_id', flat=True).distinct()
+
+    updated = 0
+    for organization_id in list(organization_ids):
+        with transaction.atomic():
+            updated += past_due.filter(organization_id=organization_id).update(
+                status='overdue',
+                updated_at=timezone.now(),
+            )
+            Order.objects.filter(
+                organization_id=organization_id,
+                next_due_date__lt=today,
+            ).refresh_schedule_summary(today)
+            bump_report_version_on_commit(organization_id)
+
+    return f"Marked {updated} installments as overdue"
+
+
+def build_installments(orders, today=None):
+    """Return unsaved installments for ``orders`` with their status precomputed.
+
+    ``bulk_create`` skips ``Installment.save()``, so the overdue check it
+    performs is applied here instead.
+    """
+    today = today or timezone.now().date()
+    orders = list(orders)
+    if not orders:
+        return []
+
+    schedules = compute_schedules(
+        [order.total_amount - order.down_payment for order in orders],
+        [order.installment_count for order in orders],
+        [order.start_date for order in orders],
+    )
+
+    installments = []
+    for index, number, due_date, amount in iter_schedule(*schedules):
+        order = orders[index]
+        installments.append(Installment(
+            order=order,
+            installment_number=number,
+            amount=amount,
+            due_date=due_date,
+            status='overdue' if due_date < today else 'pending',
+            organization_id=order.organization_id,
+        ))
+    return installments
 
 
 @shared_task
@@ -161,29 +195,110 @@ def generate_installments_for_order(order_id):
     
     try:
         order = Order.objects.get(id=order_id)
-        
-        # Clear existing installments
-        order.installments.all().delete()
-        
-        # Calculate monthly payment
-        remaining_amount = order.total_amount - order.down_payment
-        monthly_payment = remaining_amount / order.installment_count
-        
-        # Generate installments
-        for i in range(1, order.installment_count + 1):
-            due_date = order.start_date + timedelta(days=30 * i)
-            Installment.objects.create(
-                order=order,
-                installment_number=i,
-                amount=monthly_payment,
-                due_date=due_date,
-                status='pending',
-                organization=getattr(order, 'organization', None)
+        installments = build_installments([order])
+
+        # Replace the schedule in a single transaction and insert; the
+        # old due dates are queued for a refresh by the delete signals
+        with transaction.atomic():
+            order.installments.all().delete()
+            Installment.objects.bulk_create(installments)
+            PaymentReminder.objects.bulk_create(schedule_reminders(installments))
+            Order.objects.filter(pk=order.pk).refresh_schedule_summary()
+            refresh_daily_metrics_on_commit(
+                order.organization_id,
+                [installment.due_date for installment in installments],
+                ['installments'],
             )
         
-        return f"Generated {order.installment_count} installments for Order #{order_id}"
+        return f"Generated {len(installments)} installments for Order #{order_id}"
         
     except Order.DoesNotExist:
         return f"Order #{order_id} not found"
     except Exception as e:
         return f"Error generating installments: {str(e)}"
+
+
+@shared_task
+def generate_installments_for_orders(order_ids, batch_size=1000):
+    """Generate installments for many orders with one delete and batched inserts"""
+    from .models import Order
+
+    try:
+        today = timezone.now().date()
+        orders = list(Order.objects.filter(id__in=order_ids, start_date__isnull=False))
+        installments = build_installments(orders, today=today)
+
+        with transaction.atomic():
+            Installment.objects.filter(order__in=orders).delete()
+            Installment.objects.bulk_create(installments, batch_size=batch_size)
+            PaymentReminder.objects.bulk_create(schedule_reminders(installments, today), batch_size=batch_size)
+            Order.objects.filter(pk__in=[order.pk for order in orders]).refresh_schedule_summary(today)
+
+            due_dates = {}
+            for installment in installments:
+                due_dates.setdefault(installment.organization_id, set()).add(installment.due_date)
+            for organization_id, days in due_dates.items():
+                refresh_daily_metrics_on_commit(organization_id, days, ['installments'])
+
+        return f"Generated {len(installments)} installments for {len(orders)} orders"
+
+    except Exception as e:
+        return f"Error generating installments: {str(e)}"
+
+
+def report_job_lines(job):
+    """Yield the exported lines of a report job"""
+    if job.report_type == 'summary':
+        return document_lines(build_reports_summary(job.seller, job.params), job.export_format)
+
+    querysets = detailed_report_querysets(job.seller, job.params)
+    report_type = job.params.get('type', 'all')
+    if report_type in EXPORT_COLUMNS:
+        querysets = {report_type: querysets[report_type]}
+    return export_lines(querysets, job.export_format)
+
+
+@shared_task
+def build_report_job(job_id):
+    """Build a report job and store it as a gzip-compressed file under MEDIA_ROOT"""
+    # Claim the job so a duplicate delivery does not build it twice
+    claimed = ReportJob.objects.filter(pk=job_id, status='pending').update(
+        status='running', started_at=timezone.now(), updated_at=timezone.now(),
+    )
+    if not claimed:
+        return f"Report job #{job_id} is not pending"
+
+    job = ReportJob.objects.select_related('seller').get(pk=job_id)
+    try:
+        size = 0
+        with tempfile.TemporaryFile() as tmp:
+            with gzip.open(tmp, 'wt', encoding='utf-8', newline='') as out:
+                for chunk in report_job_lines(job):
+                    out.write(chunk)
+                    size += chunk.count('\n')
+            tmp.seek(0)
+            job.artifact.save(f'report-{job.pk}.{job.export_format}.gz', File(tmp), save=False)
+
+        job.row_count = max(size - 1, 0) if job.export_format == 'csv' else size
+        job.status = 'completed'
+        job.finished_at = timezone.now()
+        job.save(update_fields=['artifact', 'row_count', 'status', 'finished_at', 'updated_at'])
+    except Exception as e:
+        job.status = 'failed'
+        job.error = str(e)
+        job.finished_at = timezone.now()
+        job.save(update_fields=['status', 'error', 'finished_at', 'updated_at'])
+        return f"Error building report job #{job_id}: {str(e)}"
+
+    # Older artifacts of the same report are superseded by this one
+    superseded = ReportJob.objects.filter(
+        seller_id=job.seller_id,
+        report_type=job.report_type,
+        export_format=job.export_format,
+        params_key=job.params_key,
+        status='completed',
+    ).exclude(pk=job.pk).exclude(artifact='')
+    for old in superseded:
+        old.artifact.delete(save=True)
+
+    return f"Built report job #{job_id} with {job.row_count} rows"
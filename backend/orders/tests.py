@@ -1,3 +1,1277 @@
-from django.test import TestCase
+import base64
+import csv
+import json
+import re
+from datetime import date, datetime
+from decimal import Decimal
+from io import StringIO
+from unittest import mock, skipUnless
 
-# Create your tests here.
+from django.core import mail
+from django.core.cache import cache
+from django.core.management import CommandError, call_command
+from django.db import connection, transaction
+from django.db.models import Q, Sum
+from django.test import SimpleTestCase, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from core.cache import bump_report_version
+from core.models import Seller
+from core.pagination import KeysetPagination, ListPagination
+from customers.models import Customer
+from products.models import Product
+from user.models import CustomUser, Organization
+
+from .benchmarks import seed_benchmark_seller
+from .cohorts import build_cohort_report
+from .exports import EXPORT_COLUMNS, EXPORT_FORMATS
+from .forecast import build_cash_flow_forecast
+from .metrics import rebuild_daily_metrics, refresh_daily_metrics
+from .models import (
+    DailyOrgMetrics, Installment, Order, Payment, PaymentReminder, ReminderRun, ReminderShard, ReminderTemplate,
+    ReportJob,
+)
+from .reminders import (
+    claim_due_reminders, due_reminders, release_stale_claims, schedule_reminders, send_due_reminders, send_reminder,
+)
+from .reports import AGING_BUCKETS, build_aging_report
+from .schedule import add_months, compute_schedules, iter_schedule, monthly_payment, schedule_for_order
+from .serializers import OrderCreateSerializer, OrderSerializer
+from .tasks import (
+    dispatch_payment_reminders, generate_installments_for_order, send_payment_reminders, send_reminder_shard,
+)
+
+
+def create_seller_world(username='seller', order_count=3, installment_count=6):
+    """Create a seller with an organization, a product, a customer and ``order_count`` approved orders"""
+    user = CustomUser.objects.create_user(username=username, password='x', email=f'{username}@example.com')
+    organization = Organization.objects.create(name=username, owner=user)
+    seller = Seller.objects.create(user=user, organization=organization, business_name='Biz', phone_number='1')
+    product = Product.objects.create(
+        organization=organization, seller=seller, name='Product', description='d',
+        price=Decimal('100'), sku=f'SKU-{username}',
+    )
+    customer = Customer.objects.create(
+        organization=organization, first_name='A', last_name='B',
+        email=f'{username}-customer@example.com', phone_number='1', address='a',
+    )
+    orders = [
+        Order.objects.create(
+            organization=organization, customer=customer, product=product,
+            total_amount=Decimal('1000.00'), down_payment=Decimal('100.00'),
+            installment_count=installment_count, monthly_payment=Decimal('150.00'),
+            status='approved', start_date=timezone.now().date() - timezone.timedelta(days=100),
+        )
+        for _ in range(order_count)
+    ]
+    return user, orders
+
+
+class ReminderTemplateTests(TestCase):
+    def setUp(self):
+        self.user, _ = create_seller_world(order_count=0)
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def create(self, **data):
+        payload = {'kind': 'email_overdue', 'locale': 'en', 'subject': 'Order #{{ order_id }}', 'body': 'Hi'}
+        payload.update(data)
+        return self.client.post('/api/orders/reminder-templates/', payload, format='json')
+
+    def test_duplicate_kind_and_locale_rejected(self):
+        self.assertEqual(self.create().status_code, 201)
+        self.assertEqual(self.create().status_code, 400)
+        self.assertEqual(self.create(locale='fr').status_code, 201)
+
+    def test_update_into_existing_kind_rejected(self):
+        self.create()
+        other = self.create(kind='email_due_today').data['id']
+        response = self.client.patch(f'/api/orders/reminder-templates/{other}/', {'kind': 'email_overdue'}, format='json')
+        self.assertEqual(response.status_code, 400)
+        response = self.client.patch(f'/api/orders/reminder-templates/{other}/', {'body': 'Hello'}, format='json')
+        self.assertEqual(response.status_code, 200)
+
+    def test_unsafe_tags_rejected(self):
+        for body in ('{% debug %}', '{% load static %}', '{% include "x.html" %}'):
+            response = self.create(body=body)
+            self.assertEqual(response.status_code, 400, body)
+            self.assertIn('body', response.data)
+        self.assertFalse(ReminderTemplate.objects.exists())
+
+
+class DailyMetricsTests(TestCase):
+    def setUp(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user, (self.order,) = create_seller_world(order_count=1, installment_count=36)
+            generate_installments_for_order(self.order.pk)
+            for _ in range(3):
+                Payment.objects.create(
+                    organization=self.order.organization, order=self.order, amount=Decimal('10.00'), payment_method='cash',
+                )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def rollup(self):
+        return DailyOrgMetrics.objects.filter(organization_id=self.order.organization_id)
+
+    def assertRefreshedOnce(self, action):
+        with mock.patch('orders.metrics.refresh_daily_metrics', wraps=refresh_daily_metrics) as refresh:
+            with self.captureOnCommitCallbacks(execute=True):
+                action()
+        self.assertEqual(refresh.call_count, 1)
+
+    def test_regenerating_schedule_refreshes_once(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.order.start_date += timezone.timedelta(days=10)
+            self.order.save()
+        self.assertRefreshedOnce(lambda: generate_installments_for_order(self.order.pk))
+
+        rows = self.rollup().filter(installments_due__gt=0)
+        self.assertEqual(rows.count(), 36)
+        self.assertTrue(all(row.date >= self.order.start_date for row in rows))
+
+    def test_order_delete_refreshes_once(self):
+        self.assertEqual(self.rollup().aggregate(n=Sum('payments_count'))['n'], 3)
+        self.assertRefreshedOnce(lambda: self.client.delete(f'/api/orders/{self.order.pk}/'))
+        self.assertFalse(self.rollup().filter(Q(installments_due__gt=0) | Q(payments_count__gt=0) | Q(orders_total__gt=0)))
+
+    def test_customer_delete_refreshes_once(self):
+        self.assertRefreshedOnce(lambda: self.client.delete(f'/api/customers/{self.order.customer_id}/'))
+        self.assertFalse(self.rollup().filter(Q(installments_due__gt=0) | Q(new_customers__gt=0)))
+
+    def test_rolled_back_savepoint_keeps_earlier_refreshes(self):
+        payment = Payment.objects.filter(order=self.order).first()
+        with self.captureOnCommitCallbacks(execute=True):
+            payment.delete()
+            try:
+                with transaction.atomic():
+                    Payment.objects.create(
+                        organization=self.order.organization, order=self.order, amount=Decimal('99.00'),
+                        payment_method='card',
+                    )
+                    raise RuntimeError
+            except RuntimeError:
+                pass
+        self.assertEqual(self.rollup().aggregate(n=Sum('payments_count'))['n'], 2)
+
+
+class ReminderShardTests(TestCase):
+    def setUp(self):
+        user, _ = create_seller_world(order_count=0)
+        self.run = ReminderRun.objects.create(run_date=timezone.now().date())
+        self.organization = user.organization
+
+    def shard(self, status):
+        first_pk = ReminderShard.objects.count() * 10 + 1
+        return ReminderShard.objects.create(
+            organization=self.organization, run=self.run, reminder_type='overdue',
+            first_pk=first_pk, last_pk=first_pk + 9, status=status,
+        )
+
+    def test_only_pending_and_failed_shards_are_claimed(self):
+        for status, claimed in [('pending', True), ('failed', True), ('running', False), ('completed', False)]:
+            shard = self.shard(status)
+            send_reminder_shard.apply(args=[shard.pk])
+            shard.refresh_from_db()
+            self.assertEqual(shard.status, 'completed' if claimed else status, status)
+
+    def test_coordinator_requeues_pending_and_failed_shards(self):
+        self.run.shard_count = 4
+        self.run.save()
+        for status in ('pending', 'failed', 'running', 'completed'):
+            self.shard(status)
+        # The chord is sent on commit, which a test transaction never reaches
+        result = send_payment_reminders()
+        self.assertTrue(result.startswith('Dispatched 2 of 4'), result)
+
+
+class UnavailableCache:
+    """A cache backend whose server is down"""
+
+    def __getattr__(self, name):
+        def fail(*args, **kwargs):
+            raise ConnectionError('cache down')
+        return fail
+
+
+class ReportCacheTests(TestCase):
+    def setUp(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user, _ = create_seller_world()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_reports_served_when_cache_unavailable(self):
+        with mock.patch('core.cache.cache', UnavailableCache()), self.assertLogs('core.cache', 'WARNING'):
+            response = self.client.get('/api/orders/dashboard/stats/')
+            self.assertEqual(response.status_code, 200)
+            bump_report_version(self.user.organization.pk)
+
+    def assertBumpedOnce(self, action):
+        with mock.patch('orders.metrics.bump_report_version') as bump:
+            with self.captureOnCommitCallbacks(execute=True):
+                action()
+        bump.assert_called_once_with(self.user.organization.pk)
+
+    def test_write_bumps_version_once(self):
+        order = Order.objects.filter(organization=self.user.organization).first()
+        with self.captureOnCommitCallbacks(execute=True):
+            generate_installments_for_order(order.pk)
+        installment = order.installments.first()
+
+        # The payment, its installment and the order ledger change together
+        self.assertBumpedOnce(lambda: Payment.objects.create(
+            organization=order.organization, order=order, installment=installment,
+            amount=installment.amount, payment_method='cash',
+        ))
+        self.assertBumpedOnce(lambda: Product.objects.filter(pk=order.product_id).first().save())
+
+
+class DashboardStatsTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user, self.orders = create_seller_world()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def stats(self, **params):
+        response = self.client.get('/api/orders/dashboard/stats/', params)
+        self.assertEqual(response.status_code, 200)
+        return response.data
+
+    def test_query_count(self):
+        rebuild_daily_metrics(self.user.organization.pk)
+        # Seller lookup and one aggregate over the daily rollup
+        with self.assertNumQueries(2):
+            self.stats()
+        with self.assertNumQueries(2):
+            self.stats(range='last_year')
+
+    def test_scoped_to_organization(self):
+        # Another seller's order in the same organization counts; another organization's does not
+        colleague = CustomUser.objects.create_user(username='colleague', password='x', email='colleague@example.com')
+        other_seller = Seller.objects.create(
+            user=colleague, organization=self.user.organization, business_name='Other', phone_number='2',
+        )
+        order = self.orders[0]
+        product = Product.objects.create(
+            organization=order.organization, seller=other_seller, name='Other', description='d',
+            price=Decimal('50'), sku='SKU-colleague',
+        )
+        Order.objects.create(
+            organization=order.organization, customer=order.customer, product=product,
+            total_amount=Decimal('500.00'), down_payment=Decimal('0'), installment_count=2,
+            monthly_payment=Decimal('250.00'), status='pending', start_date=order.start_date,
+        )
+        create_seller_world(username='stranger')
+        for organization in Organization.objects.all():
+            rebuild_daily_metrics(organization.pk)
+
+        self.assertEqual(self.stats()['orders'], {'total': 4, 'pending': 1, 'active': 3})
+
+
+class OrderListTests(TestCase):
+    def setUp(self):
+        self.user, orders = create_seller_world(order_count=1)
+        self.order = orders[0]
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def add_orders(self, count):
+        for _ in range(count):
+            order = Order.objects.create(
+                organization=self.order.organization, customer=self.order.customer, product=self.order.product,
+                total_amount=Decimal('1000.00'), down_payment=Decimal('100.00'), installment_count=6,
+                monthly_payment=Decimal('150.00'), status='approved', start_date=self.order.start_date,
+            )
+            generate_installments_for_order(order.pk)
+            Payment.objects.create(
+                organization=order.organization, order=order, amount=Decimal('150.00'), payment_method='cash',
+            )
+
+    def list_queries(self, **params):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/api/orders/', params)
+        self.assertEqual(response.status_code, 200)
+        return len(queries)
+
+    def test_query_count_does_not_grow_with_orders(self):
+        for params in ({}, {'expand': 'customer,product,installments,payments'}):
+            self.add_orders(1)
+            baseline = self.list_queries(**params)
+            self.add_orders(5)
+            with self.assertNumQueries(baseline):
+                self.client.get('/api/orders/', params)
+
+    def get(self, url, **params):
+        response = self.client.get(url, params)
+        self.assertEqual(response.status_code, 200)
+        return response.data['results'][0] if 'results' in response.data else response.data
+
+    def test_default_payload_is_lean(self):
+        lean = set(OrderSerializer.Meta.fields) - set(OrderSerializer.EXPANDABLE_FIELDS)
+        for url in ('/api/orders/', f'/api/orders/{self.order.pk}/'):
+            data = self.get(url)
+            self.assertEqual(set(data), lean)
+            self.assertEqual(data['customer_id'], self.order.customer_id)
+            self.assertEqual(data['product_id'], self.order.product_id)
+
+    def test_each_expansion(self):
+        generate_installments_for_order(self.order.pk)
+        Payment.objects.create(
+            organization=self.order.organization, order=self.order, amount=Decimal('150.00'), payment_method='cash',
+        )
+        lean = set(OrderSerializer.Meta.fields) - set(OrderSerializer.EXPANDABLE_FIELDS)
+        for url in ('/api/orders/', f'/api/orders/{self.order.pk}/'):
+            for name in OrderSerializer.EXPANDABLE_FIELDS:
+                data = self.get(url, expand=name)
+                self.assertEqual(set(data), lean | {name}, name)
+            self.assertEqual(self.get(url, expand='customer')['customer']['email'], self.order.customer.email)
+            self.assertEqual(self.get(url, expand='product')['product']['name'], self.order.product.name)
+            self.assertEqual(
+                [row['installment_number'] for row in self.get(url, expand='installments')['installments']],
+                [1, 2, 3, 4, 5, 6],
+            )
+            self.assertEqual(self.get(url, expand='payments')['payments'][0]['amount'], '150.00')
+            data = self.get(url, expand=' customer , payments ')
+            self.assertEqual(set(data), lean | {'customer', 'payments'})
+
+    def test_unknown_expansion_rejected(self):
+        for url in ('/api/orders/', f'/api/orders/{self.order.pk}/'):
+            response = self.client.get(url, {'expand': 'customer,seller'})
+            self.assertEqual(response.status_code, 400)
+            self.assertIn('seller', str(response.data['expand']))
+
+    def test_fields_trim_the_payload(self):
+        for url in ('/api/orders/', f'/api/orders/{self.order.pk}/'):
+            self.assertEqual(set(self.get(url, fields='id,status')), {'id', 'status'})
+            data = self.get(url, fields='id,customer', expand='customer,product')
+            self.assertEqual(set(data), {'id', 'customer'})
+            # An expansion left out by ``fields`` is not loaded either
+            self.assertEqual(set(self.get(url, fields='id', expand='customer')), {'id'})
+        with CaptureQueriesContext(connection) as lean:
+            self.client.get('/api/orders/', {'fields': 'id'})
+        with self.assertNumQueries(len(lean)):
+            self.client.get('/api/orders/', {'fields': 'id', 'expand': 'installments,payments'})
+
+
+@skipUnless(connection.vendor == 'postgresql', 'query plans are checked on PostgreSQL')
+class QueryPlanTests(TestCase):
+    """EXPLAIN every query the GET endpoints run for one seller among many.
+
+    The seller under test owns a small share of the rows, as a tenant of a
+    shared database does, so its organization filters are selective. No
+    large table may be read with a sequential scan; small ones (products,
+    sellers, users) may.
+    """
+    LARGE_TABLES = [
+        'orders_order', 'orders_installment', 'orders_payment', 'orders_paymentreminder', 'customers_customer',
+    ]
+
+    @classmethod
+    def setUpTestData(cls):
+        for index in range(9):
+            seed_benchmark_seller(1000, customer_count=1000, username=f'tenant-{index}', seed=index)
+        seller = seed_benchmark_seller(200, username='seller', seed=99)
+        cls.user = seller.user
+
+        # Reminder history: rows already sent, plus the pending ones ahead
+        reminders = schedule_reminders(Installment.objects.exclude(status='paid').select_related('order'))
+        for reminder in reminders:
+            if reminder.scheduled_date <= timezone.now():
+                reminder.status = 'sent'
+        PaymentReminder.objects.bulk_create(reminders, batch_size=1000)
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        organization = self.user.organization
+        self.order = Order.objects.filter(organization=organization).order_by('pk').first()
+        self.installment = self.order.installments.order_by('pk').first()
+        self.payment = Payment.objects.filter(organization=organization).order_by('pk').first()
+        self.reminder = PaymentReminder.objects.filter(organization=organization).order_by('pk').first()
+
+    def assertNoSeqScans(self, url, params=None):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url, params)
+            self.assertEqual(response.status_code, 200, url)
+            if response.streaming:
+                b''.join(response.streaming_content)
+
+        # .iterator() reads through a server-side cursor: DECLARE ... CURSOR ... FOR SELECT
+        selects = [
+            re.sub(r'^DECLARE .+? CURSOR .*?FOR (?=SELECT)', '', query['sql'])
+            for query in queries
+        ]
+        selects = [sql for sql in selects if sql.startswith('SELECT')]
+        self.assertTrue(selects, url)
+        for sql in selects:
+            with connection.cursor() as cursor:
+                cursor.execute(f'EXPLAIN {sql}')
+                plan = '\n'.join(row[0] for row in cursor.fetchall())
+            for table in self.LARGE_TABLES:
+                self.assertNotRegex(plan, rf'Seq Scan on {table}\b', f'{url}: {sql}\n{plan}')
+
+    def test_list_and_detail_endpoints(self):
+        endpoints = [
+            ('/api/orders/', None),
+            ('/api/orders/', {'cursor': ''}),
+            ('/api/orders/', {'status': 'approved', 'expand': 'customer,product,installments,payments'}),
+            (f'/api/orders/{self.order.pk}/', {'expand': 'customer,product,installments,payments'}),
+            ('/api/orders/installments/', None),
+            (f'/api/orders/installments/{self.installment.pk}/', None),
+            ('/api/orders/payments/', None),
+            (f'/api/orders/payments/{self.payment.pk}/', None),
+            ('/api/orders/payment-reminders/', None),
+            (f'/api/orders/payment-reminders/{self.reminder.pk}/', None),
+            ('/api/orders/due-installments/', None),
+            (f'/api/orders/customers/{self.order.customer_id}/portal/', None),
+        ]
+        for url, params in endpoints:
+            with self.subTest(url=url, params=params):
+                self.assertNoSeqScans(url, params)
+
+    def test_report_endpoints(self):
+        endpoints = [
+            ('/api/orders/dashboard/stats/', None),
+            ('/api/orders/reports/summary/', None),
+            ('/api/orders/reports/aging/', None),
+            ('/api/orders/reports/forecast/', None),
+            ('/api/orders/reports/cohorts/', None),
+            ('/api/orders/reports/detailed/', {'type': 'all', 'format': 'csv'}),
+            ('/api/orders/reports/detailed/', {'type': 'installments', 'customer_id': self.order.customer_id}),
+        ]
+        for url, params in endpoints:
+            with self.subTest(url=url, params=params):
+                self.assertNoSeqScans(url, params)
+
+    def test_reminder_dispatch(self):
+        plan = due_reminders(timezone.now()).values_list('pk', flat=True)[:500].explain()
+        self.assertIn('reminder_status_sched_idx', plan)
+        self.assertNotIn('Seq Scan', plan)
+
+
+class ReportJobTests(TestCase):
+    def setUp(self):
+        self.user, _ = create_seller_world(order_count=0)
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def create(self, report_type, **params):
+        return self.client.post('/api/orders/reports/jobs/', {'report_type': report_type, 'params': params}, format='json')
+
+    def test_invalid_param_values_rejected(self):
+        invalid = [
+            ('summary', {'start_date': '2024-13-01', 'end_date': '2024-12-31'}),
+            ('summary', {'months': 'twelve'}),
+            ('summary', {'granularity': 'year'}),
+            ('summary', {'range': 'last_decade'}),
+            ('detailed', {'customer_id': 'abc'}),
+            ('detailed', {'type': 'customers'}),
+        ]
+        for report_type, params in invalid:
+            response = self.create(report_type, **params)
+            self.assertEqual(response.status_code, 400, params)
+            self.assertIn(next(iter(params)), response.data['params'])
+        self.assertFalse(ReportJob.objects.exists())
+
+    def test_valid_params_queue_a_job(self):
+        with mock.patch('orders.tasks.build_report_job.delay'), self.captureOnCommitCallbacks(execute=True):
+            response = self.create('summary', range='last_30', months='6', granularity='week')
+        self.assertEqual(response.status_code, 202)
+
+
+class DueInstallmentsTests(TestCase):
+    def setUp(self):
+        self.user, (order,) = create_seller_world(order_count=1)
+        generate_installments_for_order(order.pk)
+        self.installments = list(order.installments.order_by('due_date'))
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def due(self, **params):
+        response = self.client.get('/api/orders/due-installments/', params)
+        self.assertEqual(response.status_code, 200)
+        return {row['id'] for row in response.data['due']}, {row['id'] for row in response.data['overdue']}
+
+    def test_overdue_matches_with_and_without_range(self):
+        today = timezone.now().date()
+        # Past due but not yet swept, and swept
+        Installment.objects.filter(due_date__lt=today).update(status='pending')
+        Installment.objects.filter(pk=self.installments[0].pk).update(status='overdue')
+        expected = {i.pk for i in self.installments if i.due_date < today}
+        self.assertTrue(expected)
+
+        _, overdue = self.due()
+        self.assertEqual(overdue, expected)
+        due, overdue = self.due(range='last_90')
+        self.assertEqual(overdue, expected)
+        self.assertFalse(due & overdue)
+
+
+class OrderLedgerTests(TestCase):
+    def setUp(self):
+        self.user, (self.order, self.other) = create_seller_world(order_count=2)
+        generate_installments_for_order(self.order.pk)
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def pay(self, amount, order=None):
+        order = order or self.order
+        return Payment.objects.create(
+            organization=order.organization, order=order, amount=Decimal(amount), payment_method='cash',
+        )
+
+    def assertLedger(self, order, amount_paid, remaining_balance):
+        order.refresh_from_db()
+        self.assertEqual(order.amount_paid, Decimal(amount_paid))
+        self.assertEqual(order.remaining_balance, Decimal(remaining_balance))
+
+    def test_new_order_balance(self):
+        self.assertLedger(self.order, '0', '900.00')
+
+    def test_payment_create(self):
+        self.pay('150.00')
+        self.pay('50.00')
+        self.assertLedger(self.order, '200.00', '700.00')
+
+    def test_payment_edit(self):
+        payment = self.pay('150.00')
+        payment.amount = Decimal('100.00')
+        payment.save()
+        self.assertLedger(self.order, '100.00', '800.00')
+
+        # Moved to another order
+        payment.order = self.other
+        payment.save()
+        self.assertLedger(self.order, '0', '900.00')
+        self.assertLedger(self.other, '100.00', '800.00')
+
+    def test_payment_delete(self):
+        self.pay('150.00')
+        self.pay('50.00').delete()
+        self.assertLedger(self.order, '150.00', '750.00')
+
+    def test_order_total_edit(self):
+        self.pay('100.00')
+        response = self.client.patch(f'/api/orders/{self.order.pk}/', {'total_amount': '2000.00'}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(Decimal(response.data['remaining_balance']), Decimal('1800.00'))
+        self.assertLedger(self.order, '100.00', '1800.00')
+
+    def test_recompute_verify(self):
+        self.pay('150.00')
+        call_command('recompute_order_balances', '--verify', stdout=StringIO())
+
+        Order.objects.filter(pk=self.order.pk).update(amount_paid=Decimal('0'), next_due_date=None)
+        out = StringIO()
+        with self.assertRaises(CommandError):
+            call_command('recompute_order_balances', '--verify', stdout=out)
+        self.assertIn(f'Order #{self.order.pk}: amount_paid is 0.00, expected 150', out.getvalue())
+        self.assertIn(f'Order #{self.order.pk}: next_due_date is None', out.getvalue())
+        self.assertLedger(self.order, '0', '750.00')
+
+        # Without --verify the columns are rebuilt first
+        call_command('recompute_order_balances', stdout=StringIO())
+        self.assertLedger(self.order, '150.00', '750.00')
+        call_command('recompute_order_balances', '--verify', stdout=StringIO())
+
+
+class ReminderDispatchTests(TestCase):
+    def setUp(self):
+        _, orders = create_seller_world(order_count=2)
+        for order in orders:
+            generate_installments_for_order(order.pk)
+        self.due = set(due_reminders(timezone.now()).values_list('pk', flat=True))
+        self.assertGreaterEqual(len(self.due), 4)
+
+    def statuses(self):
+        return dict(PaymentReminder.objects.filter(pk__in=self.due).values_list('pk', 'status'))
+
+    def test_error_midway_keeps_sent_reminders(self):
+        calls = []
+
+        def send_then_fail(reminder, connection, now):
+            calls.append(reminder.pk)
+            if len(calls) == 2:
+                raise RuntimeError('template crashed')
+            return send_reminder(reminder, connection, now)
+
+        with mock.patch('orders.reminders.send_reminder', send_then_fail), self.assertRaises(RuntimeError):
+            send_due_reminders()
+        statuses = self.statuses()
+        self.assertEqual(statuses.pop(calls[0]), 'sent')
+        self.assertEqual(set(statuses.values()), {'pending'})
+        self.assertEqual(len(mail.outbox), 1)
+
+        # The next run sends the rest, not the first one again
+        self.assertEqual(send_due_reminders(), (len(self.due) - 1, 0, 0))
+        self.assertEqual(len(mail.outbox), len(self.due))
+        self.assertEqual(set(self.statuses().values()), {'sent'})
+
+    def test_workers_claim_different_reminders(self):
+        now = timezone.now()
+        first = {reminder.pk for reminder in claim_due_reminders(2, now)}
+        self.assertEqual(len(first), 2)
+
+        # Another worker sends everything else while the first is busy
+        self.assertEqual(send_due_reminders(), (len(self.due) - 2, 0, 0))
+        self.assertIsNone(send_due_reminders())
+        statuses = self.statuses()
+        self.assertEqual({pk: statuses[pk] for pk in first}, dict.fromkeys(first, 'sending'))
+        self.assertEqual(len(mail.outbox), len(self.due) - 2)
+
+    def test_claims_of_dead_worker_released_after_timeout(self):
+        now = timezone.now()
+        claimed = {reminder.pk for reminder in claim_due_reminders(100, now)}
+        self.assertEqual(claimed, self.due)
+
+        self.assertEqual(release_stale_claims(now + timezone.timedelta(minutes=5)), 0)
+        self.assertEqual(release_stale_claims(now + timezone.timedelta(minutes=31)), len(self.due))
+        self.assertEqual(send_due_reminders(), (len(self.due), 0, 0))
+
+
+class ScheduleTests(SimpleTestCase):
+    def test_month_end_clamping(self):
+        schedule = schedule_for_order(Decimal('300.00'), Decimal('0'), 3, date(2023, 12, 31))
+        self.assertEqual(
+            [row['due_date'] for row in schedule],
+            [date(2024, 1, 31), date(2024, 2, 29), date(2024, 3, 31)],
+        )
+        self.assertEqual(
+            list(add_months([date(2023, 1, 31)] * 3, [1, 13, 2]).astype(object)),
+            [date(2023, 2, 28), date(2024, 2, 29), date(2023, 3, 31)],
+        )
+
+    def test_remainder_on_last_installment(self):
+        schedule = schedule_for_order(Decimal('1000.00'), Decimal('0'), 3, date(2024, 1, 15))
+        self.assertEqual([row['amount'] for row in schedule], [Decimal('333.33'), Decimal('333.33'), Decimal('333.34')])
+        self.assertEqual(monthly_payment(Decimal('1000.00'), Decimal('0'), 3), Decimal('333.33'))
+
+    def test_amounts_sum_to_principal(self):
+        for principal, count in [('999.99', 7), ('0.05', 3), ('12345.67', 36), ('100.00', 1)]:
+            schedule = schedule_for_order(Decimal(principal) + 50, Decimal('50'), count, date(2024, 1, 1))
+            self.assertEqual(len(schedule), count)
+            self.assertEqual(sum(row['amount'] for row in schedule), Decimal(principal))
+
+    def test_many_orders(self):
+        arrays = compute_schedules(
+            [Decimal('100.00'), Decimal('10.00'), Decimal('50.01')],
+            [2, 3, 1],
+            [date(2024, 1, 31), date(2024, 5, 10), date(2024, 12, 31)],
+        )
+        self.assertEqual(list(iter_schedule(*arrays)), [
+            (0, 1, date(2024, 2, 29), Decimal('50.00')),
+            (0, 2, date(2024, 3, 31), Decimal('50.00')),
+            (1, 1, date(2024, 6, 10), Decimal('3.33')),
+            (1, 2, date(2024, 7, 10), Decimal('3.33')),
+            (1, 3, date(2024, 8, 10), Decimal('3.34')),
+            (2, 1, date(2025, 1, 31), Decimal('50.01')),
+        ])
+
+    def test_zero_count_rejected(self):
+        with self.assertRaises(ValueError):
+            compute_schedules([Decimal('100.00'), Decimal('100.00')], [2, 0], [date(2024, 1, 1)] * 2)
+        with self.assertRaises(ValueError):
+            monthly_payment(Decimal('100.00'), Decimal('0'), 0)
+
+
+class OrderCreateTests(TestCase):
+    def test_installment_count_at_least_one(self):
+        _, (order,) = create_seller_world(order_count=1)
+        serializer = OrderCreateSerializer(data={
+            'customer': order.customer_id, 'product': order.product_id,
+            'total_amount': '100.00', 'down_payment': '0', 'installment_count': 0,
+        })
+        self.assertFalse(serializer.is_valid())
+        self.assertIn('installment_count', serializer.errors)
+
+
+@mock.patch.object(KeysetPagination, 'page_size', 3)
+@mock.patch.object(ListPagination, 'page_size', 3)
+class OrderPaginationTests(TestCase):
+    def setUp(self):
+        self.user, orders = create_seller_world(order_count=8)
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+        # Groups of orders sharing an order date and a total, so the id tie-break matters
+        base = timezone.now()
+        for index, order in enumerate(orders):
+            Order.objects.filter(pk=order.pk).update(
+                order_date=base - timezone.timedelta(days=index // 3),
+                total_amount=Decimal(500 + 100 * (index % 2)),
+            )
+
+    def ids(self, *ordering):
+        return list(Order.objects.order_by(*ordering).values_list('pk', flat=True))
+
+    def get(self, url, params=None):
+        response = self.client.get(url, params)
+        self.assertEqual(response.status_code, 200)
+        return response.data
+
+    def walk(self, url, params, link):
+        pages = []
+        data = self.get(url, params)
+        while True:
+            pages.append([row['id'] for row in data['results']])
+            if not data[link]:
+                return pages
+            data = self.get(data[link])
+
+    def test_keyset_walks_forward_and_back(self):
+        pages = self.walk('/api/orders/', {'cursor': ''}, 'next')
+        self.assertEqual([len(page) for page in pages], [3, 3, 2])
+        self.assertEqual(sum(pages, []), self.ids('-order_date', '-id'))
+
+        # Back from the last page
+        last = self.get('/api/orders/', {'cursor': ''})
+        while last['next']:
+            last = self.get(last['next'])
+        back = [[row['id'] for row in last['results']]]
+        while last['previous']:
+            last = self.get(last['previous'])
+            back.insert(0, [row['id'] for row in last['results']])
+        self.assertEqual(sum(back, []), self.ids('-order_date', '-id'))
+        self.assertIsNone(last['previous'])
+
+    def test_keyset_with_client_ordering(self):
+        pages = self.walk('/api/orders/', {'cursor': '', 'ordering': 'total_amount'}, 'next')
+        self.assertEqual(sum(pages, []), self.ids('total_amount', 'id'))
+        pages = self.walk('/api/orders/', {'cursor': '', 'ordering': '-total_amount'}, 'next')
+        self.assertEqual(sum(pages, []), self.ids('-total_amount', '-id'))
+
+    def test_invalid_cursor(self):
+        wrong_length = base64.urlsafe_b64encode(json.dumps({'p': [1], 'r': 0}).encode()).decode()
+        for cursor in ('garbage', wrong_length):
+            self.assertEqual(self.client.get('/api/orders/', {'cursor': cursor}).status_code, 404)
+
+    def test_pages_without_count(self):
+        first = self.get('/api/orders/', {'count': 'false'})
+        self.assertNotIn('count', first)
+        self.assertIsNone(first['previous'])
+        self.assertIn('page=2', first['next'])
+
+        middle = self.get(first['next'])
+        self.assertIn('page=3', middle['next'])
+        self.assertNotIn('page=', middle['previous'])
+
+        last = self.get(middle['next'])
+        self.assertIsNone(last['next'])
+        self.assertIn('page=2', last['previous'])
+        self.assertEqual(
+            [row['id'] for page in (first, middle, last) for row in page['results']],
+            self.ids('-order_date', '-id'),
+        )
+        self.assertEqual(self.client.get('/api/orders/', {'count': 'false', 'page': 'x'}).status_code, 404)
+
+
+class ExportTests(TestCase):
+    def setUp(self):
+        self.user, (self.order,) = create_seller_world(order_count=1, installment_count=3)
+        generate_installments_for_order(self.order.pk)
+        self.payment = Payment.objects.create(
+            organization=self.order.organization, order=self.order, amount=Decimal('25.50'),
+            payment_method='cash', reference_number='R-1',
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def export(self, report_type, export_format):
+        response = self.client.get('/api/orders/reports/detailed/', {'type': report_type, 'format': export_format})
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        self.assertEqual(response['Content-Type'], EXPORT_FORMATS[export_format])
+        self.assertEqual(
+            response['Content-Disposition'], f'attachment; filename="report-{report_type}.{export_format}"',
+        )
+        return b''.join(response.streaming_content).decode()
+
+    def installment_ids(self):
+        return list(self.order.installments.order_by('pk').values_list('pk', flat=True))
+
+    def test_csv_single_type(self):
+        rows = list(csv.reader(StringIO(self.export('installments', 'csv'))))
+        self.assertEqual(rows[0], EXPORT_COLUMNS['installments'])
+        self.assertEqual([int(row[0]) for row in rows[1:]], self.installment_ids())
+        first = dict(zip(rows[0], rows[1]))
+        installment = self.order.installments.order_by('pk').first()
+        self.assertEqual(first['order_id'], str(self.order.pk))
+        self.assertEqual(first['due_date'], installment.due_date.isoformat())
+        self.assertEqual(first['amount'], str(installment.amount))
+        self.assertEqual(first['paid_date'], '')
+
+    def test_csv_all(self):
+        rows = list(csv.reader(StringIO(self.export('all', 'csv'))))
+        header = rows[0]
+        self.assertEqual(header[0], 'type')
+        for columns in EXPORT_COLUMNS.values():
+            self.assertTrue(set(columns) <= set(header))
+        self.assertEqual(len(header), len(set(header)))
+        self.assertEqual([row[0] for row in rows[1:]], ['orders', 'payments'] + ['installments'] * 3)
+
+        payment = dict(zip(header, rows[2]))
+        self.assertEqual(payment['id'], str(self.payment.pk))
+        self.assertEqual(payment['amount'], '25.50')
+        self.assertEqual(payment['reference_number'], 'R-1')
+        # Columns of the other types stay empty
+        self.assertEqual(payment['installment_number'], '')
+        self.assertEqual(payment['customer__first_name'], '')
+
+    def test_ndjson_single_type(self):
+        lines = self.export('payments', 'ndjson').splitlines()
+        self.assertEqual(len(lines), 1)
+        row = json.loads(lines[0])
+        self.assertEqual(list(row), ['type'] + EXPORT_COLUMNS['payments'])
+        self.assertEqual(row['type'], 'payments')
+        self.assertEqual(row['amount'], '25.50')
+        self.assertEqual(row['payment_method'], 'cash')
+
+    def test_ndjson_all(self):
+        rows = [json.loads(line) for line in self.export('all', 'ndjson').splitlines()]
+        self.assertEqual([row['type'] for row in rows], ['orders', 'payments'] + ['installments'] * 3)
+        for row in rows:
+            self.assertEqual(set(row), {'type', *EXPORT_COLUMNS[row['type']]})
+        self.assertEqual(rows[0]['id'], self.order.pk)
+        self.assertEqual(rows[0]['total_amount'], '1000.00')
+        self.assertEqual([row['id'] for row in rows[2:]], self.installment_ids())
+
+    def test_rows_are_written_in_chunks(self):
+        with mock.patch('orders.exports.EXPORT_CHUNK_SIZE', 2):
+            response = self.client.get('/api/orders/reports/detailed/', {'type': 'installments', 'format': 'csv'})
+            chunks = list(response.streaming_content)
+        # Header plus three rows, two lines per chunk
+        self.assertEqual([chunk.decode().count('\n') for chunk in chunks], [2, 2])
+
+
+class AgingReportTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user, (self.order,) = create_seller_world(order_count=1, installment_count=1)
+        Order.objects.filter(pk=self.order.pk).update(order_date=timezone.now() - timezone.timedelta(days=400))
+        self.seller = Seller.objects.get(user=self.user)
+        self.today = timezone.now().date()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def installment(self, days_past_due, amount, order=None, **fields):
+        order = order or self.order
+        return Installment.objects.create(
+            organization=order.organization, order=order, installment_number=order.installments.count() + 1,
+            amount=Decimal(amount), due_date=self.today - timezone.timedelta(days=days_past_due), **fields,
+        )
+
+    def report(self, **params):
+        return build_aging_report(self.seller, params, today=self.today)
+
+    def test_bucket_boundaries(self):
+        # Amounts are powers of two, so every bucket sum shows which days it holds
+        for index, days in enumerate([0, 1, 30, 31, 60, 61, 90, 91]):
+            self.installment(days, 2 ** index)
+        self.installment(-10, 256)
+        self.installment(45, 512, status='paid', paid_date=self.today)
+
+        totals = self.report()['totals']
+        self.assertEqual(
+            {bucket: totals[bucket] for bucket in AGING_BUCKETS},
+            {'current': 257.0, '1_30': 6.0, '31_60': 24.0, '61_90': 96.0, '90_plus': 128.0},
+        )
+        self.assertEqual(totals['total'], 511.0)
+        self.assertEqual(totals['installments'], 9)
+
+    def test_as_of_reproduces_past_aging(self):
+        self.installment(40, 100, status='paid', paid_date=self.today - timezone.timedelta(days=10))
+        self.installment(40, 50, status='paid', paid_date=self.today - timezone.timedelta(days=30))
+
+        # 20 days before today the first installment was 20 days past due and still unpaid
+        as_of = self.today - timezone.timedelta(days=20)
+        report = self.report(as_of=as_of.isoformat())
+        self.assertEqual(report['as_of'], as_of.isoformat())
+        self.assertEqual(report['totals']['1_30'], 100.0)
+        self.assertEqual(report['totals']['total'], 100.0)
+        self.assertEqual(report['customers'][0]['1_30'], 100.0)
+
+        self.assertEqual(self.report()['totals']['total'], 0.0)
+
+        # Orders placed after the as-of date are left out
+        before_order = (self.order.order_date - timezone.timedelta(days=1)).date()
+        self.assertEqual(self.report(as_of=before_order.isoformat())['totals']['total'], 0.0)
+
+    def test_due_date_range(self):
+        self.installment(5, 10)
+        self.installment(50, 20)
+        self.assertEqual(self.report(range='last_30')['totals']['total'], 10.0)
+        start = (self.today - timezone.timedelta(days=60)).isoformat()
+        end = (self.today - timezone.timedelta(days=40)).isoformat()
+        self.assertEqual(self.report(start_date=start, end_date=end)['totals']['total'], 20.0)
+
+    def test_limit(self):
+        self.installment(5, 10)
+        customer = Customer.objects.create(
+            organization=self.order.organization, first_name='C', last_name='D',
+            email='other@example.com', phone_number='1', address='a',
+        )
+        other = Order.objects.create(
+            organization=self.order.organization, customer=customer, product=self.order.product,
+            total_amount=Decimal('1000.00'), installment_count=1, monthly_payment=Decimal('1000.00'),
+            status='approved', start_date=self.today,
+        )
+        Order.objects.filter(pk=other.pk).update(order_date=self.order.order_date)
+        self.installment(5, 30, order=other)
+
+        self.assertEqual([row['customer_id'] for row in self.report()['customers']], [customer.pk, self.order.customer_id])
+        self.assertEqual([row['customer_id'] for row in self.report(limit='1')['customers']], [customer.pk])
+        self.assertEqual(len(self.report(limit='0')['customers']), 1)
+        self.assertEqual(len(self.report(limit='5000')['customers']), 2)
+
+    def test_invalid_params(self):
+        for params in (
+            {'limit': 'many'},
+            {'as_of': '2024-13-01'},
+            {'range': 'last_decade'},
+            {'start_date': '2024-01-01', 'end_date': 'soon'},
+        ):
+            response = self.client.get('/api/orders/reports/aging/', params)
+            self.assertEqual(response.status_code, 400, params)
+            self.assertIn('error', response.data)
+        self.assertEqual(self.client.get('/api/orders/reports/aging/', {'range': 'last_30'}).status_code, 200)
+
+
+class ForecastTests(TestCase):
+    today = date(2025, 3, 10)
+
+    def setUp(self):
+        self.user, (self.order,) = create_seller_world(order_count=1, installment_count=1)
+        self.seller = Seller.objects.get(user=self.user)
+
+    def order_for(self, name, status='approved'):
+        customer = Customer.objects.create(
+            organization=self.order.organization, first_name=name, last_name='X',
+            email=f'{name}@example.com', phone_number='1', address='a',
+        )
+        return Order.objects.create(
+            organization=self.order.organization, customer=customer, product=self.order.product,
+            total_amount=Decimal('1000.00'), installment_count=1, monthly_payment=Decimal('1000.00'),
+            status=status, start_date=self.today,
+        )
+
+    def installment(self, order, due_date, amount='100.00', paid_on=None):
+        installment = Installment.objects.create(
+            organization=order.organization, order=order, installment_number=order.installments.count() + 1,
+            amount=Decimal(amount), due_date=due_date,
+        )
+        if paid_on is not None:
+            Payment.objects.create(
+                organization=order.organization, order=order, installment=installment, amount=installment.amount,
+                payment_method='cash', payment_date=timezone.make_aware(datetime.combine(paid_on, datetime.min.time())),
+            )
+        return installment
+
+    def forecast(self, **params):
+        return build_cash_flow_forecast(self.seller, params, today=self.today)
+
+    def test_seller_without_data(self):
+        forecast = self.forecast()
+        self.assertEqual(forecast['on_time_rate'], 1.0)
+        self.assertEqual(forecast['overdue'], {'installments': 0, 'amount': 0.0})
+        self.assertEqual(forecast['totals'], {'scheduled': 0.0, 'expected': 0.0})
+        # The current and the twelfth month are both partial
+        self.assertEqual(len(forecast['periods']), 13)
+        self.assertEqual(forecast['periods'][0], {'period': '2025-03-01', 'installments': 0, 'scheduled': 0.0, 'expected': 0.0})
+        self.assertEqual(forecast['periods'][-1]['period'], '2026-03-01')
+
+    def hand_checked_world(self):
+        # History: A paid 4 installments, one 10 days late; C paid one 20 days
+        # late. Overall on-time rate 3/5 and average delay 15 days, so with 5
+        # prior payments A's rate is (3 + 5 * 0.6) / 9 = 2/3 and B (no history) gets 0.6
+        a = self.order
+        for days_late in (0, 0, 0, 10):
+            due = date(2025, 1, 5)
+            self.installment(a, due, paid_on=due + timezone.timedelta(days=days_late))
+        c = self.order_for('c')
+        self.installment(c, date(2025, 1, 5), paid_on=date(2025, 1, 25))
+
+        b = self.order_for('b')
+        self.installment(a, date(2025, 3, 25), '90.00')
+        self.installment(a, date(2025, 3, 1), '30.00')
+        self.installment(b, date(2025, 4, 20), '100.00')
+        self.installment(self.order_for('d', status='cancelled'), date(2025, 3, 20), '1000.00')
+
+    def test_monthly_forecast(self):
+        self.hand_checked_world()
+        forecast = self.forecast()
+        self.assertEqual(forecast['on_time_rate'], 0.6)
+        self.assertEqual(forecast['overdue'], {'installments': 1, 'amount': 30.0})
+
+        # March: A's on-time 2/3 of 90 plus the overdue 30 (expected after
+        # A's 10 day delay, from today). April: A's late 30 and B's on-time
+        # 60. May: B's late 40 after the average 15 day delay
+        periods = {period['period']: period for period in forecast['periods']}
+        self.assertEqual(periods['2025-03-01'], {'period': '2025-03-01', 'installments': 1, 'scheduled': 90.0, 'expected': 90.0})
+        self.assertEqual(periods['2025-04-01'], {'period': '2025-04-01', 'installments': 1, 'scheduled': 100.0, 'expected': 90.0})
+        self.assertEqual(periods['2025-05-01'], {'period': '2025-05-01', 'installments': 0, 'scheduled': 0.0, 'expected': 40.0})
+        self.assertEqual(forecast['totals'], {'scheduled': 190.0, 'expected': 220.0})
+
+    def test_weekly_forecast(self):
+        self.hand_checked_world()
+        forecast = self.forecast(granularity='week', months='1')
+        self.assertEqual(
+            [(period['period'], period['expected']) for period in forecast['periods']],
+            [('2025-03-10', 30.0), ('2025-03-17', 0.0), ('2025-03-24', 60.0), ('2025-03-31', 30.0), ('2025-04-07', 0.0)],
+        )
+        # B's installment falls after the one-month horizon
+        self.assertEqual(forecast['totals'], {'scheduled': 90.0, 'expected': 120.0})
+
+    def test_customer_without_history_gets_overall_rate(self):
+        b = self.order_for('b')
+        self.installment(self.order, date(2025, 1, 5), paid_on=date(2025, 1, 15))
+        self.installment(b, date(2025, 3, 20), '100.00')
+        # One late payment: overall rate 0, delay 10 days. B's smoothed rate
+        # is (0 + 5 * 0) / 5, so all of it is expected on Mar 30
+        periods = self.forecast(granularity='week', months='1')['periods']
+        self.assertEqual([period['expected'] for period in periods], [0.0, 0.0, 100.0, 0.0, 0.0])
+
+    def test_customer_without_any_history(self):
+        self.installment(self.order, date(2025, 3, 20), '100.00')
+        forecast = self.forecast()
+        self.assertEqual(forecast['on_time_rate'], 1.0)
+        self.assertEqual(forecast['periods'][0]['expected'], 100.0)
+
+    def test_invalid_params(self):
+        for params in ({'granularity': 'day'}, {'months': 'twelve'}):
+            with self.assertRaises(ValueError):
+                self.forecast(**params)
+        self.assertEqual(len(self.forecast(months='100')['periods']), 25)
+
+
+class CohortReportTests(TestCase):
+    today = date(2025, 3, 15)
+
+    def setUp(self):
+        self.user, _ = create_seller_world(order_count=0)
+        self.seller = Seller.objects.get(user=self.user)
+        self.product = Product.objects.get(seller=self.seller)
+        self.customer = Customer.objects.get(organization=self.seller.organization)
+
+    def at_noon(self, day):
+        return timezone.make_aware(datetime.combine(day, datetime.min.time())) + timezone.timedelta(hours=12)
+
+    def order(self, approved, installments, payments=(), status='approved'):
+        order = Order.objects.create(
+            organization=self.seller.organization, customer=self.customer, product=self.product,
+            total_amount=Decimal('1000.00'), installment_count=len(installments), monthly_payment=Decimal('100.00'),
+            status=status, approved_date=approved and self.at_noon(approved),
+        )
+        for number, amount in enumerate(installments, start=1):
+            Installment.objects.create(
+                organization=order.organization, order=order, installment_number=number,
+                amount=Decimal(amount), due_date=self.today,
+            )
+        for paid_on, amount in payments:
+            Payment.objects.create(
+                organization=order.organization, order=order, amount=Decimal(amount),
+                payment_method='cash', payment_date=self.at_noon(paid_on),
+            )
+        return order
+
+    def report(self, **params):
+        return build_cohort_report(self.seller, params, today=self.today)
+
+    def test_hand_checked_matrix(self):
+        # January cohort: 400 scheduled, 100 paid in January, 100 in
+        # February, 100 in March and 100 past the four month horizon
+        self.order(date(2025, 1, 10), [100, 100, 100], [
+            (date(2025, 1, 25), 100), (date(2025, 2, 10), 100), (date(2025, 6, 1), 100),
+        ])
+        self.order(date(2025, 1, 20), [100], [(date(2025, 3, 1), 100)])
+        # March cohort: a payment made before approval counts towards month 1
+        self.order(date(2025, 3, 5), [100, 100], [(date(2025, 2, 20), 50), (date(2025, 3, 10), 50)])
+        # Left out: cancelled and never approved orders
+        self.order(date(2025, 1, 15), [500], [(date(2025, 1, 16), 500)], status='cancelled')
+        self.order(None, [500], [(date(2025, 1, 16), 500)], status='pending')
+
+        report = self.report(months='4')
+        self.assertEqual(report['months'], 4)
+        self.assertEqual(report['cohorts'], [
+            {'cohort': '2025-01', 'orders': 2, 'scheduled': 400.0, 'collected': 300.0,
+             'collection_rate': [25.0, 50.0, 75.0, None]},
+            {'cohort': '2025-03', 'orders': 1, 'scheduled': 200.0, 'collected': 100.0,
+             'collection_rate': [50.0, None, None, None]},
+        ])
+
+    def test_unreached_months_are_none_not_zero(self):
+        self.order(date(2025, 3, 1), [100])
+        rates = self.report(months='3')['cohorts'][0]['collection_rate']
+        self.assertEqual(rates, [0.0, None, None])
+
+    def test_params(self):
+        self.order(date(2024, 6, 1), [100])
+        self.order(date(2025, 3, 1), [100])
+        self.assertEqual(len(self.report()['cohorts'][0]['collection_rate']), 12)
+        self.assertEqual(len(self.report(months='100')['cohorts'][0]['collection_rate']), 60)
+        cohorts = self.report(start_date='2025-01-01', end_date='2025-03-31')['cohorts']
+        self.assertEqual([cohort['cohort'] for cohort in cohorts], ['2025-03'])
+        with self.assertRaises(ValueError):
+            self.report(months='all')
+
+
+class PortalETagTests(TestCase):
+    def setUp(self):
+        self.user, (self.order,) = create_seller_world(order_count=1)
+        generate_installments_for_order(self.order.pk)
+        self.url = f'/api/orders/customers/{self.order.customer_id}/portal/'
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def etag(self, **params):
+        response = self.client.get(self.url, params)
+        self.assertEqual(response.status_code, 200)
+        return response['ETag']
+
+    def assertChangesETag(self, action):
+        etag = self.etag()
+        action()
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_unchanged_portal_is_not_modified(self):
+        response = self.client.get(self.url)
+        etag = response['ETag']
+        self.assertEqual(len(response.data['installments']), 6)
+        self.assertIn('private', response['Cache-Control'])
+
+        # Seller lookup and the three version aggregates; nothing is serialized
+        with self.assertNumQueries(4):
+            response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response['ETag'], etag)
+        self.assertEqual(response.content, b'')
+        self.assertEqual(self.etag(), etag)
+
+    def test_query_params_change_etag(self):
+        self.assertNotEqual(self.etag(), self.etag(expand='customer'))
+        self.assertEqual(self.etag(expand='customer'), self.etag(expand='customer'))
+
+    def test_payment_changes_etag(self):
+        self.assertChangesETag(lambda: Payment.objects.create(
+            organization=self.order.organization, order=self.order, amount=Decimal('150.00'), payment_method='cash',
+        ))
+        payment = self.order.payments.get()
+        payment.notes = 'corrected'
+        self.assertChangesETag(payment.save)
+        self.assertChangesETag(payment.delete)
+
+    def test_installment_changes_etag(self):
+        installment = self.order.installments.order_by('installment_number').first()
+        installment.status = 'paid'
+        installment.paid_date = timezone.now().date()
+        self.assertChangesETag(installment.save)
+        self.assertChangesETag(self.order.installments.order_by('installment_number').last().delete)
+
+
+class ReminderCadenceTests(TestCase):
+    """Day-by-day runs of the reminder dispatcher and of the daily shard run"""
+    due = date(2025, 1, 6)
+
+    def setUp(self):
+        self.user, (self.order,) = create_seller_world(order_count=1, installment_count=1)
+
+    def at(self, day, hour=23):
+        return timezone.make_aware(datetime.combine(self.due, datetime.min.time()) + timezone.timedelta(days=day, hours=hour))
+
+    def now(self, day, hour=23):
+        return mock.patch('django.utils.timezone.now', return_value=self.at(day, hour))
+
+    def scheduled_installment(self):
+        # One installment due on ``self.due``, generated ahead of it
+        Order.objects.filter(pk=self.order.pk).update(start_date=add_months([self.due], [-1])[0].item())
+        with self.now(-5):
+            generate_installments_for_order(self.order.pk)
+        return self.order.installments.get()
+
+    def unscheduled_installment(self):
+        with self.now(-5):
+            return Installment.objects.create(
+                organization=self.order.organization, order=self.order, installment_number=1,
+                amount=Decimal('900.00'), due_date=self.due,
+            )
+
+    def dispatch(self, day, hour=23):
+        with self.now(day, hour):
+            dispatch_payment_reminders()
+
+    def daily_run(self, day):
+        with self.now(day, hour=6), mock.patch('orders.tasks.finish_reminder_run'):
+            with self.captureOnCommitCallbacks():
+                send_payment_reminders()
+            for shard in ReminderShard.objects.filter(run__run_date=self.at(day).date(), status='pending'):
+                send_reminder_shard.apply(args=[shard.pk])
+
+    def simulate(self, run, days):
+        """Run on each of ``days`` (days past due); returns ``{day: emails sent that day}``"""
+        sent = {}
+        for day in days:
+            before = len(mail.outbox)
+            run(day)
+            if len(mail.outbox) > before:
+                sent[day] = len(mail.outbox) - before
+        return sent
+
+    def sent_steps(self, installment):
+        return list(
+            installment.reminders.filter(reminder_type='email', status='sent')
+            .order_by('reminder_day').values_list('reminder_day', flat=True)
+        )
+
+    def test_dispatcher_cadence_then_weekly(self):
+        installment = self.scheduled_installment()
+        sent = self.simulate(self.dispatch, range(-2, 43))
+        self.assertEqual(sent, {0: 1, 3: 1, 7: 1, 14: 1, 21: 1, 28: 1, 35: 1, 42: 1})
+        self.assertEqual(self.sent_steps(installment), [0, 3, 7, 14, 21, 28, 35, 42])
+
+    def test_dispatcher_catches_up_missed_days_with_one_reminder(self):
+        installment = self.scheduled_installment()
+        # Down from day 3 to 8, then from day 15 to 29
+        sent = self.simulate(self.dispatch, [*range(0, 3), *range(9, 15), *range(30, 36)])
+        self.assertEqual(sent, {0: 1, 9: 1, 14: 1, 30: 1, 35: 1})
+        self.assertEqual(self.sent_steps(installment), [0, 7, 14, 21, 35])
+        self.assertTrue(installment.reminders.filter(reminder_day=3, status='cancelled').exists())
+
+    def test_dispatcher_reruns_send_nothing_twice(self):
+        installment = self.scheduled_installment()
+        for hour in (18, 22, 23):
+            self.simulate(lambda day: self.dispatch(day, hour), range(0, 22))
+        self.assertEqual(len(mail.outbox), 5)
+        self.assertEqual(self.sent_steps(installment), [0, 3, 7, 14, 21])
+        self.assertEqual(installment.reminders.filter(reminder_type='in_app').count(), 5)
+
+    def test_daily_run_cadence_then_weekly(self):
+        installment = self.unscheduled_installment()
+        sent = self.simulate(self.daily_run, range(-2, 36))
+        self.assertEqual(sent, {0: 1, 3: 1, 7: 1, 14: 1, 21: 1, 28: 1, 35: 1})
+        self.assertEqual(self.sent_steps(installment), [0, 3, 7, 14, 21, 28, 35])
+
+    def test_daily_run_catches_up_missed_days_with_one_reminder(self):
+        installment = self.unscheduled_installment()
+        sent = self.simulate(self.daily_run, [0, 1, 2, 9, 10, 15, 16])
+        self.assertEqual(sent, {0: 1, 9: 1, 15: 1})
+        self.assertEqual(self.sent_steps(installment), [0, 7, 14])
+
+    def test_daily_run_reruns_send_nothing_twice(self):
+        installment = self.unscheduled_installment()
+        for day in (0, 3):
+            self.daily_run(day)
+            self.daily_run(day)
+            # A fresh run of the same day plans no shards for reminded steps
+            ReminderRun.objects.filter(run_date=self.at(day).date()).delete()
+            self.daily_run(day)
+        self.assertEqual(len(mail.outbox), 2)
+        self.assertEqual(self.sent_steps(installment), [0, 3])
+        self.assertEqual(installment.reminders.count(), 4)
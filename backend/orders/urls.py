@@ -11,9 +11,18 @@ urlpatterns = [
     path('payments/<int:pk>/', views.PaymentDetailView.as_view(), name='payment-detail'),
     path('payment-reminders/', views.PaymentReminderListCreateView.as_view(), name='payment-reminder-list-create'),
     path('payment-reminders/<int:pk>/', views.PaymentReminderDetailView.as_view(), name='payment-reminder-detail'),
+    path('reminder-templates/', views.ReminderTemplateListCreateView.as_view(), name='reminder-template-list-create'),
+    path('reminder-templates/<int:pk>/', views.ReminderTemplateDetailView.as_view(), name='reminder-template-detail'),
+    path('schedule/preview/', views.schedule_preview, name='schedule-preview'),
     path('dashboard/stats/', views.dashboard_stats, name='dashboard-stats'),
     path('due-installments/', views.due_installments, name='due-installments'),
     path('customers/<int:customer_id>/portal/', views.customer_portal_data, name='customer-portal-data'),
     path('reports/summary/', views.reports_summary, name='reports-summary'),
+    path('reports/aging/', views.aging_report, name='aging-report'),
+    path('reports/forecast/', views.cash_flow_forecast, name='cash-flow-forecast'),
+    path('reports/cohorts/', views.cohort_report, name='cohort-report'),
     path('reports/detailed/', views.detailed_reports, name='detailed-reports'),
+    path('reports/jobs/', views.create_report_job, name='report-job-create'),
+    path('reports/jobs/<int:pk>/', views.report_job_detail, name='report-job-detail'),
+    path('reports/jobs/<int:pk>/download/', views.download_report_job, name='report-job-download'),
 ]
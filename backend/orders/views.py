@@ -1,16 +1,29 @@
 from rest_framework import generics, filters, status
-from rest_framework.decorators import api_view, permission_classes
+from rest_framework.decorators import api_view, permission_classes, renderer_classes
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
+from rest_framework.settings import api_settings
 from django_filters.rest_framework import DjangoFilterBackend
 from django.utils import timezone
-from django.db.models import Q, Sum
-from datetime import datetime, timedelta
-from .models import Order, Installment, Payment, PaymentReminder
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.db.models import F, Q, Sum
+from django.db import IntegrityError, transaction
+from django.http import FileResponse
+from core.pagination import ListPagination
+from core.cache import cached_report, get_report_version, normalized_params
+from .models import Order, Installment, Payment, PaymentReminder, DailyOrgMetrics, ReminderTemplate, ReportJob
 from .serializers import (
     OrderSerializer, OrderCreateSerializer, InstallmentSerializer,
-    PaymentSerializer, PaymentReminderSerializer
+    PaymentSerializer, PaymentReminderSerializer, SchedulePreviewSerializer,
+    ReportJobCreateSerializer, ReportJobSerializer, ReminderTemplateSerializer
 )
+from .schedule import schedule_for_order
+from .exports import EXPORT_COLUMNS, EXPORT_FORMATS, CSVRenderer, NDJSONRenderer, stream_export
+from .dates import parse_date_range, filter_date_range
+from .cohorts import build_cohort_report
+from .forecast import build_cash_flow_forecast
+from .portal import build_customer_portal, portal_etag
+from .reports import build_aging_report, build_reports_summary, detailed_report_querysets
 try:
     # Optional import for API documentation
     from drf_spectacular.utils import extend_schema, OpenApiParameter
@@ -24,57 +37,10 @@ except Exception:
             pass
 
 
-def parse_date_range(range_key: str = None, start_date: str = None, end_date: str = None):
-    """Return (start_date, end_date) date objects for given range_key or explicit dates.
-
-    Supported range_key values: today, yesterday, last_7, last_30, last_90, last_year, this_month, last_month
-    If start_date/end_date provided (ISO YYYY-MM-DD) they take precedence.
-    """
-    today = timezone.now().date()
-    if start_date and end_date:
-        try:
-            sd = datetime.fromisoformat(start_date).date()
-            ed = datetime.fromisoformat(end_date).date()
-            return sd, ed
-        except Exception:
-            return None, None
-
-    if not range_key:
-        return None, None
-
-    key = (range_key or '').lower()
-    if key in ('today',):
-        return today, today
-    if key in ('yesterday', 'yesterdan'):
-        y = today - timedelta(days=1)
-        return y, y
-    if key in ('last_7', 'last7', '7days'):
-        sd = today - timedelta(days=6)
-        return sd, today
-    if key in ('last_30', 'last30', '30days'):
-        sd = today - timedelta(days=29)
-        return sd, today
-    if key in ('last_90', 'last90', '90days'):
-        sd = today - timedelta(days=89)
-        return sd, today
-    if key in ('last_year', 'lastyear', '365days'):
-        sd = today - timedelta(days=365)
-        return sd, today
-    if key in ('this_month', 'month'):
-        sd = today.replace(day=1)
-        return sd, today
-    if key in ('last_month',):
-        first_of_this = today.replace(day=1)
-        last_month_end = first_of_this - timedelta(days=1)
-        last_month_start = last_month_end.replace(day=1)
-        return last_month_start, last_month_end
-
-    return None, None
-
-
 class OrderListCreateView(generics.ListCreateAPIView):
     serializer_class = OrderSerializer
     permission_classes = [IsAuthenticated]
+    pagination_class = ListPagination
     filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
     filterset_fields = ['status', 'customer', 'product']
     search_fields = ['customer__first_name', 'customer__last_name', 'product__name']
@@ -92,7 +58,7 @@ class OrderListCreateView(generics.ListCreateAPIView):
             return Order.objects.none()
 
         org = getattr(user, 'organization', None)
-        return Order.objects.filter(organization=org)
+        return Order.objects.filter(organization=org).for_serialization(OrderSerializer.requested_expansions(self.request))
 
     def get_serializer_class(self):
         if self.request.method == 'POST':
@@ -124,12 +90,13 @@ class OrderDetailView(generics.RetrieveUpdateDestroyAPIView):
             return Order.objects.none()
 
         org = getattr(user, 'organization', None)
-        return Order.objects.filter(organization=org)
+        return Order.objects.filter(organization=org).for_serialization(OrderSerializer.requested_expansions(self.request))
 
 
 class InstallmentListView(generics.ListAPIView):
     serializer_class = InstallmentSerializer
     permission_classes = [IsAuthenticated]
+    pagination_class = ListPagination
     filter_backends = [DjangoFilterBackend, filters.OrderingFilter]
     filterset_fields = ['status', 'due_date']
     ordering_fields = ['due_date', 'amount', 'installment_number']
@@ -168,6 +135,7 @@ class InstallmentDetailView(generics.RetrieveUpdateDestroyAPIView):
 class PaymentListCreateView(generics.ListCreateAPIView):
     serializer_class = PaymentSerializer
     permission_classes = [IsAuthenticated]
+    pagination_class = ListPagination
     filter_backends = [DjangoFilterBackend, filters.OrderingFilter]
     filterset_fields = ['payment_method', 'order']
     ordering_fields = ['payment_date', 'amount']
@@ -215,6 +183,7 @@ class PaymentDetailView(generics.RetrieveUpdateDestroyAPIView):
 class PaymentReminderListCreateView(generics.ListCreateAPIView):
     serializer_class = PaymentReminderSerializer
     permission_classes = [IsAuthenticated]
+    pagination_class = ListPagination
     filter_backends = [DjangoFilterBackend, filters.OrderingFilter]
     # Use actual model fields; 'is_sent' does not exist on PaymentReminder
     filterset_fields = ['reminder_type', 'status', 'scheduled_date', 'sent_date']
@@ -231,7 +200,7 @@ class PaymentReminderListCreateView(generics.ListCreateAPIView):
             return PaymentReminder.objects.none()
 
         org = getattr(user, 'organization', None)
-        return PaymentReminder.objects.filter(organization=org)
+        return PaymentReminder.objects.filter(organization=org).select_related('template')
 
 
 class PaymentReminderDetailView(generics.RetrieveUpdateDestroyAPIView):
@@ -248,7 +217,46 @@ class PaymentReminderDetailView(generics.RetrieveUpdateDestroyAPIView):
             return PaymentReminder.objects.none()
 
         org = getattr(user, 'organization', None)
-        return PaymentReminder.objects.filter(organization=org)
+        return PaymentReminder.objects.filter(organization=org).select_related('template')
+
+
+class ReminderTemplateListCreateView(generics.ListCreateAPIView):
+    serializer_class = ReminderTemplateSerializer
+    permission_classes = [IsAuthenticated]
+    filter_backends = [DjangoFilterBackend]
+    filterset_fields = ['kind', 'locale', 'is_active']
+    queryset = ReminderTemplate.objects.none()
+
+    def get_queryset(self):
+        if getattr(self, 'swagger_fake_view', False):
+            return ReminderTemplate.objects.none()
+
+        user = getattr(self.request, 'user', None)
+        if user is None or getattr(user, 'is_anonymous', True):
+            return ReminderTemplate.objects.none()
+
+        org = getattr(user, 'organization', None)
+        return ReminderTemplate.objects.filter(organization=org)
+
+    def perform_create(self, serializer):
+        serializer.save(organization=getattr(self.request.user, 'organization', None))
+
+
+class ReminderTemplateDetailView(generics.RetrieveUpdateDestroyAPIView):
+    serializer_class = ReminderTemplateSerializer
+    permission_classes = [IsAuthenticated]
+    queryset = ReminderTemplate.objects.none()
+
+    def get_queryset(self):
+        if getattr(self, 'swagger_fake_view', False):
+            return ReminderTemplate.objects.none()
+
+        user = getattr(self.request, 'user', None)
+        if user is None or getattr(user, 'is_anonymous', True):
+            return ReminderTemplate.objects.none()
+
+        org = getattr(user, 'organization', None)
+        return ReminderTemplate.objects.filter(organization=org)
 
 
 @api_view(['POST'])
@@ -289,6 +297,43 @@ def approve_order(request, order_id):
         }, status=status.HTTP_404_NOT_FOUND)
 
 
+@extend_schema(
+    parameters=[
+        OpenApiParameter('total_amount', description='Order total amount', required=True),
+        OpenApiParameter('down_payment', description='Down payment (default 0)', required=False),
+        OpenApiParameter('installment_count', description='Number of monthly installments', required=True),
+        OpenApiParameter('start_date', description='Schedule start date (YYYY-MM-DD, default today)', required=False),
+    ]
+)
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def schedule_preview(request):
+    """Preview the installment schedule of an order without creating it"""
+    serializer = SchedulePreviewSerializer(data=request.GET)
+    if not serializer.is_valid():
+        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+    data = serializer.validated_data
+    schedule = schedule_for_order(
+        data['total_amount'],
+        data['down_payment'],
+        data['installment_count'],
+        data.get('start_date') or timezone.now().date(),
+    )
+
+    return Response({
+        'monthly_payment': str(schedule[0]['amount']),
+        'installments': [
+            {
+                'installment_number': row['installment_number'],
+                'amount': str(row['amount']),
+                'due_date': row['due_date'],
+            }
+            for row in schedule
+        ],
+    })
+
+
 @extend_schema(
     parameters=[
         OpenApiParameter('range', description='Date range: today, yesterday, last_7, last_30, last_90, last_year, this_month, last_month', required=False),
@@ -298,6 +343,7 @@ def approve_order(request, order_id):
 )
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
+@cached_report('dashboard_stats')
 def dashboard_stats(request):
     """Get dashboard statistics for sellers with optional date range filters"""
     from core.models import Seller
@@ -311,50 +357,35 @@ def dashboard_stats(request):
         end_date_q = request.GET.get('end_date')
         sd, ed = parse_date_range(range_key, start_date_q, end_date_q)
 
-        # base queryset (organization scoped)
-        org = getattr(seller, 'organization', None)
-
-        # Orders - if date filter provided, apply to order_date
-        orders_qs = Order.objects.filter(product__seller=seller)
-        if sd and ed:
-            orders_qs = orders_qs.filter(order_date__date__gte=sd, order_date__date__lte=ed)
-        total_orders = orders_qs.count()
-
-        pending_orders = orders_qs.filter(status='pending').count()
-        active_orders = orders_qs.filter(status__in=['approved', 'active']).count()
-
-        # Payments
-        payments_qs = Payment.objects.filter(order__product__seller=seller)
-        if sd and ed:
-            payments_qs = payments_qs.filter(payment_date__date__gte=sd, payment_date__date__lte=ed)
-        total_revenue = payments_qs.aggregate(total=Sum('amount'))['total'] or 0
-
-        # Installments
-        installments_qs = Installment.objects.filter(order__product__seller=seller)
-        if sd and ed:
-            installments_qs = installments_qs.filter(due_date__gte=sd, due_date__lte=ed)
-
-        # due today / overdue are relative to today (not to the provided range)
+        # Totals are summed from the daily rollup: orders by order date,
+        # payments by payment date and installments by due date
+        org_id = seller.organization_id
         today = timezone.now().date()
-        due_today = installments_qs.filter(due_date=today, status='pending').count()
-        overdue = installments_qs.filter(due_date__lt=today, status='pending').count()
-
-        # Outstanding balance
-        outstanding_balance = installments_qs.filter(status='pending').aggregate(total=Sum('amount'))['total'] or 0
+        metrics = filter_date_range(DailyOrgMetrics.objects.filter(organization_id=org_id), 'date', sd, ed)
+        totals = metrics.aggregate(
+            orders_total=Sum('orders_total'),
+            orders_pending=Sum('orders_pending'),
+            orders_active=Sum(F('orders_approved') + F('orders_active')),
+            revenue=Sum('revenue_total'),
+            # due today / overdue are relative to today (not to the provided range)
+            due_today=Sum('installments_unpaid', filter=Q(date=today)),
+            overdue=Sum('installments_unpaid', filter=Q(date__lt=today)),
+            outstanding=Sum('outstanding_amount'),
+        )
 
         return Response({
             'orders': {
-                'total': total_orders,
-                'pending': pending_orders,
-                'active': active_orders,
+                'total': totals['orders_total'] or 0,
+                'pending': totals['orders_pending'] or 0,
+                'active': totals['orders_active'] or 0,
             },
             'payments': {
-                'total_revenue': float(total_revenue),
+                'total_revenue': float(totals['revenue'] or 0),
             },
             'installments': {
-                'due_today': due_today,
-                'overdue': overdue,
-                'outstanding_balance': float(outstanding_balance),
+                'due_today': totals['due_today'] or 0,
+                'overdue': totals['overdue'] or 0,
+                'outstanding_balance': float(totals['outstanding'] or 0),
             }
         })
 
@@ -384,13 +415,14 @@ def due_installments(request):
         sd, ed = parse_date_range(range_key, request.GET.get('start_date'), request.GET.get('end_date'))
 
         today = timezone.now().date()
+        installments = Installment.objects.filter(order__product__seller=seller)
 
+        # Past-due pending rows count as overdue before the nightly sweep flips them
+        overdue_qs = installments.filter(Q(status='pending', due_date__lt=today) | Q(status='overdue'))
         if sd and ed:
-            due_qs = Installment.objects.filter(order__product__seller=seller, due_date__gte=sd, due_date__lte=ed, status='pending')
-            overdue_qs = Installment.objects.filter(order__product__seller=seller, due_date__lt=sd, status='pending')
+            due_qs = filter_date_range(installments.filter(status='pending', due_date__gte=today), 'due_date', sd, ed)
         else:
-            due_qs = Installment.objects.filter(order__product__seller=seller, due_date=today, status='pending')
-            overdue_qs = Installment.objects.filter(order__product__seller=seller, due_date__lt=today, status='pending')
+            due_qs = installments.filter(due_date=today, status='pending')
 
         due_today_serializer = InstallmentSerializer(due_qs, many=True)
         overdue_serializer = InstallmentSerializer(overdue_qs, many=True)
@@ -409,33 +441,22 @@ def due_installments(request):
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
 def customer_portal_data(request, customer_id):
-    """Get data for customer portal"""
+    """Get data for customer portal; supports ``If-None-Match``"""
     from core.models import Seller
     
     try:
         seller = Seller.objects.get(user=request.user)
-        
-        # Get customer orders
-        orders = Order.objects.filter(
-            customer_id=customer_id,
-            product__seller=seller
-        )
-        
-        # Get all installments for these orders
-        installments = Installment.objects.filter(order__in=orders)
-        
-        # Get payments
-        payments = Payment.objects.filter(order__in=orders)
-        
-        orders_serializer = OrderSerializer(orders, many=True)
-        installments_serializer = InstallmentSerializer(installments, many=True)
-        payments_serializer = PaymentSerializer(payments, many=True)
-        
-        return Response({
-            'orders': orders_serializer.data,
-            'installments': installments_serializer.data,
-            'payments': payments_serializer.data,
-        })
+
+        orders = Order.objects.filter(customer_id=customer_id, product__seller=seller)
+
+        # Unchanged since the client's copy: answer before loading anything
+        etag = portal_etag(orders, request.query_params)
+        response = get_conditional_response(request, etag=etag)
+        if response is None:
+            response = Response(build_customer_portal(orders, request))
+        response['ETag'] = etag
+        patch_cache_control(response, private=True, no_cache=True)
+        return response
         
     except Seller.DoesNotExist:
         return Response({
@@ -448,132 +469,138 @@ def customer_portal_data(request, customer_id):
         OpenApiParameter('range', description='Date range: today, yesterday, last_7, last_30, last_90, last_year, this_month, last_month', required=False),
         OpenApiParameter('start_date', description='Start date (YYYY-MM-DD) - overrides range if provided', required=False),
         OpenApiParameter('end_date', description='End date (YYYY-MM-DD) - overrides range if provided', required=False),
+        OpenApiParameter('months', description='Trend horizon in calendar months (default 12, max 120)', required=False),
+        OpenApiParameter('granularity', description='Trend bucket size: day, week or month (default month)', required=False),
     ]
 )
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
+@cached_report('reports_summary')
 def reports_summary(request):
     """Get comprehensive reports summary with optional date range filters"""
     from core.models import Seller
-    from django.db.models import Count, Sum, Avg, Q
-    from datetime import datetime, timedelta
 
     try:
         seller = Seller.objects.get(user=request.user)
-        today = timezone.now().date()
-
-        # Parse date range
-        range_key = request.GET.get('range')
-        sd, ed = parse_date_range(range_key, request.GET.get('start_date'), request.GET.get('end_date'))
-
-        # Orders summary
-        orders_qs = Order.objects.filter(product__seller=seller)
-        if sd and ed:
-            orders_qs = orders_qs.filter(order_date__date__gte=sd, order_date__date__lte=ed)
-        total_orders = orders_qs.count()
-        pending_orders = orders_qs.filter(status='pending').count()
-        active_orders = orders_qs.filter(status__in=['approved', 'active']).count()
-        completed_orders = orders_qs.filter(status='completed').count()
-
-        # Revenue summary
-        payments_qs = Payment.objects.filter(order__product__seller=seller)
-        if sd and ed:
-            payments_qs = payments_qs.filter(payment_date__date__gte=sd, payment_date__date__lte=ed)
-        total_revenue = payments_qs.aggregate(total=Sum('amount'))['total'] or 0
-        last_30_revenue = payments_qs.filter(payment_date__gte=today - timedelta(days=30)).aggregate(total=Sum('amount'))['total'] or 0
+        try:
+            return Response(build_reports_summary(seller, request.GET))
+        except ValueError as exc:
+            return Response({'error': str(exc)}, status=status.HTTP_400_BAD_REQUEST)
 
-        # Outstanding balances
-        installments_qs = Installment.objects.filter(order__product__seller=seller)
-        if sd and ed:
-            installments_qs = installments_qs.filter(due_date__gte=sd, due_date__lte=ed)
-        outstanding_balance = installments_qs.filter(status='pending').aggregate(total=Sum('amount'))['total'] or 0
+    except Seller.DoesNotExist:
+        return Response({'error': 'Seller profile not found'}, status=status.HTTP_404_NOT_FOUND)
 
-        # Payment status breakdown
-        due_today = Installment.objects.filter(order__product__seller=seller, due_date=today, status='pending').count()
-        overdue = Installment.objects.filter(order__product__seller=seller, due_date__lt=today, status='pending').count()
-        paid_installments = Installment.objects.filter(order__product__seller=seller, status='paid').count()
 
-        # Customer analytics
-        total_customers = Order.objects.filter(product__seller=seller).values('customer').distinct().count()
-        active_customers = Order.objects.filter(product__seller=seller, status__in=['approved', 'active']).values('customer').distinct().count()
+@extend_schema(
+    parameters=[
+        OpenApiParameter('as_of', description='Aging date (YYYY-MM-DD, default today)', required=False),
+        OpenApiParameter('range', description='Due date range: today, yesterday, last_7, last_30, last_90, last_year, this_month, last_month', required=False),
+        OpenApiParameter('start_date', description='Due date start (YYYY-MM-DD) - overrides range if provided', required=False),
+        OpenApiParameter('end_date', description='Due date end (YYYY-MM-DD) - overrides range if provided', required=False),
+        OpenApiParameter('limit', description='Customers and products listed, largest balance first (default 100, max 1000)', required=False),
+    ]
+)
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+@cached_report('aging_report')
+def aging_report(request):
+    """Get receivables aging buckets of outstanding installments per customer and product"""
+    from core.models import Seller
 
-        # Product performance
-        product_stats = Order.objects.filter(product__seller=seller).values('product__name').annotate(order_count=Count('id'), total_revenue=Sum('total_amount')).order_by('-total_revenue')[:5]
+    try:
+        seller = Seller.objects.get(user=request.user)
+        try:
+            return Response(build_aging_report(seller, request.GET))
+        except ValueError as exc:
+            return Response({'error': str(exc)}, status=status.HTTP_400_BAD_REQUEST)
 
-        # Monthly trends (last 12 months)
-        monthly_data = []
-        for i in range(12):
-            month_start = today.replace(day=1) - timedelta(days=30 * i)
-            month_end = month_start + timedelta(days=30)
-            monthly_revenue = payments_qs.filter(payment_date__gte=month_start, payment_date__lt=month_end).aggregate(total=Sum('amount'))['total'] or 0
-            monthly_orders = orders_qs.filter(order_date__gte=month_start, order_date__lt=month_end).count()
-            monthly_data.append({'month': month_start.strftime('%Y-%m'), 'revenue': float(monthly_revenue), 'orders': monthly_orders})
+    except Seller.DoesNotExist:
+        return Response({'error': 'Seller profile not found'}, status=status.HTTP_404_NOT_FOUND)
 
-        monthly_data.reverse()
 
-        # Payment method breakdown
-        payment_methods = payments_qs.values('payment_method').annotate(count=Count('id'), total=Sum('amount'))
+@extend_schema(
+    parameters=[
+        OpenApiParameter('granularity', description='Period size: week or month (default month)', required=False),
+        OpenApiParameter('months', description='Forecast horizon in calendar months (default 12, max 24)', required=False),
+    ]
+)
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+@cached_report('cash_flow_forecast')
+def cash_flow_forecast(request):
+    """Get projected collections of pending installments weighted by customer punctuality"""
+    from core.models import Seller
 
-        return Response({
-            'summary': {
-                'orders': {'total': total_orders, 'pending': pending_orders, 'active': active_orders, 'completed': completed_orders},
-                'revenue': {'total': float(total_revenue), 'last_30_days': float(last_30_revenue), 'outstanding': float(outstanding_balance)},
-                'customers': {'total': total_customers, 'active': active_customers},
-                'installments': {'due_today': due_today, 'overdue': overdue, 'paid': paid_installments}
-            },
-            'product_performance': list(product_stats),
-            'monthly_trends': monthly_data,
-            'payment_methods': list(payment_methods)
-        })
+    try:
+        seller = Seller.objects.get(user=request.user)
+        try:
+            return Response(build_cash_flow_forecast(seller, request.GET))
+        except ValueError as exc:
+            return Response({'error': str(exc)}, status=status.HTTP_400_BAD_REQUEST)
 
     except Seller.DoesNotExist:
         return Response({'error': 'Seller profile not found'}, status=status.HTTP_404_NOT_FOUND)
 
 
+@extend_schema(
+    parameters=[
+        OpenApiParameter('months', description='Months after approval to track (default 12, max 60)', required=False),
+        OpenApiParameter('range', description='Approval date range: today, yesterday, last_7, last_30, last_90, last_year, this_month, last_month', required=False),
+        OpenApiParameter('start_date', description='Approval date start (YYYY-MM-DD) - overrides range if provided', required=False),
+        OpenApiParameter('end_date', description='Approval date end (YYYY-MM-DD) - overrides range if provided', required=False),
+    ]
+)
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
-def detailed_reports(request):
-    """Get detailed reports with filters"""
+@cached_report('cohort_report')
+def cohort_report(request):
+    """Get cumulative collection rates of orders grouped by approval month"""
     from core.models import Seller
-    from django.db.models import Q
-    from datetime import datetime, timedelta
-    
+
     try:
         seller = Seller.objects.get(user=request.user)
+        try:
+            return Response(build_cohort_report(seller, request.GET))
+        except ValueError as exc:
+            return Response({'error': str(exc)}, status=status.HTTP_400_BAD_REQUEST)
 
-        # Query params
-        range_key = request.GET.get('range')
-        sd, ed = parse_date_range(range_key, request.GET.get('start_date'), request.GET.get('end_date'))
-        customer_id = request.GET.get('customer_id')
-        product_id = request.GET.get('product_id')
-        status_q = request.GET.get('status')
-        report_type = request.GET.get('type', 'all')
+    except Seller.DoesNotExist:
+        return Response({'error': 'Seller profile not found'}, status=status.HTTP_404_NOT_FOUND)
 
-        # Base filters
-        base_orders = Order.objects.filter(product__seller=seller)
-        base_payments = Payment.objects.filter(order__product__seller=seller)
-        base_installments = Installment.objects.filter(order__product__seller=seller)
 
-        if sd and ed:
-            base_orders = base_orders.filter(order_date__date__gte=sd, order_date__date__lte=ed)
-            base_payments = base_payments.filter(payment_date__date__gte=sd, payment_date__date__lte=ed)
-            base_installments = base_installments.filter(due_date__gte=sd, due_date__lte=ed)
+@extend_schema(
+    parameters=[
+        OpenApiParameter('type', description='Report type: orders, payments, installments or all (default)', required=False),
+        OpenApiParameter('format', description='Streamed export format: csv or ndjson (omit for JSON)', required=False),
+    ]
+)
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+@renderer_classes(api_settings.DEFAULT_RENDERER_CLASSES + [CSVRenderer, NDJSONRenderer])
+def detailed_reports(request):
+    """Get detailed reports with filters.
 
-        if customer_id:
-            base_orders = base_orders.filter(customer_id=customer_id)
-            base_payments = base_payments.filter(order__customer_id=customer_id)
-            base_installments = base_installments.filter(order__customer_id=customer_id)
+    ``format=csv`` or ``format=ndjson`` streams the rows instead of
+    returning them in one JSON document.
+    """
+    from core.models import Seller
 
-        if product_id:
-            base_orders = base_orders.filter(product_id=product_id)
-            base_payments = base_payments.filter(order__product_id=product_id)
-            base_installments = base_installments.filter(order__product_id=product_id)
+    try:
+        seller = Seller.objects.get(user=request.user)
+        report_type = request.GET.get('type', 'all')
+        querysets = detailed_report_querysets(seller, request.GET)
+        base_orders = querysets['orders']
+        base_payments = querysets['payments']
+        base_installments = querysets['installments']
 
-        if status_q:
-            base_orders = base_orders.filter(status=status_q)
+        export_format = request.GET.get('format')
+        if export_format in EXPORT_FORMATS:
+            if report_type in EXPORT_COLUMNS:
+                querysets = {report_type: querysets[report_type]}
+            return stream_export(querysets, export_format, f'report-{report_type}')
 
         if report_type == 'orders':
-            serializer = OrderSerializer(base_orders.select_related('customer', 'product'), many=True)
+            serializer = OrderSerializer(base_orders.for_serialization(), many=True, expand=OrderSerializer.EXPANDABLE_FIELDS)
             return Response({'orders': serializer.data})
 
         if report_type == 'payments':
@@ -585,7 +612,7 @@ def detailed_reports(request):
             return Response({'installments': serializer.data})
 
         # all
-        orders_serializer = OrderSerializer(base_orders.select_related('customer', 'product'), many=True)
+        orders_serializer = OrderSerializer(base_orders.for_serialization(), many=True, expand=OrderSerializer.EXPANDABLE_FIELDS)
         payments_serializer = PaymentSerializer(base_payments.select_related('order__customer', 'order__product'), many=True)
         installments_serializer = InstallmentSerializer(base_installments.select_related('order__customer', 'order__product'), many=True)
 
@@ -596,4 +623,92 @@ def detailed_reports(request):
         })
 
     except Seller.DoesNotExist:
-        return Response({'error': 'Seller profile not found'}, status=status.HTTP_404_NOT_FOUND)
\ No newline at end of file
+        return Response({'error': 'Seller profile not found'}, status=status.HTTP_404_NOT_FOUND)
+
+
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+def create_report_job(request):
+    """Queue a background report build.
+
+    An identical job that is still pending or running is returned instead of
+    queuing another one, and a finished artifact is reused while the
+    organization's report data version is unchanged.
+    """
+    from core.models import Seller
+    from .tasks import build_report_job
+
+    try:
+        seller = Seller.objects.get(user=request.user)
+    except Seller.DoesNotExist:
+        return Response({'error': 'Seller profile not found'}, status=status.HTTP_404_NOT_FOUND)
+
+    serializer = ReportJobCreateSerializer(data=request.data)
+    if not serializer.is_valid():
+        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+    data = serializer.validated_data
+    lookup = {
+        'seller': seller,
+        'report_type': data['report_type'],
+        'export_format': data['format'],
+        'params_key': normalized_params(data['params']),
+    }
+    version = get_report_version(seller.organization_id)
+
+    # Without a version (cache unavailable) no completed job is known to be current
+    current = version is not None and (
+        ReportJob.objects.filter(**lookup, status='completed', data_version=version).exclude(artifact='').first()
+    )
+    if current:
+        return Response(ReportJobSerializer(current, context={'request': request}).data)
+
+    job = ReportJob.objects.filter(**lookup, status__in=ReportJob.OUTSTANDING_STATUSES).first()
+    if job is None:
+        try:
+            with transaction.atomic():
+                job = ReportJob.objects.create(
+                    organization_id=seller.organization_id,
+                    requested_by=request.user,
+                    params=data['params'],
+                    data_version=version,
+                    **lookup,
+                )
+            transaction.on_commit(lambda: build_report_job.delay(job.pk))
+        except IntegrityError:
+            # Queued concurrently by another request
+            job = ReportJob.objects.get(**lookup, status__in=ReportJob.OUTSTANDING_STATUSES)
+
+    return Response(ReportJobSerializer(job, context={'request': request}).data, status=status.HTTP_202_ACCEPTED)
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def report_job_detail(request, pk):
+    """Get the status of a report job"""
+    try:
+        job = ReportJob.objects.get(pk=pk, seller__user=request.user)
+    except ReportJob.DoesNotExist:
+        return Response({'error': 'Report job not found'}, status=status.HTTP_404_NOT_FOUND)
+
+    return Response(ReportJobSerializer(job, context={'request': request}).data)
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def download_report_job(request, pk):
+    """Download the compressed file of a completed report job"""
+    try:
+        job = ReportJob.objects.get(pk=pk, seller__user=request.user)
+    except ReportJob.DoesNotExist:
+        return Response({'error': 'Report job not found'}, status=status.HTTP_404_NOT_FOUND)
+
+    if job.status != 'completed' or not job.artifact:
+        return Response({'error': 'Report is not available for download'}, status=status.HTTP_404_NOT_FOUND)
+
+    return FileResponse(
+        job.artifact.open('rb'),
+        as_attachment=True,
+        filename=f'report-{job.report_type}-{job.pk}.{job.export_format}.gz',
+        content_type='application/gzip',
+    )
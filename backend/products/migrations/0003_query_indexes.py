@@ -0,0 +1,17 @@
+# Generated by Django 4.2.7 on 2026-10-17 02:14
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0002_initial'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(condition=models.Q(('is_active', True)), fields=['organization', '-created_at'], name='product_active_org_idx'),
+        ),
+    ]
@@ -35,3 +35,10 @@ class Product(BaseModel):
 
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            models.Index(
+                fields=['organization', '-created_at'],
+                condition=models.Q(is_active=True),
+                name='product_active_org_idx',
+            ),
+        ]
@@ -4,6 +4,7 @@ from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 from django_filters.rest_framework import DjangoFilterBackend
 from django.db.models import Q
+from core.cache import cached_report
 from .models import Product, Category
 from .serializers import ProductSerializer, CategorySerializer
 
@@ -111,6 +112,7 @@ class ProductDetailView(generics.RetrieveUpdateDestroyAPIView):
 
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
+@cached_report('product_stats')
 def product_stats(request):
     """Get product statistics for the seller"""
     from core.models import Seller
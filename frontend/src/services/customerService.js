@@ -27,7 +27,9 @@ export const customerService = {
   },
 
   getCustomerOrders: async (customerId) => {
-    const response = await api.get(`/customers/${customerId}/orders/`);
+    const response = await api.get(`/customers/${customerId}/orders/`, {
+      params: { expand: 'product' },
+    });
     return response.data;
   },
 
@@ -2,12 +2,16 @@ import api from "./api";
 
 export const orderService = {
   getOrders: async (params = {}) => {
-    const response = await api.get("/orders/", { params });
+    const response = await api.get("/orders/", {
+      params: { expand: "customer,product,installments", ...params },
+    });
     return response.data;
   },
 
   getOrder: async (id) => {
-    const response = await api.get(`/orders/${id}/`);
+    const response = await api.get(`/orders/${id}/`, {
+      params: { expand: "customer,product,installments,payments" },
+    });
     return response.data;
   },
 
@@ -57,7 +61,9 @@ export const orderService = {
   },
 
   getCustomerPortalData: async (customerId) => {
-    const response = await api.get(`/orders/customers/${customerId}/portal/`);
+    const response = await api.get(`/orders/customers/${customerId}/portal/`, {
+      params: { expand: "product" },
+    });
     return response.data;
   },
 